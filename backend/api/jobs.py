@@ -0,0 +1,339 @@
+"""
+Background design jobs with persisted, resumable event logs.
+
+``submit`` queues a pipeline run and returns its job at once; a fixed pool of worker tasks runs
+queued jobs in order. Each event a job emits gets a sequence id (1, 2, ...) and is appended to
+``<id>.events.jsonl`` in the jobs directory, next to ``<id>.json`` holding the job's status.
+``Job.follow(after)`` yields the events after a given id, recorded ones first and then live ones,
+so a client that reconnects with ``Last-Event-ID`` resumes where it left off and nothing is re-run.
+
+Finished jobs stay in memory up to ``keep_finished`` of them; older ones are read back from disk
+when asked for. All file writes go through the manager's single writer thread, in the order they
+were issued, so they stay off the event loop and a heartbeat never overwrites a later status. A job is run by the worker process that accepted it, which refreshes a heartbeat in
+its ``<id>.json`` while the job is queued or running. Other workers sharing the directory follow
+such a job by tailing its event log and re-reading its status, so a reconnect that lands on a
+different worker still resumes. A job is reported "interrupted" only once its owner is gone: its
+heartbeat is stale, or its process no longer exists on this host.
+
+Kept free of FastAPI imports like streaming.py and singleflight.py.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import os
+import re
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from ..core import metrics
+
+FINISHED = ("done", "error", "cancelled", "interrupted")
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+HEARTBEAT_S = 5.0           # how often an owner re-saves its queued/running jobs
+STALE_S = 3 * HEARTBEAT_S   # a job whose heartbeat is older than this has lost its owner
+POLL_S = 0.25               # how often a job owned by another process is re-read while followed
+
+
+def _owner_gone(owner: Optional[str], heartbeat: Optional[float]) -> bool:
+    if not owner or heartbeat is None or time.time() - heartbeat > STALE_S:
+        return True
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return False
+    if owner == _OWNER:
+        return True     # it would be in this process's live jobs; a previous process with our pid died
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+class JobQueueFull(Exception):
+    """More jobs are waiting than the manager accepts."""
+
+
+class Job:
+    def __init__(self, job_id: str, payload: Dict[str, Any], directory: str, writer: Optional[Executor] = None):
+        self.id = job_id
+        self.payload = payload
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.out_dir: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._meta_path = os.path.join(directory, f"{job_id}.json")
+        self._log_path = os.path.join(directory, f"{job_id}.events.jsonl")
+        self._log = None
+        self._writer = writer     # the manager's writer thread; None for jobs loaded from disk
+        self._changed = asyncio.Event()
+        self._remote = False      # owned by another process: follow() re-reads the files
+        self._log_offset = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {"id": self.id, "status": self.status, "created": self.created, "started": self.started,
+                "finished": self.finished, "events": len(self.events), "out_dir": self.out_dir,
+                "error": self.error}
+
+    # ----- persistence -----
+    def snapshot(self) -> Dict[str, Any]:
+        """What ``<id>.json`` holds: the status, the payload and this process's heartbeat."""
+        return dict(self.info(), payload=self.payload, owner=_OWNER, heartbeat=time.time())
+
+    def write_meta(self, meta: Dict[str, Any]) -> None:
+        tmp = f"{self._meta_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    async def save(self) -> None:
+        """Write the current status to ``<id>.json`` on the writer thread."""
+        await self._write(self.write_meta, self.snapshot())
+
+    async def _write(self, fn: Callable, *args: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._writer, fn, *args)
+
+    @classmethod
+    def load(cls, job_id: str, directory: str) -> Optional["Job"]:
+        """The job as recorded on disk; one still queued or running elsewhere is followed remotely."""
+        job = cls(job_id, {}, directory)
+        job._remote = True
+        return job if job.refresh() else None
+
+    def refresh(self) -> bool:
+        """Re-read the status and any newly logged events of a job owned by another process."""
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.payload = meta.get("payload", {})
+        for field in ("created", "started", "finished", "error", "out_dir"):
+            setattr(self, field, meta.get(field))
+        self.status = meta.get("status", "queued")
+        if self.status not in FINISHED and _owner_gone(meta.get("owner"), meta.get("heartbeat")):
+            self.status = "interrupted"
+        # the status is read first: the owner closes the log before it saves a finished status
+        try:
+            with open(self._log_path, "rb") as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break   # not fully written yet (or torn by a crash)
+                    try:
+                        self.events.append(json.loads(line)["event"])
+                    except ValueError:
+                        break
+                    self._log_offset += len(line)
+        except OSError:
+            pass
+        return True
+
+    # ----- events -----
+    async def start(self) -> None:
+        self.status, self.started = "running", time.time()
+        await self._write(self._open_log, self.snapshot())
+
+    async def append(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        self._notify()
+        await self._write(self._write_event, json.dumps({"id": len(self.events), "event": event}) + "\n",
+                          event["type"] != "token")
+
+    async def finish(self, status: str) -> None:
+        self.status, self.finished = status, time.time()
+        self._notify()
+        await self._write(self._close_log, self.snapshot())
+
+    # run on the writer thread
+    def _open_log(self, meta: Dict[str, Any]) -> None:
+        self._log = open(self._log_path, "a", encoding="utf-8")
+        self.write_meta(meta)
+
+    def _write_event(self, line: str, flush: bool) -> None:
+        self._log.write(line)
+        if flush:
+            self._log.flush()
+
+    def _close_log(self, meta: Dict[str, Any]) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self.write_meta(meta)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, after: int = 0) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """(sequence id, event) for every event after ``after``, until the job finishes."""
+        i = max(after, 0)
+        while True:
+            if i < len(self.events):
+                i += 1
+                yield i, self.events[i - 1]
+                continue
+            if self.status in FINISHED:
+                return
+            if self._remote:
+                await asyncio.sleep(POLL_S)
+                await asyncio.to_thread(self.refresh)
+            else:
+                await self._changed.wait()
+
+
+class JobManager:
+    def __init__(self, run: Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]], directory: str,
+                 workers: int = 2, max_queued: int = 100, keep_finished: int = 100):
+        self.directory = directory
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.stats = {"submitted": 0, "rejected": 0, "done": 0, "error": 0, "cancelled": 0}
+        self._run = run
+        self._live: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-writer")
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        metrics.JOBS_QUEUED.set(0)
+        metrics.JOBS_RUNNING.set(0)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.shutdown)   # let the cancelled jobs' last writes land
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, payload: Dict[str, Any]) -> Job:
+        """Queue a pipeline run for ``payload``; raises JobQueueFull when ``max_queued`` are waiting."""
+        if self._queue is None:
+            raise RuntimeError("JobManager.start() has not been called")
+        if self._queue.qsize() >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise JobQueueFull(f"{self.max_queued} jobs already queued")
+        job = Job(uuid.uuid4().hex, payload, self.directory, self._writer)
+        await job.save()    # on disk before its id is handed out, so any worker can find it
+        self._live[job.id] = job
+        self._queue.put_nowait(job)
+        self.stats["submitted"] += 1
+        metrics.JOBS_QUEUED.set(self._queue.qsize())
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """The job with ``job_id`` (from memory, else from its files), or None.
+
+        Only finished jobs are cached; one another process is still running is re-read on every call.
+        """
+        if not _JOB_ID.match(job_id):
+            return None
+        job = self._live.get(job_id) or self._finished.get(job_id)
+        if job is None:
+            job = await asyncio.to_thread(Job.load, job_id, self.directory)
+            if job is None:
+                return None
+            if job.status in FINISHED:
+                self._keep(job)
+        else:
+            if job_id in self._finished:
+                self._finished.move_to_end(job_id)
+        return job
+
+    def _keep(self, job: Job) -> None:
+        self._finished[job.id] = job
+        while len(self._finished) > self.keep_finished:
+            self._finished.popitem(last=False)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_S)
+            beats = [(job.write_meta, job.snapshot()) for job in self._live.values()]
+            await asyncio.get_running_loop().run_in_executor(self._writer, _write_all, beats)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            metrics.JOBS_QUEUED.set(self._queue.qsize())
+            try:
+                await self._execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if job.id in self._live:
+                    # it never got going (e.g. its log couldn't be opened): fail it so its followers
+                    # stop waiting, and keep this worker for the next job
+                    job.error = f"job failed to start: {exc}"
+                    try:
+                        await job.finish("error")
+                    except Exception:
+                        pass
+                    self._done(job, "error")
+
+    async def _execute(self, job: Job) -> None:
+        await job.start()
+        metrics.JOB_WAIT_SECONDS.observe(job.started - job.created)
+        metrics.JOBS_RUNNING.inc()
+        status = "cancelled"
+        try:
+            async with aclosing(self._run(job.payload)) as events:
+                async for event in events:
+                    if event["type"] == "export":
+                        job.out_dir = event["text"]
+                    await job.append(event)
+            status = "done"
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            status, job.error = "error", str(exc)
+            await job.append({"type": "error", "error": job.error})
+        finally:
+            metrics.JOBS_RUNNING.dec()
+            try:
+                await job.finish(status)    # the status is set (and followers woken) before the write
+            finally:
+                self._done(job, status)
+
+    def _done(self, job: Job, status: str) -> None:
+        metrics.JOBS_FINISHED.inc(status=status)
+        self.stats[status] += 1
+        del self._live[job.id]
+        self._keep(job)
+
+
+def _write_all(writes: List[Tuple[Callable, Dict[str, Any]]]) -> None:
+    for write, meta in writes:
+        try:
+            write(meta)
+        except OSError:
+            pass    # retried on the next beat
+
+
+def last_event_id(value: Optional[str]) -> int:
+    """The sequence id from a ``Last-Event-ID`` header (0, i.e. from the start, if missing or invalid)."""
+    try:
+        return max(int(value), 0) if value else 0
+    except ValueError:
+        return 0
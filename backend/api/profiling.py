@@ -0,0 +1,166 @@
+"""
+On-demand profiling of a single request: a stack-sampling CPU profiler plus tracemalloc.
+
+Kept free of FastAPI imports like streaming.py; the server decides when to profile (``X-Profile``
+header or ``?profile=1``, only with ``profiling_enabled``) and otherwise never calls into it.
+
+A sampler thread reads the event-loop thread's stack every ``interval_ms`` and keeps the samples in
+which the request's own coroutine (its pipeline generator or coroutine frame) is running, so other
+requests on the same worker are left out. Work the request hands to thread pools (file export) is
+not sampled. tracemalloc is process-wide: allocation sites are the growth between the start and end
+snapshots, which includes concurrent requests. One profile runs at a time per worker.
+
+Each profile writes ``<id>.folded`` (collapsed stacks for flamegraph.pl / speedscope) and
+``<id>.txt`` (top functions and allocation sites) to the profiles directory.
+"""
+
+from __future__ import annotations
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+_lock = threading.Lock()
+_active: Optional["ProfileSession"] = None
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _root_frame(work: Any):
+    """The frame that identifies a request's own work: an async generator's or coroutine's frame."""
+    return getattr(work, "ag_frame", None) or getattr(work, "cr_frame", None)
+
+
+class ProfileSession:
+    def __init__(self, work: Any, directory: str, interval_ms: float = 5.0, label: str = "",
+                 top: int = 25, trace_frames: int = 10):
+        self.id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.directory = directory
+        self.interval_s = interval_ms / 1000.0
+        self.label = label
+        self.top = top
+        self.trace_frames = trace_frames
+        self.stacks: Counter = Counter()
+        self.samples = 0        # loop-thread samples taken
+        self._root = _root_frame(work)
+        self._thread_id = threading.get_ident()   # started from the event loop thread
+        self._stop = threading.Event()
+        self._started_tracemalloc = False
+        self._snapshot = None
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+
+    # ----- lifecycle -----
+    def start(self) -> "ProfileSession":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._start = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop sampling and take the closing snapshot; the report is written by a background thread.
+
+        Safe to call more than once (a response's body and its cleanup task may both call it).
+        """
+        global _active
+        with _lock:
+            if self._stop.is_set():
+                return
+            self._stop.set()
+        self._sampler.join()
+        elapsed = time.perf_counter() - self._start
+        end = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        with _lock:
+            if _active is self:
+                _active = None
+        threading.Thread(target=self.write, args=(elapsed, end, peak), name="profile-writer", daemon=True).start()
+
+    # ----- sampling -----
+    def _sample(self) -> None:
+        root, thread_id = self._root, self._thread_id
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(thread_id)
+            self.samples += 1
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                if frame is root:
+                    # stacks start at the request's root; the event loop frames above it are the same every time
+                    self.stacks[";".join(reversed(stack))] += 1
+                    break
+                frame = frame.f_back
+
+    # ----- report -----
+    def write(self, elapsed: float, end, peak: int) -> Dict[str, str]:
+        os.makedirs(self.directory, exist_ok=True)
+        folded = os.path.join(self.directory, f"{self.id}.folded")
+        report = os.path.join(self.directory, f"{self.id}.txt")
+        with open(folded, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        attributed = sum(self.stacks.values())
+        interval_ms = self.interval_s * 1000
+
+        lines = [f"profile {self.id}  {self.label}".rstrip(),
+                 f"wall {elapsed * 1000:.1f} ms; {attributed} of {self.samples} loop samples in this request "
+                 f"(~{attributed * interval_ms:.0f} ms CPU on the event loop at {interval_ms:g} ms/sample)",
+                 "", f"top {self.top} functions by own samples:"]
+        lines += [f"{count:>7}  {count / max(attributed, 1):6.1%}  {name}" for name, count in own.most_common(self.top)]
+        lines += ["", f"top {self.top} functions by cumulative samples:"]
+        lines += [f"{count:>7}  {count / max(attributed, 1):6.1%}  {name}" for name, count in total.most_common(self.top)]
+        lines += ["", f"tracemalloc: peak {peak / 1024:.0f} KiB traced; top {self.top} allocation sites by growth:"]
+        if self._snapshot is not None:
+            for stat in end.compare_to(self._snapshot, "lineno")[:self.top]:
+                where = stat.traceback[0]
+                lines.append(f"{stat.size_diff / 1024:>10.1f} KiB  {stat.count_diff:>+8} blocks  "
+                             f"{where.filename}:{where.lineno}")
+        with open(report, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return {"folded": folded, "report": report}
+
+
+def start_profile(work: Any, directory: str, interval_ms: float = 5.0, label: str = "") -> Optional[ProfileSession]:
+    """Start profiling ``work`` (the request's coroutine or async generator, not yet started).
+
+    Returns None, leaving the request unprofiled, when another profile is already running.
+    """
+    global _active
+    with _lock:
+        if _active is not None:
+            return None
+        _active = session = ProfileSession(work, directory, interval_ms, label)
+    try:
+        return session.start()
+    except BaseException:
+        with _lock:
+            _active = None
+        raise
+
+
+def wants_profile(flag: Optional[str], token: str = "") -> bool:
+    """Whether a request's ``X-Profile`` header / ``profile`` query value asks for a profile."""
+    if not flag:
+        return False
+    if token:
+        return flag == token
+    return flag.lower() in ("1", "true", "yes", "on")
@@ -5,17 +5,38 @@ Provides streaming and synchronous endpoints for design generation.
 """
 
 from __future__ import annotations
+import asyncio
 import json
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, List, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
-import asyncio
 
-from ..core.agents import astream_pipeline
+from ..core.agents import astream_pipeline, arun_pipeline, agent_stats, configure_llms, llm_stats, warm
+from ..core import limiter, metrics, tracing
+from ..core.batch import arun_batch
+from ..core.briefs import DesignRequest
+from ..core.ratelimit import TokenBucket
+from ..core.cache import SpecCache, request_key
+from ..core.exporters import awrite_project
+from ..core.json_repair import repair_stats
+from ..core.tools import load_docs_index, load_dense_index, prefetch_stats
+from . import profiling
+from .jobs import JobManager, JobQueueFull, last_event_id
+from .singleflight import SingleFlight
+from .streaming import coalesce_tokens, encode_event
 from ..config import settings
 
+configure_llms(settings.llm_backend, settings.llm_cassette_dir,
+               settings.llm_replay_token_delay_ms, settings.llm_replay_recorded_timing,
+               limited=settings.llm_limiter_enabled)
+limiter.configure(settings.llm_limit_initial, settings.llm_limit_max, settings.llm_limit_batch_share,
+                  settings.llm_retries, settings.llm_breaker_failures, settings.llm_breaker_reset_s)
+tracing.configure(settings.trace_dir, settings.trace_sample_rate)
+
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
@@ -31,80 +52,255 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class DesignRequest(BaseModel):
-    purpose: str
-    audience: str
-    tone: str
-    subject: str
-    brand: str = ""
-    constraints: str = ""
-    ai_use_cases: str = ""
-    latency_budget: int = 2000
-    needs_citations: str = "false"
-    safety_level: str = "moderate"
-    telemetry_opt_in: str = "off"
-    out_dir: str = "ui-agent-output"
+spec_cache = SpecCache(
+    cache_dir=settings.spec_cache_dir or None,
+    max_entries=settings.spec_cache_max_entries,
+    ttl_s=settings.spec_cache_ttl_s,
+    max_disk_bytes=settings.spec_cache_max_disk_mb * 1024 * 1024,
+) if settings.spec_cache_enabled else None
+
+# Per-process cap on concurrently running pipelines; excess requests wait for a slot
+pipeline_slots = asyncio.Semaphore(settings.max_concurrent_pipelines)
+
+async def limited(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Run a pipeline event stream inside a concurrency slot, telling the client if it waits."""
+    if pipeline_slots.locked():
+        yield {"type": "status", "text": "queued"}
+    try:
+        await pipeline_slots.acquire()
+    except asyncio.CancelledError:
+        metrics.PIPELINE_CANCELLED.inc(mode="stream", phase="queued")
+        raise
+    try:
+        async with aclosing(events):
+            async for event in events:
+                yield event
+    finally:
+        pipeline_slots.release()
+
+singleflight = SingleFlight() if settings.singleflight_enabled else None
+
+async def exported_to(events: AsyncIterator[Dict[str, Any]], out_dir: str) -> AsyncIterator[Dict[str, Any]]:
+    """A shared run's events, with the project written to this request's out_dir if the run wrote elsewhere."""
+    own_export = False
+    async with aclosing(events):
+        async for event in events:
+            if event["type"] == "export":
+                if event["text"] != out_dir:
+                    continue
+                own_export = True
+            elif event["type"] == "final" and not own_export:
+                written = await awrite_project(event["spec"], out_dir)
+                yield {"type": "export", "text": written}
+            yield event
+
+async def job_pipeline(payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    # jobs hold a pipeline slot like stream requests; tokens are coalesced before they are logged.
+    # Background work: its LLM calls yield to interactive requests
+    with limiter.llm_priority("batch"):
+        events = coalesce_tokens(
+            limited(astream_pipeline(payload, cache=spec_cache, timings=settings.sse_phase_timings)),
+            window_ms=settings.sse_coalesce_window_ms,
+            max_bytes=settings.sse_coalesce_max_bytes,
+            queue_size=settings.sse_queue_size,
+        )
+        async with aclosing(events):
+            async for event in events:
+                yield event
+
+jobs = JobManager(job_pipeline, settings.jobs_dir, workers=settings.jobs_workers,
+                  max_queued=settings.jobs_max_queued, keep_finished=settings.jobs_keep_finished)
+
+class BatchRequest(BaseModel):
+    items: List[DesignRequest]
+    concurrency: Optional[int] = None  # at most settings.batch_concurrency
+
+# LLM requests of all batches share one bucket, so parallel batches can't exceed the provider's rate together
+batch_bucket = TokenBucket.per_minute(settings.batch_llm_requests_per_minute, settings.batch_llm_burst) \
+    if settings.batch_llm_requests_per_minute > 0 else None
+
+async def batch_item(payload: Dict[str, Any]) -> Dict[str, Any]:
+    async with pipeline_slots:
+        return await arun_pipeline(payload, cache=spec_cache)
+
+def maybe_profile(http_request: Request, work, label: str):
+    """Start a profile of ``work`` if profiling is enabled and the request asks for one."""
+    if not settings.profiling_enabled:
+        return None
+    flag = http_request.headers.get("x-profile") or http_request.query_params.get("profile")
+    if not profiling.wants_profile(flag, settings.profiling_token):
+        return None
+    return profiling.start_profile(work, settings.profiles_dir, settings.profiling_interval_ms,
+                                   label=f"{label} {http_request.url.path}")
+
+@app.on_event("startup")
+async def load_docs_corpus():
+    if settings.docs_corpus_dir or settings.docs_index_path:
+        await asyncio.to_thread(load_docs_index, settings.docs_corpus_dir or None, settings.docs_index_path or None)
+    if settings.docs_dense_index_dir:
+        await asyncio.to_thread(load_dense_index, settings.docs_dense_index_dir, settings.docs_corpus_dir or None)
+
+@app.on_event("startup")
+async def start_jobs():
+    jobs.start()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    await jobs.stop()
+
+@app.on_event("startup")
+async def warm_llms():
+    # Off the startup path: the worker accepts requests while LangChain/OpenAI load in a thread
+    if settings.llm_warmup:
+        asyncio.get_running_loop().run_in_executor(None, warm)
 
 @app.get("/")
 async def root():
     return {"message": "UI Design Expert Agent API", "version": "1.0.0"}
 
+@app.get("/api/stats")
+async def stats():
+    """Runtime counters for sizing caches and spotting regressions."""
+    return {
+        "spec_cache": spec_cache.stats() if spec_cache is not None else None,
+        "json_repair": dict(repair_stats),
+        "agents": dict(agent_stats),
+        "llm": llm_stats(),
+        "tool_prefetch": prefetch_stats(),
+        "singleflight": dict(singleflight.stats, in_flight=singleflight.in_flight()) if singleflight else None,
+        "jobs": dict(jobs.stats, queued=jobs.queued()),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Phase, LLM and tool latency histograms in the Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/api/design/stream")
-async def stream_design(request: DesignRequest):
+async def stream_design(request: DesignRequest, http_request: Request):
     """Stream design generation events via Server-Sent Events."""
+    payload = request.dict()
+    pipeline = astream_pipeline(payload, cache=spec_cache, timings=settings.sse_phase_timings)
+    profile = maybe_profile(http_request, pipeline, "stream")
+    try:
+        if singleflight is not None:
+            # the first request for a brief drives the run; identical ones join it (the pipeline above
+            # is then never started)
+            source = exported_to(singleflight.subscribe(request_key(payload), lambda: limited(pipeline)),
+                                 payload["out_dir"])
+        else:
+            source = limited(pipeline)
+
+        events = coalesce_tokens(
+            source,
+            window_ms=settings.sse_coalesce_window_ms,
+            max_bytes=settings.sse_coalesce_max_bytes,
+            queue_size=settings.sse_queue_size,
+        )
+    except BaseException:
+        if profile is not None:
+            await asyncio.to_thread(profile.stop)
+        raise
+
     async def event_generator():
         try:
-            payload = request.dict()
-            async for event in astream_pipeline(payload):
-                if event["type"] == "token":
-                    yield {
-                        "event": "token",
-                        "data": json.dumps({"text": event["text"]})
-                    }
-                elif event["type"] == "phase":
-                    yield {
-                        "event": "phase",
-                        "data": json.dumps({"text": event["text"]})
-                    }
-                elif event["type"] == "status":
-                    yield {
-                        "event": "status",
-                        "data": json.dumps({"text": event["text"]})
-                    }
-                elif event["type"] == "ops_patch":
-                    yield {
-                        "event": "ops_patch",
-                        "data": json.dumps({"text": event["text"]})
-                    }
-                elif event["type"] == "export":
-                    yield {
-                        "event": "export",
-                        "data": json.dumps({"out_dir": event["text"]})
-                    }
-                elif event["type"] == "final":
-                    yield {
-                        "event": "final",
-                        "data": json.dumps({"spec": event["spec"]})
-                    }
-                
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.01)
+            async for event in events:
+                frame = encode_event(event)
+                if frame is not None:
+                    yield frame
                 
         except Exception as e:
             yield {
                 "event": "error",
                 "data": json.dumps({"error": str(e)})
             }
-    
+        finally:
+            # on disconnect this cancels the pipeline (or leaves the shared run) wherever it is
+            await events.aclose()
+            if profile is not None:
+                await asyncio.to_thread(profile.stop)
+
+    # sse-starlette cancels the response when the client disconnects; if that interrupts a send, the
+    # generator is parked at a yield and is closed here instead of whenever it gets garbage-collected.
+    # Closing a generator that never started runs no finally, so the profile is stopped here as well.
+    frames = event_generator()
+
+    async def cleanup():
+        await frames.aclose()
+        if profile is not None:
+            await asyncio.to_thread(profile.stop)
+
+    return EventSourceResponse(frames, headers={"X-Profile-Id": profile.id} if profile else None,
+                               background=BackgroundTask(cleanup))
+
+@app.post("/api/design/jobs", status_code=202)
+async def submit_job(request: DesignRequest):
+    """Queue a design generation in the background; returns the job (id and status) at once."""
+    try:
+        job = await jobs.submit(request.dict())
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.info()
+
+@app.get("/api/design/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job.info()
+
+@app.get("/api/design/jobs/{job_id}/events")
+async def job_events(job_id: str, http_request: Request):
+    """Stream a job's events via SSE, resuming after the ``Last-Event-ID`` header (or ``?last_event_id=``)."""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    after = last_event_id(http_request.headers.get("last-event-id")
+                          or http_request.query_params.get("last_event_id"))
+
+    async def event_generator():
+        async for seq, event in job.follow(after):
+            frame = encode_event(event)
+            if frame is not None:
+                frame["id"] = str(seq)
+                yield frame
+
+    return EventSourceResponse(event_generator())
+
+@app.post("/api/design/batch")
+async def batch_design(request: BatchRequest):
+    """Run many briefs with bounded concurrency, streaming an ``item`` event as each one finishes
+    (status ok with its spec, or error) and a ``summary`` at the end; failed items don't fail the batch."""
+    if not request.items:
+        raise HTTPException(status_code=422, detail="items must not be empty")
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"at most {settings.batch_max_items} items per batch")
+    concurrency = min(request.concurrency or settings.batch_concurrency, settings.batch_concurrency)
+    events = arun_batch([item.dict() for item in request.items], batch_item, concurrency, batch_bucket)
+
+    async def event_generator():
+        try:
+            async for event in events:
+                yield encode_event(event)
+        finally:
+            await events.aclose()
+
     return EventSourceResponse(event_generator())
 
 @app.post("/api/design/sync")
-async def sync_design(request: DesignRequest):
+async def sync_design(request: DesignRequest, http_request: Request, response: Response):
     """Synchronous design generation (for CLI/testing)."""
     try:
-        from ..core.agents import run_pipeline
         payload = request.dict()
-        result = run_pipeline(payload)
+        async with pipeline_slots:
+            work = arun_pipeline(payload, cache=spec_cache)
+            profile = maybe_profile(http_request, work, "sync")
+            try:
+                result = await work
+            finally:
+                if profile is not None:
+                    await asyncio.to_thread(profile.stop)
+                    response.headers["X-Profile-Id"] = profile.id
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,104 @@
+"""
+Single-flight deduplication of identical concurrent pipeline runs.
+
+The first request for a key starts the run in its own task; it and every later request for the
+same key while the run is in flight subscribe to it. A subscriber first receives the events
+already emitted (from the flight's buffer), then live ones. The run keeps going while anyone is
+subscribed and is cancelled when the last subscriber disconnects. Finished flights are dropped,
+so the next identical request starts fresh (or hits the spec cache).
+
+All bookkeeping happens on the event loop thread, so no locks are needed.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+
+class Flight:
+    def __init__(self, key: str, source: AsyncIterator[Dict[str, Any]]):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._source = source
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_done: Callable[["Flight"], None]) -> None:
+        async def drive() -> None:
+            try:
+                async for event in self._source:
+                    self.events.append(event)
+                    self._notify()
+            except asyncio.CancelledError:
+                self.error = RuntimeError("shared run was cancelled")
+                raise
+            except Exception as exc:
+                self.error = exc
+            finally:
+                self.done = True
+                self._notify()
+                on_done(self)
+        self._task = asyncio.create_task(drive())
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Buffered events from the start of the run, then live ones; re-raises the run's error."""
+        i = 0
+        while True:
+            if i < len(self.events):
+                event = self.events[i]
+                i += 1
+                yield event
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self.stats = {"runs": 0, "shared": 0, "cancelled": 0}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def subscribe(self, key: str, start: Callable[[], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Events of the in-flight run for ``key``, starting one with ``start()`` if there is none."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight(key, start())
+            flight.start(self._finished)
+            self.stats["runs"] += 1
+        else:
+            self.stats["shared"] += 1
+        flight.subscribers += 1
+        try:
+            async for event in flight.follow():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # nobody is listening any more
+                self._drop(flight)
+                flight.cancel()
+                self.stats["cancelled"] += 1
+
+    def _drop(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def _finished(self, flight: Flight) -> None:
+        self._drop(flight)
@@ -0,0 +1,153 @@
+"""
+SSE encoding and token coalescing for the streaming endpoints.
+
+Kept free of FastAPI imports so the benchmarks can drive it directly.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+
+def _text(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {"text": event["text"]}
+
+
+def _without_type(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in event.items() if k != "type"}
+
+
+def _with_timings(data: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    # phase/final events carry per-phase milliseconds only when the pipeline was asked for them
+    if "timings" in event:
+        data["timings"] = event["timings"]
+    return data
+
+
+# Pipeline event type -> SSE data payload. Unknown event types are not sent to the client.
+ENCODERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "token": _text,
+    "phase": lambda event: _with_timings(_text(event), event),
+    "status": _text,
+    "section": _without_type,
+    "repair": _without_type,
+    "validation": _without_type,
+    "ops_patch": _text,
+    "export": lambda event: {"out_dir": event["text"]},
+    "final": lambda event: _with_timings({"spec": event["spec"]}, event),
+    "error": _without_type,
+    "item": _without_type,
+    "summary": _without_type,
+}
+
+
+def encode_event(event: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Encode a pipeline event as an sse-starlette frame, or None if it is not sent."""
+    encoder = ENCODERS.get(event["type"])
+    if encoder is None:
+        return None
+    return {"event": event["type"], "data": json.dumps(encoder(event))}
+
+
+class _Failure:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_END = object()
+
+
+async def _aclose(source: AsyncIterator[Any]) -> None:
+    aclose = getattr(source, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def _utf8_len(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+async def coalesce_tokens(
+    source: AsyncIterator[Dict[str, Any]],
+    window_ms: float = 25,
+    max_bytes: int = 4096,
+    queue_size: int = 256,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Merge runs of ``token`` events into one event per time window or byte budget (UTF-8 bytes of text).
+
+    The source is drained by a background task into a bounded queue, so a slow client
+    applies backpressure to the producer instead of the stream sleeping between events.
+    Non-token events flush the pending batch first, preserving event order. Closing this
+    generator closes the source, even while it is parked on a full queue.
+    """
+    if window_ms <= 0:
+        try:
+            async for event in source:
+                yield event
+        finally:
+            await _aclose(source)
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    window = window_ms / 1000.0
+
+    async def pump() -> None:
+        try:
+            async for event in source:
+                await queue.put(event)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as exc:
+            await queue.put(_Failure(exc))
+            return
+        finally:
+            await _aclose(source)
+        await queue.put(_END)
+
+    task = asyncio.create_task(pump())
+    try:
+        item = await queue.get()
+        while True:
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            if item["type"] != "token":
+                yield item
+                item = await queue.get()
+                continue
+
+            texts = [item["text"]]
+            size = _utf8_len(item["text"])
+            deadline = loop.time() + window
+            item = None
+            while size < max_bytes:
+                try:
+                    nxt = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        nxt = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if nxt is _END or isinstance(nxt, _Failure) or nxt["type"] != "token":
+                    item = nxt
+                    break
+                texts.append(nxt["text"])
+                size += _utf8_len(nxt["text"])
+            yield {"type": "token", "text": "".join(texts)}
+            if item is None:
+                item = await queue.get()
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
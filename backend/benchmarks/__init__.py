@@ -0,0 +1,5 @@
+"""
+Benchmarks Package
+
+Offline performance benchmarks for the backend. Run modules with ``python -m backend.benchmarks.<name>``.
+"""
@@ -0,0 +1,78 @@
+"""
+Downstream-agent context benchmark: prompt size and packing time of the Ops and Engineer passes
+with the whole spec (``json.dumps(spec)``, the old context) versus their section-scoped compact JSON.
+
+Tokens are estimated at ~4 characters each (metrics.estimate_tokens), the same estimate /metrics
+uses when the provider reports no usage. The prompt column counts the full rendered messages.
+
+Usage: python -m backend.benchmarks.bench_context [--tiers simple enterprise] [--scale 1] [--json]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from ..core.agents import get_engine_prompt, get_ops_prompt
+from ..core.core import pack_spec_for_agent
+from ..core.metrics import estimate_tokens
+from .fixtures import TIERS, make_spec
+
+PROMPTS = {"ops": get_ops_prompt, "engine": get_engine_prompt}
+
+
+def _per_call_us(fn, loops: int = 200) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return (time.perf_counter() - start) / loops * 1e6
+
+
+def prompt_tokens(agent: str, spec_json: str) -> int:
+    return sum(estimate_tokens(m.content) for m in PROMPTS[agent]().format_messages(spec_json=spec_json))
+
+
+def measure(tier: str, scale: int) -> List[Dict[str, Any]]:
+    spec = make_spec(tier, scale)
+    rows = []
+    for agent in PROMPTS:
+        full = json.dumps(spec)
+        scoped = pack_spec_for_agent(spec, agent)
+        full_tokens, scoped_tokens = prompt_tokens(agent, full), prompt_tokens(agent, scoped)
+        rows.append({
+            "tier": tier, "agent": agent,
+            "full_chars": len(full), "scoped_chars": len(scoped),
+            "full_prompt_tokens": full_tokens, "scoped_prompt_tokens": scoped_tokens,
+            "saved_tokens": full_tokens - scoped_tokens,
+            "reduction": round(1 - scoped_tokens / full_tokens, 3),
+            "full_pack_us": round(_per_call_us(lambda: json.dumps(spec)), 1),
+            "scoped_pack_us": round(_per_call_us(lambda: pack_spec_for_agent(spec, agent)), 1),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=list(TIERS))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rows = [row for tier in args.tiers for row in measure(tier, args.scale)]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'tier':<11} {'agent':<7} {'prompt tokens full -> scoped':>30} {'saved':>7} {'cut':>6} "
+          f"{'pack us full -> scoped':>24}")
+    for r in rows:
+        print(f"{r['tier']:<11} {r['agent']:<7} {r['full_prompt_tokens']:>14} -> {r['scoped_prompt_tokens']:<12} "
+              f"{r['saved_tokens']:>7} {r['reduction']:>6.0%} {r['full_pack_us']:>12.1f} -> {r['scoped_pack_us']:<9.1f}")
+    saved = sum(r["saved_tokens"] for r in rows)
+    print(f"\n{saved} prompt tokens saved over {len(rows)} passes "
+          f"({saved / max(1, sum(r['full_prompt_tokens'] for r in rows)):.0%})")
+
+
+if __name__ == "__main__":
+    main()
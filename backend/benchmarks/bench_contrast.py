@@ -0,0 +1,87 @@
+"""
+Palette contrast audit benchmark: per-pair Python path vs. the vectorized batch engine.
+
+Usage: python -m backend.benchmarks.bench_contrast [--specs 5000]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from ..core.contrast import audit_rules, audit_specs, palette_colors
+from .fixtures import PALETTE
+
+
+def _legacy_luminance(hex_color: str) -> float:
+    """The original per-call parse + transfer curve, kept for comparison."""
+    h = hex_color.lstrip("#")
+    r, g, b = tuple(int(h[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+    lin = lambda u: (u/12.92) if u <= 0.04045 else ((u+0.055)/1.055) ** 2.4
+    return 0.2126*lin(r) + 0.7152*lin(g) + 0.0722*lin(b)
+
+
+def _legacy_ratio(c1: str, c2: str) -> float:
+    L1, L2 = _legacy_luminance(c1), _legacy_luminance(c2)
+    L1, L2 = (L1, L2) if L1 >= L2 else (L2, L1)
+    return (L1 + 0.05) / (L2 + 0.05)
+
+
+def per_pair_audit(specs: List[Dict[str, Any]]) -> List[int]:
+    failures = []
+    for spec in specs:
+        ds = spec["designSystem"]
+        names, hexes, _ = palette_colors(ds["palette"], ds.get("aiStates"))
+        colors = dict(zip(names, hexes))
+        failures.append(sum(1 for fg, bg, lvl in audit_rules(names)
+                            if _legacy_ratio(colors[fg], colors[bg]) < lvl))
+    return failures
+
+
+def _jitter(rng: random.Random, color: str, spread: int) -> str:
+    rgb = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return "#" + "".join("%02X" % max(0, min(255, c + rng.randint(-spread, spread))) for c in rgb)
+
+
+def make_specs(n: int, seed: int = 3, spread: int = 24) -> List[Dict[str, Any]]:
+    """Stored-spec-like palettes: the fixture palette with per-channel jitter, so a few pairs fail."""
+    rng = random.Random(seed)
+    accents = ["#F59E0B", "#06B6D4", "#7C3AED", "#16A34A", "#EF4444", "#3B82F6"]
+    specs = []
+    for _ in range(n):
+        pal = {k: _jitter(rng, v, spread) for k, v in PALETTE.items()}
+        states = [{"name": f"s{i}", "color": _jitter(rng, c, spread)} for i, c in enumerate(accents)]
+        specs.append({"designSystem": {"palette": pal, "aiStates": states}})
+    return specs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--specs", type=int, default=5000)
+    args = parser.parse_args()
+    specs = make_specs(args.specs)
+
+    start = time.perf_counter()
+    legacy = per_pair_audit(specs)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = audit_specs(specs)
+    batch_s = time.perf_counter() - start
+
+    assert legacy == [len(r["failures"]) for r in batch]
+    pairs = sum(r["checked"] for r in batch)
+    print(json.dumps({
+        "specs": len(specs),
+        "pairs": pairs,
+        "failing_pairs": sum(legacy),
+        "per_pair_s": round(legacy_s, 4),
+        "vectorized_s": round(batch_s, 4),
+        "speedup": round(legacy_s / batch_s, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
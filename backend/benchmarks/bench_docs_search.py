@@ -0,0 +1,119 @@
+"""
+docs_search benchmark: legacy substring scan vs. BM25 inverted index vs. mmap'd dense index at 1k/10k/100k docs.
+
+Usage: python -m backend.benchmarks.bench_docs_search [--sizes 1000 10000 100000] [--queries 50]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from ..core.embeddings import DenseIndex
+from ..core.retrieval import BM25Index
+from ..core.tools import DOCS
+
+QUERIES = [
+    "streaming tokens skeleton loaders", "citation panel confidence", "wcag contrast focus ring",
+    "multi agent handoff timeline", "tailwind theme tokens css variables", "safety banner redaction",
+    "copilot sidebar suggestions", "reduced motion accessibility", "tool call visibility",
+    "optimistic ui latency",
+]
+
+
+def make_corpus(n: int, seed: int = 11) -> List[Tuple[str, str]]:
+    """Snippets of 20-60 words: Zipf-distributed filler plus real guideline vocabulary."""
+    rng = random.Random(seed)
+    design = " ".join(DOCS.values()).lower().replace(".", "").replace(",", "").split()
+    filler = [f"w{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(filler))]
+    docs = []
+    for i in range(n):
+        words = rng.choices(filler, weights=weights, k=rng.randint(14, 40))
+        words += rng.choices(design, k=rng.randint(6, 20))
+        rng.shuffle(words)
+        docs.append((f"doc{i}", " ".join(words)))
+    return docs
+
+
+def legacy_search(docs: Dict[str, str], query: str, k: int = 3) -> List[Dict[str, str]]:
+    q = query.lower()
+    scored = []
+    for key, text in docs.items():
+        score = sum(1 for tok in q.split() if tok in text.lower())
+        if score:
+            scored.append((score, key, text))
+    scored.sort(reverse=True, key=lambda x: x[0])
+    return [{"source": key, "snippet": text} for _, key, text in scored[:k]]
+
+
+def latency_ms(fn, queries: List[str]) -> Dict[str, float]:
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3)}
+
+
+def run(size: int, n_queries: int, legacy_queries: int) -> Dict[str, object]:
+    docs = make_corpus(size)
+    queries = [QUERIES[i % len(QUERIES)] for i in range(n_queries)]
+
+    start = time.perf_counter()
+    index = BM25Index.build(docs)
+    build_s = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "docs.idx")
+        index.save(path)
+        start = time.perf_counter()
+        BM25Index.load(path)
+        load_s = time.perf_counter() - start
+        index_mb = os.path.getsize(path) / 1e6
+
+        # Dense: embed the corpus minus 1%, then time an incremental append of the rest
+        dense_dir = os.path.join(tmp, "dense")
+        split = size - max(1, size // 100)
+        start = time.perf_counter()
+        dense = DenseIndex.create(dense_dir, capacity=split)
+        dense.append(docs[:split])
+        dense_build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        dense.append(docs[split:])
+        append_s = time.perf_counter() - start
+        start = time.perf_counter()
+        reader = DenseIndex.open(dense_dir)
+        open_s = time.perf_counter() - start
+        dense_latency = latency_ms(lambda q: reader.search(q, 3), queries)
+
+    as_dict = dict(docs)
+    return {
+        "docs": size,
+        "build_s": round(build_s, 3),
+        "load_s": round(load_s, 3),
+        "index_mb": round(index_mb, 2),
+        "bm25": latency_ms(lambda q: index.search(q, 3), queries),
+        "dense": {"build_s": round(dense_build_s, 3), "append_1pct_s": round(append_s, 3),
+                  "open_s": round(open_s, 3), **dense_latency},
+        "legacy": latency_ms(lambda q: legacy_search(as_dict, q, 3), queries[:legacy_queries]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--legacy-queries", type=int, default=10, help="the legacy scan is slow at 100k")
+    args = parser.parse_args()
+    print(json.dumps([run(n, args.queries, args.legacy_queries) for n in args.sizes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
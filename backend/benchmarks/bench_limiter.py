@@ -0,0 +1,173 @@
+"""
+Upstream LLM limiter benchmark against the local fake OpenAI server (fake_openai.py), which serves
+``--capacity`` requests at once and answers the rest with 429 + Retry-After.
+
+Scenarios, each with a fresh limiter (limiter.configure) and fresh server counters:
+
+  sdk       a burst of ``--calls`` calls through ChatOpenAI with its own retries and no limiter
+  limited   the same burst through LimitedChatModel (AIMD limit, Retry-After, jittered retries)
+  priority  the burst at batch priority, then ``--interactive`` streams arriving while it queues
+  outage    the upstream answers 500 for ``--outage-s``; the circuit breaker should fail calls fast
+
+For each: calls ok/failed, requests the upstream saw (served, 429, 500), p50/p95 latency and the
+limiter's final state.
+
+Usage: python -m backend.benchmarks.bench_limiter [--calls 48] [--capacity 6] [--latency-ms 200] [--json]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from ..core import limiter
+from ..core.llm_backends import LimitedChatModel
+from .bench_startup import REPO_ROOT
+from .loadtest import _free_port, wait_ready
+
+MESSAGES = [("user", "Return a JSON status object.")]
+
+
+def start_fake(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "backend.benchmarks.fake_openai", "--port", str(port),
+                             "--capacity", str(args.capacity), "--latency-ms", str(args.latency_ms),
+                             "--retry-after", str(args.retry_after)], cwd=REPO_ROOT)
+
+
+def chat_model(base_url: str, limited: bool):
+    from langchain_openai import ChatOpenAI
+    if not limited:
+        return ChatOpenAI(model="fake", api_key="sk-fake", base_url=base_url + "/v1")
+    return LimitedChatModel(inner=ChatOpenAI(model="fake", api_key="sk-fake", base_url=base_url + "/v1",
+                                             max_retries=0), role="bench")
+
+
+async def one_call(model, priority: str = "interactive", stream: bool = False) -> Dict[str, Any]:
+    start = time.perf_counter()
+    first = None
+    try:
+        with limiter.llm_priority(priority):
+            if stream:
+                async for _ in model.astream(MESSAGES):
+                    first = first or time.perf_counter()
+            else:
+                await model.ainvoke(MESSAGES)
+        error = None
+    except Exception as exc:
+        error = type(exc).__name__
+    end = time.perf_counter()
+    return {"priority": priority, "seconds": end - start, "ttft": (first - start) if first else None, "error": error}
+
+
+def _ms(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None}
+    if len(values) == 1:
+        return {"p50": round(values[0] * 1000), "p95": round(values[0] * 1000)}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(cuts[49] * 1000), "p95": round(cuts[94] * 1000)}
+
+
+def summarize(name: str, calls: List[Dict[str, Any]], upstream: Dict[str, Any], wall: float,
+              guarded: bool) -> Dict[str, Any]:
+    row = {"scenario": name, "calls": len(calls), "failed": sum(1 for c in calls if c["error"]),
+           "errors": sorted({c["error"] for c in calls if c["error"]}), "wall_s": round(wall, 2),
+           "upstream": upstream, "latency_ms": {}}
+    for priority in ("interactive", "batch"):
+        ok = [c["seconds"] for c in calls if c["priority"] == priority and not c["error"]]
+        if ok:
+            row["latency_ms"][priority] = _ms(ok)
+    if guarded:
+        row["limiter"] = limiter.get_limiter().stats()
+    return row
+
+
+async def scenario(name: str, base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    limiter.configure(initial=args.initial_limit, retries=args.retries, failure_threshold=5, reset_s=args.reset_s)
+    guarded = name != "sdk"
+    model = chat_model(base_url, limited=guarded)
+    async with httpx.AsyncClient() as admin:
+        await admin.post(base_url + "/admin/reset")
+        start = time.perf_counter()
+        if name in ("sdk", "limited"):
+            calls = await asyncio.gather(*(one_call(model) for _ in range(args.calls)))
+        elif name == "priority":
+            batch = [asyncio.create_task(one_call(model, "batch")) for _ in range(args.calls)]
+            await asyncio.sleep(args.latency_ms / 1000.0)
+            interactive = [asyncio.create_task(one_call(model, "interactive", stream=True))
+                           for _ in range(args.interactive)]
+            calls = await asyncio.gather(*batch, *interactive)
+        else:
+            await admin.post(base_url + "/admin/outage", params={"seconds": args.outage_s})
+            calls = []
+            for _ in range(args.calls):
+                calls.append(asyncio.create_task(one_call(model)))
+                await asyncio.sleep(args.outage_s / args.calls)
+            calls = list(await asyncio.gather(*calls))
+            # once the outage is over and reset_s has passed, a probe closes the breaker again
+            await asyncio.sleep(args.reset_s)
+            calls.append(await one_call(model))
+        wall = time.perf_counter() - start
+        upstream = (await admin.get(base_url + "/admin/stats")).json()
+    return summarize(name, calls, upstream, wall, guarded)
+
+
+def print_rows(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<9} {'calls':>5} {'failed':>6} {'served':>6} {'429s':>5} {'500s':>5} {'wall s':>7}  "
+          f"{'latency p50/p95 ms':<36} limiter")
+    for r in rows:
+        up = r["upstream"]
+        latency = "  ".join(f"{k} {v['p50']}/{v['p95']}" for k, v in r["latency_ms"].items())
+        state = ""
+        if "limiter" in r:
+            s = r["limiter"]
+            state = f"limit {s['limit']}, {s['retries']} retries, breaker {s['breaker']}"
+        print(f"{r['scenario']:<9} {r['calls']:>5} {r['failed']:>6} {up['served']:>6} {up['rate_limited']:>5} "
+              f"{up['errors']:>5} {r['wall_s']:>7.2f}  {latency:<36} {state}")
+        if r["errors"]:
+            print(f"{'':<9} errors: {', '.join(r['errors'])}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    port = _free_port()
+    proc = start_fake(port, args)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url, proc)
+        return [await scenario(name, base_url, args) for name in args.scenarios]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=("sdk", "limited", "priority", "outage"),
+                        default=["sdk", "limited", "priority", "outage"])
+    parser.add_argument("--calls", type=int, default=48)
+    parser.add_argument("--interactive", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--initial-limit", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--outage-s", type=float, default=2.0)
+    parser.add_argument("--reset-s", type=float, default=1.0, help="circuit breaker reset time for the bench")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    rows = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
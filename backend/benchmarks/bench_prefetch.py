@@ -0,0 +1,152 @@
+"""
+Strategist tool-prefetch benchmark: model turns and latency per request with and without prefetch.
+
+Both paths run the real Strategist agent loop (agents.make_strategist_exec: design prompt, OpenAI
+tools agent, ParallelAgentExecutor) over a fake tool-calling chat model that costs ``--turn-ms``
+per round trip. The fake model reads its prompt like the real one is asked to: it calls each
+deterministic tool it is offered whose result isn't in the conversation yet (one call per turn, or
+all in one turn with ``--parallel-calls``) and answers with a fixture spec once it has them.
+
+  legacy    suggest_palette/ai_patterns/safety_rules bound as agent tools, no prefetched block
+  prefetch  the production Strategist: only docs_search bound, tool results in the prompt
+
+Turns are counted from the executor's intermediate_steps (agents.count_turns) and cross-checked
+against the model calls; tools run for real in both paths.
+
+Usage: python -m backend.benchmarks.bench_prefetch [--requests 20] [--turn-ms 300] [--parallel-calls]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from ..core.agents import count_turns, make_strategist_agent, make_strategist_exec, strategist_inputs
+from ..core.core import pack_prefetch_prompt
+from ..core.tools import PREFETCHED_TOOLS, get_tool, prefetch_stats, prefetch_tools
+from .fixtures import TIERS, make_request, make_spec
+
+SUBJECTS = ["knowledge work", "finance", "wellness", "developer tools", "retail"]
+ANSWER = json.dumps(make_spec())
+
+
+def requests(n: int) -> List[Dict[str, Any]]:
+    tiers = list(TIERS)
+    out = []
+    for i in range(n):
+        payload = make_request(tiers[i % len(tiers)])
+        payload["subject"] = SUBJECTS[(i // len(tiers)) % len(SUBJECTS)]
+        out.append(payload)
+    return out
+
+
+def tool_args(name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The arguments the model would read off the brief for a deterministic tool."""
+    return {
+        "suggest_palette": {"subject": payload["subject"], "mood": payload["tone"]},
+        "ai_patterns": {"purpose": payload["purpose"], "ai_use_cases": payload["ai_use_cases"],
+                        "latency_budget": payload["latency_budget"]},
+        "safety_rules": {"safety_level": payload["safety_level"], "telemetry_opt_in": payload["telemetry_opt_in"]},
+    }[name]
+
+
+class ToolCallingModel(BaseChatModel):
+    """Fake design model: sleeps ``turn_s`` per call, fetches missing tool results, then answers."""
+
+    payload: Dict[str, Any]
+    answer: str
+    turn_s: float = 0.3
+    parallel: bool = False
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-tool-calling"
+
+    def _known(self, messages: List[BaseMessage]) -> set:
+        known = {m.name for m in messages if isinstance(m, ToolMessage) and m.name}
+        called = {c["id"]: c["name"] for m in messages if isinstance(m, AIMessage) for c in m.tool_calls}
+        known |= {called.get(m.tool_call_id) for m in messages if isinstance(m, ToolMessage)}
+        prompt = " ".join(str(m.content) for m in messages if isinstance(m, HumanMessage))
+        return known | {name for name in PREFETCHED_TOOLS if f'"{name}":' in prompt}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep(self.turn_s)
+        self.calls += 1
+        offered = [t["function"]["name"] for t in kwargs.get("tools", [])]
+        known = self._known(messages)
+        missing = [name for name in offered if name in PREFETCHED_TOOLS and name not in known]
+        if missing:
+            batch = missing if self.parallel else missing[:1]
+            message = AIMessage(content="", tool_calls=[
+                {"name": name, "args": tool_args(name, self.payload), "id": f"call_{self.calls}_{name}"}
+                for name in batch])
+        else:
+            message = AIMessage(content=self.answer)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def run_strategist(payload: Dict[str, Any], turn_s: float, legacy: bool, parallel_calls: bool) -> Dict[str, float]:
+    model = ToolCallingModel(payload=payload, answer=ANSWER, turn_s=turn_s, parallel=parallel_calls)
+    tools = [get_tool("docs_search")]
+    if legacy:
+        tools = [get_tool(name) for name in PREFETCHED_TOOLS] + tools
+    executor = make_strategist_exec(make_strategist_agent(model, tools), tools)
+    start = time.perf_counter()
+    inputs = strategist_inputs(payload)
+    if legacy:
+        inputs["prefetched"] = ""
+    out = executor.invoke(inputs)
+    latency = time.perf_counter() - start
+    json.loads(out["output"])
+    turns = count_turns(out["intermediate_steps"])
+    assert turns == model.calls, (turns, model.calls)
+    return {"turns": turns, "tool_calls": len(out["intermediate_steps"]), "latency_s": latency}
+
+
+def summarize(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    lat = sorted(r["latency_s"] * 1000 for r in rows)
+    return {"turns_per_request": statistics.mean(r["turns"] for r in rows),
+            "tool_calls_per_request": statistics.mean(r["tool_calls"] for r in rows),
+            "p50_ms": round(statistics.median(lat), 1),
+            "p95_ms": round(lat[int(0.95 * (len(lat) - 1))], 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--turn-ms", type=float, default=300.0, help="fake model round trip")
+    parser.add_argument("--parallel-calls", action="store_true", help="legacy model batches all tool calls in one turn")
+    args = parser.parse_args()
+    turn_s = args.turn_ms / 1000.0
+    batch = requests(args.requests)
+
+    start = time.perf_counter()
+    prefetch_tools(batch[0])
+    cold_us = (time.perf_counter() - start) * 1e6
+    start = time.perf_counter()
+    prefetch_tools(batch[0])
+    warm_us = (time.perf_counter() - start) * 1e6
+    extra_tokens = len(pack_prefetch_prompt(prefetch_tools(batch[0]))) // 4
+
+    report = {
+        "turn_ms": args.turn_ms,
+        "legacy": summarize([run_strategist(p, turn_s, True, args.parallel_calls) for p in batch]),
+        "prefetch": summarize([run_strategist(p, turn_s, False, args.parallel_calls) for p in batch]),
+        "prefetch_cold_us": round(cold_us, 1),
+        "prefetch_warm_us": round(warm_us, 2),
+        "prompt_tokens_added": extra_tokens,
+        "memo": prefetch_stats(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
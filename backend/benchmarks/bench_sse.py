@@ -0,0 +1,96 @@
+"""
+SSE streaming benchmark: legacy per-event sleep + if/elif encoding vs. coalesced dispatch.
+
+Usage: python -m backend.benchmarks.bench_sse [--tokens 1000] [--gap-ms 0.5]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict
+
+from ..api.streaming import coalesce_tokens, encode_event
+
+
+async def synthetic_pipeline(tokens: int, gap_ms: float) -> AsyncIterator[Dict[str, Any]]:
+    """Event shape of astream_pipeline with a token source emitting every ``gap_ms``."""
+    yield {"type": "status", "text": "starting"}
+    yield {"type": "phase", "text": "design_strategist"}
+    for i in range(tokens):
+        if gap_ms:
+            await asyncio.sleep(gap_ms / 1000.0)
+        yield {"type": "token", "text": '"tok%d",' % (i % 97)}
+    yield {"type": "status", "text": "parsing"}
+    yield {"type": "phase", "text": "agent_ops"}
+    yield {"type": "ops_patch", "text": "applied"}
+    yield {"type": "phase", "text": "ui_engineer"}
+    yield {"type": "export", "text": "ui-agent-output"}
+    yield {"type": "final", "spec": {"narrativeDescription": "x" * 2000}}
+
+
+async def legacy_stream(source: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, str]]:
+    """The pre-coalescing server loop, kept verbatim for comparison."""
+    async for event in source:
+        if event["type"] == "token":
+            yield {"event": "token", "data": json.dumps({"text": event["text"]})}
+        elif event["type"] == "phase":
+            yield {"event": "phase", "data": json.dumps({"text": event["text"]})}
+        elif event["type"] == "status":
+            yield {"event": "status", "data": json.dumps({"text": event["text"]})}
+        elif event["type"] == "ops_patch":
+            yield {"event": "ops_patch", "data": json.dumps({"text": event["text"]})}
+        elif event["type"] == "export":
+            yield {"event": "export", "data": json.dumps({"out_dir": event["text"]})}
+        elif event["type"] == "final":
+            yield {"event": "final", "data": json.dumps({"spec": event["spec"]})}
+        await asyncio.sleep(0.01)
+
+
+async def coalesced_stream(source: AsyncIterator[Dict[str, Any]], window_ms: float,
+                           max_bytes: int) -> AsyncIterator[Dict[str, str]]:
+    async for event in coalesce_tokens(source, window_ms=window_ms, max_bytes=max_bytes):
+        frame = encode_event(event)
+        if frame is not None:
+            yield frame
+
+
+async def measure(frames: AsyncIterator[Dict[str, str]], source_events: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    count = 0
+    async for _ in frames:
+        count += 1
+        await asyncio.sleep(0)  # yield to the loop like a real transport write
+    elapsed = time.perf_counter() - start
+    return {
+        "duration_s": round(elapsed, 4),
+        "frames": count,
+        "source_events_per_s": round(source_events / elapsed, 1),
+    }
+
+
+async def run(tokens: int, gap_ms: float, window_ms: float, max_bytes: int) -> Dict[str, Any]:
+    source_events = tokens + 9
+    return {
+        "tokens": tokens,
+        "gap_ms": gap_ms,
+        "legacy": await measure(legacy_stream(synthetic_pipeline(tokens, gap_ms)), source_events),
+        "coalesced": await measure(
+            coalesced_stream(synthetic_pipeline(tokens, gap_ms), window_ms, max_bytes), source_events),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--gap-ms", type=float, default=0.5, help="simulated inter-token gap")
+    parser.add_argument("--window-ms", type=float, default=25)
+    parser.add_argument("--max-bytes", type=int, default=4096)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.tokens, args.gap_ms, args.window_ms, args.max_bytes))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
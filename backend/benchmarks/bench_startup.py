@@ -0,0 +1,130 @@
+"""
+Cold-start benchmark: import cost of the API and agent modules, measured with ``python -X importtime``.
+
+Each target is imported in a fresh interpreter ``--runs`` times; the report has the best wall time,
+the importtime cumulative for the target and its heaviest dependencies. ``--record`` appends the
+report to startup_history.jsonl (next to this file) so regressions show up over time, and
+``--history`` prints that log. Only reproducible runs are recorded: every target must import, and
+the measured tree must be a clean checkout (use ``--root`` with a worktree for older revisions).
+
+Usage: python -m backend.benchmarks.bench_startup [--targets backend.api.server ...] [--runs 5] [--record]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_history.jsonl")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TARGETS = ["backend.core.agents", "backend.api.server"]
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """``import time: self | cumulative | name`` lines -> dicts (microseconds, nesting depth)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                     "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return rows
+
+
+def entry_points(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Third-party modules imported directly by project code (``backend.*``) or by the interpreter."""
+    # importtime prints children before their parent; walking backwards visits parents first
+    parents: List[str] = []
+    out = []
+    for row in reversed(rows):
+        del parents[row["depth"]:]
+        parent = parents[-1] if parents else None
+        if not row["module"].startswith("backend") and (parent is None or parent.startswith("backend")):
+            out.append(row)
+        parents.append(row["module"])
+    return out
+
+
+def measure(target: str, runs: int, root: str, top: int) -> Dict[str, Any]:
+    walls, rows, error = [], [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                              cwd=root, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            break
+        parsed = parse_importtime(proc.stderr)
+        if not rows or parsed[-1]["cumulative_us"] < rows[-1]["cumulative_us"]:
+            rows = parsed
+    result: Dict[str, Any] = {"target": target, "wall_ms": round(min(walls) * 1000, 1)}
+    if error:
+        result["error"] = error
+        return result
+    total = next((r for r in reversed(rows) if r["module"] == target), rows[-1])
+    heavy = sorted(entry_points(rows), key=lambda r: r["cumulative_us"], reverse=True)
+    result["import_ms"] = round(total["cumulative_us"] / 1000, 1)
+    result["modules"] = len(rows)
+    result["heaviest"] = [{"module": r["module"], "ms": round(r["cumulative_us"] / 1000, 1)} for r in heavy[:top]]
+    return result
+
+
+def git_revision(root: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no", "--", ".",
+                                f":!{os.path.relpath(HISTORY, REPO_ROOT)}"], cwd=root,
+                               capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+    revision = out.stdout.strip()
+    return (revision + "+dirty" if dirty else revision) or None
+
+
+def print_history() -> None:
+    if not os.path.exists(HISTORY):
+        print("no history yet:", HISTORY)
+        return
+    with open(HISTORY, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            cells = [f"{r['target']}={r.get('import_ms', 'ERR')}ms" for r in entry["results"]]
+            print(entry["date"], entry.get("revision") or "-", entry.get("note", ""), *cells, sep="  ")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", nargs="+", default=TARGETS)
+    parser.add_argument("--runs", type=int, default=5, help="best of N fresh interpreters")
+    parser.add_argument("--top", type=int, default=8, help="heaviest third-party imports to list")
+    parser.add_argument("--root", default=REPO_ROOT, help="tree to measure (e.g. a worktree of an older revision)")
+    parser.add_argument("--record", action="store_true", help=f"append the report to {os.path.basename(HISTORY)}")
+    parser.add_argument("--note", default="", help="free-form label stored with --record")
+    parser.add_argument("--history", action="store_true", help="print recorded runs and exit")
+    args = parser.parse_args()
+    if args.history:
+        print_history()
+        return
+
+    report = {"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "revision": git_revision(args.root),
+              "python": sys.version.split()[0], "note": args.note,
+              "results": [measure(t, args.runs, args.root, args.top) for t in args.targets]}
+    print(json.dumps(report, indent=2))
+    if args.record:
+        failed = [r["target"] for r in report["results"] if "error" in r]
+        if failed:
+            sys.exit(f"not recorded: {', '.join(failed)} failed to import")
+        if not report["revision"] or report["revision"].endswith("+dirty"):
+            sys.exit(f"not recorded: {args.root} is not a clean git checkout")
+        with open(HISTORY, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
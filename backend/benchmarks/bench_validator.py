@@ -0,0 +1,75 @@
+"""
+Schema validation benchmark: compiled closures vs. an interpretive schema walk.
+
+Usage: python -m backend.benchmarks.bench_validator [--scale 20] [--repeat 20]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from ..core.core import SCHEMA, validate_spec
+from .fixtures import make_spec
+
+_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool, "null": type(None)}
+
+
+def interpretive_validate(schema: Dict[str, Any], value: Any, path: str = "") -> List[Tuple[str, str]]:
+    """Reference walk that re-reads the schema dict on every call."""
+    errors: List[Tuple[str, str]] = []
+    t = schema.get("type")
+    if t == "number":
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif t == "integer":
+        ok = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        ok = t is None or isinstance(value, _TYPES[t])
+    if not ok:
+        return [(path, f"expected {t}")]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append((path, "enum"))
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append((f"{path}/{key}", "required property missing"))
+        for key, sub in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(interpretive_validate(sub, value[key], f"{path}/{key}"))
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(interpretive_validate(schema["items"], item, f"{path}/{i}"))
+    return errors
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="list-size multiplier for the enterprise fixture")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    spec = make_spec("enterprise", scale=args.scale)
+    assert validate_spec(spec) == interpretive_validate(SCHEMA, spec) == []
+    compiled = best_of(lambda: validate_spec(spec), args.repeat)
+    interpretive = best_of(lambda: interpretive_validate(SCHEMA, spec), args.repeat)
+    print(json.dumps({
+        "spec_bytes": len(json.dumps(spec)),
+        "components": len(spec["components"]),
+        "compiled_ms": round(compiled * 1000, 3),
+        "interpretive_ms": round(interpretive * 1000, 3),
+        "speedup": round(interpretive / compiled, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
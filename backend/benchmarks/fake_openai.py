@@ -0,0 +1,132 @@
+"""
+A local stand-in for the OpenAI chat completions API that injects latency, 429s and outages.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream: true``) with a fixed answer after
+``--latency-ms`` (+-25% jitter). At most ``--capacity`` requests are served at once; the rest get a
+429 with ``Retry-After: --retry-after``. ``--error-rate`` answers that share of requests with a 500.
+
+Admin endpoints for drivers: ``POST /admin/outage?seconds=S`` (every request gets a 500 for S
+seconds), ``GET /admin/stats`` (served, rate_limited, errors, max_in_flight) and ``POST /admin/reset``.
+
+Point a client at it with ``base_url=http://127.0.0.1:PORT/v1`` (any API key).
+
+Usage: python -m backend.benchmarks.fake_openai [--port 8400] [--capacity 6] [--latency-ms 200]
+       [--token-delay-ms 5] [--retry-after 1] [--error-rate 0]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER = '{"status": "ok", "note": "fake completion"}'
+
+
+def make_app(capacity: int = 6, latency_ms: float = 200.0, token_delay_ms: float = 5.0,
+             retry_after: float = 1.0, error_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    state: Dict[str, Any] = {"in_flight": 0, "outage_until": 0.0}
+    stats = {"served": 0, "rate_limited": 0, "errors": 0, "max_in_flight": 0}
+
+    def error(status: int, kind: str, message: str, headers=None) -> JSONResponse:
+        return JSONResponse({"error": {"message": message, "type": kind, "code": kind}}, status_code=status,
+                            headers=headers)
+
+    def completion_id() -> str:
+        return "chatcmpl-" + uuid.uuid4().hex[:12]
+
+    async def wait_latency() -> None:
+        await asyncio.sleep(latency_ms / 1000.0 * random.uniform(0.75, 1.25))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if time.monotonic() < state["outage_until"] or random.random() < error_rate:
+            stats["errors"] += 1
+            return error(500, "server_error", "injected upstream failure")
+        if state["in_flight"] >= capacity:
+            stats["rate_limited"] += 1
+            return error(429, "rate_limit_exceeded", "too many concurrent requests",
+                         headers={"retry-after": f"{retry_after:g}"})
+        state["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], state["in_flight"])
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            try:
+                await wait_latency()
+            finally:
+                state["in_flight"] -= 1
+            stats["served"] += 1
+            return {"id": completion_id(), "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 12, "total_tokens": 22}}
+
+        async def chunks():
+            cid, created = completion_id(), int(time.time())
+            try:
+                await wait_latency()
+                pieces = [ANSWER[i:i + 4] for i in range(0, len(ANSWER), 4)]
+                for i, piece in enumerate(pieces):
+                    delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                    yield "data: " + json.dumps({"id": cid, "object": "chat.completion.chunk", "created": created,
+                                                 "model": model, "choices": [{"index": 0, "delta": delta,
+                                                                              "finish_reason": None}]}) + "\n\n"
+                    await asyncio.sleep(token_delay_ms / 1000.0)
+                yield "data: " + json.dumps({"id": cid, "object": "chat.completion.chunk", "created": created,
+                                             "model": model, "choices": [{"index": 0, "delta": {},
+                                                                          "finish_reason": "stop"}]}) + "\n\n"
+                yield "data: [DONE]\n\n"
+                stats["served"] += 1
+            finally:
+                state["in_flight"] -= 1
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/")
+    async def root():
+        return {"fake": "openai", "capacity": capacity}
+
+    @app.post("/admin/outage")
+    async def outage(seconds: float = 5.0):
+        state["outage_until"] = time.monotonic() + seconds
+        return {"outage_s": seconds}
+
+    @app.get("/admin/stats")
+    async def get_stats():
+        return dict(stats, in_flight=state["in_flight"])
+
+    @app.post("/admin/reset")
+    async def reset():
+        stats.update(served=0, rate_limited=0, errors=0, max_in_flight=0)
+        state["outage_until"] = 0.0
+        return dict(stats)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--capacity", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = make_app(args.capacity, args.latency_ms, args.token_delay_ms, args.retry_after, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Deterministic spec fixtures for the benchmarks.
+
+Tiers follow the design-complexity bands in USER_TEMPLATE (latency_budget 1000-7000).
+"""
+
+from __future__ import annotations
+import json
+import os
+import random
+from typing import Any, Dict
+
+# tier -> (latency_budget, components, aiStates, fileTree entries, utility classes, narrative words)
+TIERS: Dict[str, tuple] = {
+    "simple": (1200, 6, 4, 12, 10, 80),
+    "standard": (2000, 14, 6, 30, 30, 200),
+    "advanced": (2800, 30, 8, 60, 80, 400),
+    "creative": (4000, 45, 10, 90, 120, 700),
+    "enterprise": (6000, 80, 12, 160, 240, 1200),
+}
+
+PALETTE = {
+    "primary": "#3B82F6", "bg": "#0B0B0B", "surface": "#151515", "success": "#16A34A",
+    "warning": "#F59E0B", "danger": "#EF4444", "accent": "#F59E0B", "muted": "#9CA3AF",
+    "onBg": "#FFFFFF", "onSurface": "#E5E7EB", "onPrimary": "#FFFFFF", "thinking": "#F59E0B",
+    "streaming": "#06B6D4", "toolCall": "#7C3AED", "citation": "#16A34A", "safety": "#EF4444",
+}
+
+_WORDS = ("stream token agent citation palette surface layout contrast motion timeline "
+          "safety latency render shadow radius focus tool handoff composer bubble").split()
+
+
+def _hex(rng: random.Random) -> str:
+    return "#%06X" % rng.randrange(0x1000000)
+
+
+def make_request(tier: str = "standard") -> Dict[str, Any]:
+    """A DesignRequest payload matching the tier."""
+    return dict(
+        purpose="Research copilot for a knowledge base",
+        audience="Analysts and PMs",
+        tone="calm, precise, credible",
+        subject="knowledge work",
+        brand="#0EA5E9 as primary, #22C55E as success",
+        constraints="dark+light themes, AA contrast, prefers shadcn",
+        ai_use_cases="RAG search, multi-agent tool use with citations",
+        latency_budget=TIERS[tier][0],
+        needs_citations="true",
+        safety_level="moderate",
+        telemetry_opt_in="off",
+        out_dir="ui-agent-output",
+    )
+
+
+def make_spec(tier: str = "standard", scale: int = 1, seed: int = 7) -> Dict[str, Any]:
+    """A schema-valid spec shaped like real strategist output; ``scale`` multiplies list sizes."""
+    budget, n_comp, n_states, n_files, n_utils, n_words = TIERS[tier]
+    rng = random.Random(seed)
+    n_comp, n_states, n_files, n_utils = (n * scale for n in (n_comp, n_states, n_files, n_utils))
+    states = [{"name": f"state{i}", "color": _hex(rng), "description": f"AI state {i}"}
+              for i in range(n_states)]
+    components = [{
+        "name": f"Component{i}",
+        "type": rng.choice(["layout", "input", "display", "feedback", "ai"]),
+        "states": ["default", "hover", "focus", "disabled", "loading"][: 2 + i % 4],
+        "a11y": {"role": "region", "ariaLabel": f"Component {i}", "keyboard": True},
+        "aiSpecific": {"streaming": i % 2 == 0, "citations": i % 3 == 0, "toolCalls": i % 5 == 0},
+    } for i in range(n_comp)]
+    colors = dict(PALETTE)
+    colors.update({s["name"]: s["color"] for s in states})
+    return {
+        "designSystem": {
+            "palette": dict(PALETTE),
+            "typography": {
+                "fontFamily": {"sans": ["Inter", "system-ui"], "mono": ["JetBrains Mono"]},
+                "fontSize": {k: f"{0.75 + i * 0.125}rem" for i, k in enumerate(["xs", "sm", "base", "lg", "xl", "2xl"])},
+                "fontWeight": {"normal": 400, "medium": 500, "bold": 700},
+                "lineHeight": {"tight": 1.2, "normal": 1.5, "relaxed": 1.75},
+                "letterSpacing": {"tight": "-0.01em", "normal": "0"},
+            },
+            "spacing": {str(i): f"{i * 0.25}rem" for i in range(0, 16 * scale)},
+            "radius": {"sm": "4px", "md": "8px", "lg": "12px", "xl": "16px"},
+            "shadows": {"sm": "0 1px 2px rgba(0,0,0,.2)", "md": "0 4px 12px rgba(0,0,0,.25)"},
+            "motion": {"duration": {"fast": "120ms", "base": "200ms"}, "easing": {"standard": "cubic-bezier(.2,0,0,1)"}},
+            "a11y": {"focusRing": "#93C5FD", "reducedMotion": True},
+            "aiStates": states,
+        },
+        "ux": {
+            "layout": "sidebar + main", "informationDensity": "medium",
+            "primaryActions": ["Ask", "Search", "Export"],
+            "userJourneys": [{"name": f"journey{i}", "steps": ["open", "ask", "review"]} for i in range(3 * scale)],
+            "aiPattern": "copilot", "streamingStrategy": "token", "citationDisplay": "inline",
+        },
+        "aiSolution": {
+            "safety": {"contentFiltering": True, "redaction": False, "hallucinationCues": True,
+                       "guardrails": ["pii_masking", "toxicity_filter"]},
+            "observability": {"eventSchema": {"started": "timestamp"}, "telemetry": False,
+                              "runTimeline": True, "tokenMeter": True},
+            "latency": {"targetMs": budget, "optimisticUI": True, "skeletonStrategy": "progressive"},
+            "agentOrchestration": {"handoffUX": "timeline", "toolVisibility": "collapsible",
+                                   "errorRecovery": "retry"},
+        },
+        "components": components,
+        "tailwind": {
+            "configTokens": {"colors": colors, "radius": {"md": "8px", "lg": "12px"},
+                             "boxShadow": {"card": "0 4px 12px rgba(0,0,0,.25)"}},
+            "utilityClasses": {f"util-{i}": f"px-{i % 8} py-{i % 4} rounded-{['sm', 'md', 'lg'][i % 3]}"
+                               for i in range(n_utils)},
+        },
+        "next": {
+            "fileTree": [f"components/Component{i}.tsx" for i in range(n_files)],
+            "routing": {"/": "app/page.tsx", "/settings": "app/settings/page.tsx"},
+            "components": [c["name"] for c in components],
+        },
+        "narrativeDescription": " ".join(rng.choice(_WORDS) for _ in range(n_words * scale)),
+    }
+
+
+def write_cassette(directory: str, tier: str = "standard", scale: int = 1) -> str:
+    """Replay cassettes (see core.llm_backends) answering every role with a tier-sized response.
+
+    The Strategist answers in one turn with ``make_spec``; Ops returns a small aiSolution patch
+    and the Engineer "OK". Entries have no recorded chunks, so replay streams ~4-char tokens.
+    """
+    os.makedirs(directory, exist_ok=True)
+    responses = {
+        "design": json.dumps(make_spec(tier, scale)),
+        "ops": json.dumps({"aiSolution": {"latency": {"targetMs": TIERS[tier][0], "optimisticUI": True,
+                                                      "skeletonStrategy": "progressive"}}}),
+        "engine": json.dumps({"notes": "OK"}),
+    }
+    for role, content in responses.items():
+        entry = {"key": f"synthetic-{tier}-{role}", "content": content, "tool_calls": [],
+                 "latency_s": 0.0, "chunks": None}
+        with open(os.path.join(directory, f"{role}.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    return directory
@@ -0,0 +1,309 @@
+"""
+Load test for /api/design/stream: N concurrent SSE clients against a local worker with a replayed LLM.
+
+A uvicorn worker is started in a subprocess with ``LLM_BACKEND=replay`` and synthetic cassettes
+(fixtures.write_cassette), so no network or API key is involved and the model's speed is set by
+``--token-delay-ms``. The spec cache is off, so every request runs the whole pipeline. For each
+concurrency level, that many clients each send ``--requests`` briefs back to back (closed loop);
+the report has p50/p95/p99 time-to-first-event, time-to-first-token and time-to-final, events/s
+and the worker's peak RSS. ``sustained_concurrency`` is the highest level whose p95
+time-to-first-token stays within ``--degrade-factor`` of the single-client p50.
+
+    python -m backend.benchmarks.loadtest --concurrency 1 4 16 64 --out load.json
+    python -m backend.benchmarks.loadtest --compare load-previous.json
+
+``--url`` points the clients at an already running server instead (RSS is then not sampled).
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .bench_startup import REPO_ROOT, git_revision
+from .fixtures import TIERS, make_request, write_cassette
+
+STREAM_PATH = "/api/design/stream"
+
+
+# ====== Worker ======
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_worker(port: int, cassette_dir: str, token_delay_ms: float, max_pipelines: Optional[int]) -> subprocess.Popen:
+    env = dict(os.environ, LLM_BACKEND="replay", LLM_CASSETTE_DIR=cassette_dir,
+               LLM_REPLAY_TOKEN_DELAY_MS=str(token_delay_ms), SPEC_CACHE_ENABLED="false")
+    if max_pipelines:
+        env["MAX_CONCURRENT_PIPELINES"] = str(max_pipelines)
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.api.server:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"], cwd=REPO_ROOT, env=env)
+
+
+async def wait_ready(base_url: str, proc: Optional[subprocess.Popen], timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient() as client:
+        while True:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"worker exited with {proc.returncode} before accepting requests")
+            try:
+                if (await client.get(base_url + "/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"worker at {base_url} not ready after {timeout_s:g}s")
+            await asyncio.sleep(0.1)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process from /proc (Linux); None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def sample_rss(pid: int, peak: List[float], interval_s: float = 0.05) -> None:
+    while True:
+        value = rss_mb(pid)
+        if value is not None:
+            peak[0] = max(peak[0], value)
+        await asyncio.sleep(interval_s)
+
+
+# ====== Clients ======
+async def run_request(client: httpx.AsyncClient, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """POST one brief and read the SSE stream to the end, timing the first event, first token and final."""
+    result: Dict[str, Any] = {"ttfe": None, "ttft": None, "ttf": None, "events": 0, "error": None}
+    start = time.perf_counter()
+    event = None
+    try:
+        async with client.stream("POST", url, json=payload) as response:
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line == "" and event is not None:
+                    # blank line ends a frame
+                    elapsed = time.perf_counter() - start
+                    result["events"] += 1
+                    if result["ttfe"] is None:
+                        result["ttfe"] = elapsed
+                    if event == "token" and result["ttft"] is None:
+                        result["ttft"] = elapsed
+                    elif event == "final":
+                        result["ttf"] = elapsed
+                    elif event == "error":
+                        result["error"] = "error event"
+                    event = None
+    except httpx.HTTPError as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    if result["ttf"] is None and result["error"] is None:
+        result["error"] = "stream ended without a final event"
+    return result
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    if len(values) == 1:
+        return {p: round(values[0] * 1000, 1) for p in ("p50", "p95", "p99")}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(cuts[49] * 1000, 1), "p95": round(cuts[94] * 1000, 1), "p99": round(cuts[98] * 1000, 1)}
+
+
+async def run_level(base_url: str, concurrency: int, requests: int, tier: str, out_root: str,
+                    pid: Optional[int]) -> Dict[str, Any]:
+    url = base_url + STREAM_PATH
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results: List[Dict[str, Any]] = []
+
+    async def client_loop(client: httpx.AsyncClient, n: int) -> None:
+        for i in range(requests):
+            payload = make_request(tier)
+            # distinct briefs and output dirs, so nothing is shared between requests
+            payload["purpose"] += f" (client {n}, request {i})"
+            payload["out_dir"] = os.path.join(out_root, f"c{concurrency}-{n}-{i}")
+            results.append(await run_request(client, url, payload))
+
+    peak = [rss_mb(pid) or 0.0] if pid else [0.0]
+    sampler = asyncio.create_task(sample_rss(pid, peak)) if pid else None
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0), limits=limits) as client:
+            await asyncio.gather(*(client_loop(client, n) for n in range(concurrency)))
+    finally:
+        wall = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+
+    ok = [r for r in results if r["error"] is None]
+    events = sum(r["events"] for r in results)
+    level = {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(ok) / wall, 2),
+        "events_per_s": round(events / wall, 1),
+        "time_to_first_event_ms": _percentiles([r["ttfe"] for r in ok]),
+        "time_to_first_token_ms": _percentiles([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "time_to_final_ms": _percentiles([r["ttf"] for r in ok]),
+        "rss_peak_mb": round(peak[0], 1) if pid else None,
+    }
+    errors = sorted({r["error"] for r in results if r["error"]})
+    if errors:
+        level["error_kinds"] = errors[:5]
+    return level
+
+
+def sustained_concurrency(levels: List[Dict[str, Any]], factor: float) -> Optional[int]:
+    """Highest level whose p95 TTFT is within ``factor`` x the lowest level's p50 (levels stop at the first miss)."""
+    if not levels or levels[0]["time_to_first_token_ms"]["p50"] is None:
+        return None
+    budget = levels[0]["time_to_first_token_ms"]["p50"] * factor
+    sustained = None
+    for level in levels:
+        p95 = level["time_to_first_token_ms"]["p95"]
+        if level["errors"] or p95 is None or p95 > budget:
+            break
+        sustained = level["concurrency"]
+    return sustained
+
+
+# ====== Report ======
+def print_levels(report: Dict[str, Any]) -> None:
+    print(f"{'clients':>7}  {'reqs':>5}  {'err':>4}  {'ttfe p50/p95/p99 ms':>22}  {'ttft p50/p95/p99 ms':>22}  "
+          f"{'final p50/p95/p99 ms':>24}  {'events/s':>9}  {'rss MB':>7}")
+    for level in report["levels"]:
+        cells = []
+        for key in ("time_to_first_event_ms", "time_to_first_token_ms", "time_to_final_ms"):
+            p = level[key]
+            cells.append("/".join("-" if p[q] is None else f"{p[q]:.0f}" for q in ("p50", "p95", "p99")))
+        rss = "-" if level["rss_peak_mb"] is None else f"{level['rss_peak_mb']:.0f}"
+        print(f"{level['concurrency']:>7}  {level['requests']:>5}  {level['errors']:>4}  {cells[0]:>22}  "
+              f"{cells[1]:>22}  {cells[2]:>24}  {level['events_per_s']:>9.1f}  {rss:>7}")
+    print(f"\nsustained concurrency (p95 TTFT <= {report['config']['degrade_factor']:g}x single-client p50): "
+          f"{report['sustained_concurrency']}")
+
+
+def print_comparison(report: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """Per-level change against an earlier report: p95 TTFT, p95 time-to-final, events/s, peak RSS."""
+    before = {level["concurrency"]: level for level in previous["levels"]}
+    print(f"\ncompared with {previous.get('revision') or '-'} ({previous.get('date', '?')}):")
+    print(f"{'clients':>7}  {'ttft p95':>18}  {'final p95':>18}  {'events/s':>16}  {'rss MB':>14}")
+
+    def delta(old: Optional[float], new: Optional[float]) -> str:
+        if old is None or new is None:
+            return "-"
+        change = f" ({(new - old) / old:+.0%})" if old else ""
+        return f"{old:.0f}->{new:.0f}{change}"
+
+    for level in report["levels"]:
+        old = before.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"{level['concurrency']:>7}  "
+              f"{delta(old['time_to_first_token_ms']['p95'], level['time_to_first_token_ms']['p95']):>18}  "
+              f"{delta(old['time_to_final_ms']['p95'], level['time_to_final_ms']['p95']):>18}  "
+              f"{delta(old['events_per_s'], level['events_per_s']):>16}  "
+              f"{delta(old['rss_peak_mb'], level['rss_peak_mb']):>14}")
+
+
+async def run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    proc = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        cassette_dir = write_cassette(os.path.join(workdir, "cassettes"), args.tier, args.scale)
+        port = _free_port()
+        proc = start_worker(port, cassette_dir, args.token_delay_ms, args.max_pipelines)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url, proc)
+        pid = proc.pid if proc is not None else None
+        idle_rss = rss_mb(pid) if pid else None
+        # one untimed request pays the worker's lazy imports and client construction
+        async with httpx.AsyncClient(timeout=None) as client:
+            payload = dict(make_request(args.tier), out_dir=os.path.join(workdir, "warmup"))
+            warmup = await run_request(client, base_url + STREAM_PATH, payload)
+        if warmup["error"]:
+            raise RuntimeError(f"warm-up request failed: {warmup['error']}")
+        levels = []
+        for concurrency in args.concurrency:
+            level = await run_level(base_url, concurrency, args.requests, args.tier, os.path.join(workdir, "out"), pid)
+            levels.append(level)
+            if not args.json:
+                print(f"  {concurrency} clients: {level['wall_s']:.1f}s, {level['errors']} errors", file=sys.stderr)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(REPO_ROOT),
+        "python": sys.version.split()[0],
+        "config": {"url": args.url or None, "tier": args.tier, "scale": args.scale, "requests_per_client": args.requests,
+                   "token_delay_ms": args.token_delay_ms, "max_pipelines": args.max_pipelines,
+                   "degrade_factor": args.degrade_factor},
+        "idle_rss_mb": round(idle_rss, 1) if idle_rss else None,
+        "levels": levels,
+        "sustained_concurrency": sustained_concurrency(levels, args.degrade_factor),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=3, help="requests per client at each level")
+    parser.add_argument("--tier", choices=list(TIERS), default="standard", help="size of the replayed spec")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the replayed spec size (fixtures.make_spec)")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0, help="replayed model's delay per ~4-char token")
+    parser.add_argument("--max-pipelines", type=int, default=None,
+                        help="worker's MAX_CONCURRENT_PIPELINES (default: the worker's setting)")
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    parser.add_argument("--url", default="", help="use a running server instead of starting a worker")
+    parser.add_argument("--out", default="", help="write the JSON report here")
+    parser.add_argument("--compare", default="", help="earlier JSON report to diff against")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = asyncio.run(run(args, workdir))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_levels(report)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
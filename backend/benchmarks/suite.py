@@ -0,0 +1,277 @@
+"""
+Micro-benchmark suite for the non-LLM hot paths, with stored baselines and a regression check.
+
+Every benchmark reports per-call time (best and median of ``--samples`` timed batches, each batch
+sized to last at least ``--min-sample-ms``; batches are interleaved across benchmarks). Spec-driven benchmarks run once per fixture tier
+(simple through enterprise, see fixtures.TIERS).
+
+    python -m backend.benchmarks.suite                 # run and compare with baselines.json
+    python -m backend.benchmarks.suite --check         # same, exit 1 on any regression
+    python -m backend.benchmarks.suite --update        # re-record baselines.json on this machine
+    python -m backend.benchmarks.suite --filter export --list
+
+A benchmark regresses when its best time exceeds the baseline best by more than ``--threshold``
+(default 25%). Both sides are first divided by a calibration workload timed in the same run, so a
+machine that is uniformly faster or slower today doesn't read as a change; baselines are still best
+recorded on the machine you compare on.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..api.streaming import coalesce_tokens, encode_event
+from ..core import exporters
+from ..core.core import (contrast_ratio, pack_schema_for_model, pack_spec_for_agent, pack_user_prompt,
+                         validate_and_fix_palette, validate_spec)
+from ..core.embeddings import DenseIndex
+from ..core.json_repair import repair_json
+from ..core.jsonstream import IncrementalJSONParser
+from ..core.retrieval import BM25Index
+from .bench_docs_search import QUERIES, make_corpus
+from .fixtures import PALETTE, TIERS, make_request, make_spec
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# name -> zero-argument callable to time; filled by the builders below
+Registry = Dict[str, Callable[[], Any]]
+
+
+def _fresh_palette_spec(spec: Dict[str, Any]) -> Callable[[], Dict[str, Any]]:
+    """validate_and_fix_palette mutates colours, so each call gets new palette/aiStates containers."""
+    ds = spec["designSystem"]
+
+    def make():
+        return {"designSystem": {**ds, "palette": dict(ds["palette"]),
+                                 "aiStates": [dict(s) for s in ds["aiStates"]]}}
+    return make
+
+
+def contrast_benches(reg: Registry) -> None:
+    reg["contrast.contrast_ratio"] = lambda: contrast_ratio("#E5E7EB", "#151515")
+    for tier in TIERS:
+        make = _fresh_palette_spec(make_spec(tier))
+        reg[f"contrast.validate_and_fix_palette[{tier}]"] = lambda make=make: validate_and_fix_palette(make())
+
+
+def docs_benches(reg: Registry, workdir: str) -> None:
+    docs = make_corpus(10000)
+    bm25 = BM25Index.build(docs)
+    dense = DenseIndex.create(os.path.join(workdir, "dense"), capacity=len(docs))
+    dense.append(docs)
+    queries = itertools.cycle(QUERIES)
+    reg["docs_search.bm25[10k]"] = lambda: bm25.search(next(queries), 3)
+    reg["docs_search.dense[10k]"] = lambda: dense.search(next(queries), 3)
+
+
+def prompt_benches(reg: Registry) -> None:
+    for tier in ("simple", "enterprise"):
+        payload = make_request(tier)
+        reg[f"prompt.pack_user_prompt[{tier}]"] = lambda payload=payload: pack_user_prompt(**payload)
+    reg["prompt.pack_schema_for_model"] = pack_schema_for_model
+    for tier in ("simple", "enterprise"):
+        spec = make_spec(tier)
+        for agent in ("ops", "engine"):
+            reg[f"prompt.pack_spec_for_agent[{agent}:{tier}]"] = lambda spec=spec, agent=agent: pack_spec_for_agent(spec, agent)
+
+
+def spec_benches(reg: Registry) -> None:
+    for tier in TIERS:
+        spec = make_spec(tier)
+        text = json.dumps(spec)
+        broken = text[:-1] + ",}"          # trailing comma + missing brace: the common LLM slip
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        reg[f"spec.json_loads[{tier}]"] = lambda text=text: json.loads(text)
+        reg[f"spec.validate_spec[{tier}]"] = lambda spec=spec: validate_spec(spec)
+        reg[f"spec.repair_json[{tier}]"] = lambda broken=broken: repair_json(broken)
+
+        def stream_parse(chunks=chunks):
+            parser = IncrementalJSONParser(expand=("designSystem",))
+            for chunk in chunks:
+                parser.feed(chunk)
+        reg[f"spec.incremental_parse[{tier}]"] = stream_parse
+
+
+def export_benches(reg: Registry, workdir: str) -> None:
+    reg["export.emit_layout_tsx"] = lambda: exporters.emit_layout_tsx(PALETTE)
+    reg["export.emit_hero_tsx"] = lambda: exporters.emit_hero_tsx(PALETTE)
+    reg["export.emit_chat_composer_tsx"] = exporters.emit_chat_composer_tsx
+    reg["export.emit_run_timeline_tsx"] = exporters.emit_run_timeline_tsx
+    reg["export.emit_message_bubble_tsx"] = exporters.emit_message_bubble_tsx
+    reg["export.emit_citation_panel_tsx"] = exporters.emit_citation_panel_tsx
+    reg["export.emit_safety_banner_tsx"] = exporters.emit_safety_banner_tsx
+    for tier in TIERS:
+        spec = make_spec(tier)
+        tokens = spec["tailwind"]["configTokens"]
+        out_dir = os.path.join(workdir, f"export-{tier}")
+        reg[f"export.emit_tailwind_config[{tier}]"] = lambda tokens=tokens: exporters.emit_tailwind_config(tokens)
+        reg[f"export.write_project[{tier}]"] = lambda spec=spec, out_dir=out_dir: exporters.write_project(spec, out_dir)
+
+
+def sse_benches(reg: Registry) -> None:
+    token = {"type": "token", "text": '"onSurface": "#E5E7EB",'}
+    phase = {"type": "phase", "text": "agent_ops"}
+    reg["sse.encode_event[token]"] = lambda: encode_event(token)
+    reg["sse.encode_event[phase]"] = lambda: encode_event(phase)
+    for tier in ("simple", "enterprise"):
+        final = {"type": "final", "spec": make_spec(tier)}
+        reg[f"sse.encode_event[final:{tier}]"] = lambda final=final: encode_event(final)
+
+    async def stream(n=500):
+        async def source():
+            for i in range(n):
+                yield {"type": "token", "text": "tok%d " % i}
+        async for event in coalesce_tokens(source(), window_ms=25, max_bytes=4096):
+            encode_event(event)
+    reg["sse.coalesce+encode[500 tokens]"] = lambda: asyncio.run(stream())
+
+
+BUILDERS: List[Tuple[str, Callable[..., None], bool]] = [
+    ("contrast", contrast_benches, False),
+    ("docs_search", docs_benches, True),
+    ("prompt", prompt_benches, False),
+    ("spec", spec_benches, False),
+    ("export", export_benches, True),
+    ("sse", sse_benches, False),
+]
+
+
+def build(workdir: str, pattern: str) -> Registry:
+    reg: Registry = {}
+    for _, builder, needs_dir in BUILDERS:
+        if needs_dir:
+            builder(reg, workdir)
+        else:
+            builder(reg)
+    return {name: fn for name, fn in reg.items() if pattern in name}
+
+
+def _loops_for(fn: Callable[[], Any], min_sample_s: float) -> int:
+    fn()                                   # warm caches / lazy imports
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_sample_s or loops >= 1 << 20:
+            return loops
+        loops *= 2
+
+
+def time_all(registry: Registry, samples: int, min_sample_s: float) -> Dict[str, Dict[str, float]]:
+    """Time every benchmark, interleaved: each round takes one sample of each, so the best-of-N of
+    every benchmark spans the whole run instead of one window of a noisy machine."""
+    loops = {name: _loops_for(fn, min_sample_s) for name, fn in registry.items()}
+    per_call: Dict[str, List[float]] = {name: [] for name in registry}
+    for _ in range(samples):
+        for name, fn in registry.items():
+            n = loops[name]
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            per_call[name].append((time.perf_counter() - start) / n * 1e6)
+    return {name: {"best_us": round(min(v), 3), "median_us": round(statistics.median(v), 3), "loops": loops[name]}
+            for name, v in per_call.items()}
+
+
+def _calibration_work() -> None:
+    # Fixed mix of interpreter, dict and json work; used to cancel out machine-speed drift
+    data = {str(i): [i, i * 0.5, "x" * (i % 7)] for i in range(200)}
+    json.loads(json.dumps(data))
+    sum(i * i for i in range(2000))
+
+
+CALIBRATION = "_calibration"
+
+
+def machine() -> Dict[str, str]:
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "cpu": platform.processor() or platform.machine(),
+            "cpus": str(os.cpu_count())}
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not os.path.exists(BASELINES):
+        return {"machine": {}, "results": {}}
+    with open(BASELINES, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--min-sample-ms", type=float, default=20.0)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any benchmark regressed")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baselines")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build(workdir, args.filter)
+        if args.list:
+            print("\n".join(registry))
+            return
+        registry[CALIBRATION] = _calibration_work
+        results = time_all(registry, args.samples, args.min_sample_ms / 1000)
+        calibration = results.pop(CALIBRATION)["best_us"]
+    base_calibration = baselines.get("calibration_us") or calibration
+    scale = calibration / base_calibration
+
+    regressions = []
+    rows = []
+    for name, result in results.items():
+        base = baselines["results"].get(name)
+        ratio = result["best_us"] / (base["best_us"] * scale) if base and base["best_us"] else None
+        status = "new" if ratio is None else ("REGRESSED" if ratio > 1 + args.threshold else
+                                              "faster" if ratio < 1 - args.threshold else "ok")
+        if status == "REGRESSED":
+            regressions.append(name)
+        rows.append((name, result, base, ratio, status))
+
+    if args.json:
+        print(json.dumps({"machine": machine(), "calibration_us": calibration, "results": results}, indent=2))
+    else:
+        if baselines["machine"] and baselines["machine"] != machine():
+            print(f"note: baselines were recorded on {baselines['machine']}; compare on the same machine\n")
+        print(f"calibration: {calibration:.1f} us (baseline {base_calibration:.1f} us, ratios scaled by {scale:.2f})\n")
+        width = max(len(name) for name, *_ in rows) if rows else 10
+        print(f"{'benchmark':<{width}}  {'best us':>12}  {'median us':>12}  {'baseline':>12}  {'ratio':>6}  status")
+        for name, result, base, ratio, status in rows:
+            print(f"{name:<{width}}  {result['best_us']:>12.3f}  {result['median_us']:>12.3f}  "
+                  f"{(base['best_us'] if base else float('nan')):>12.3f}  "
+                  f"{(ratio if ratio is not None else float('nan')):>6.2f}  {status}")
+
+    if args.update:
+        if args.filter and baselines["results"]:
+            # partial update: rescale into the stored baselines' calibration so old and new entries compare
+            merged = dict(baselines["results"])
+            merged.update({name: {**r, "best_us": round(r["best_us"] / scale, 3),
+                                  "median_us": round(r["median_us"] / scale, 3)} for name, r in results.items()})
+            recorded_calibration = base_calibration
+        else:
+            merged, recorded_calibration = dict(results), calibration
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "date": time.strftime("%Y-%m-%d"),
+                       "calibration_us": round(recorded_calibration, 3), "results": merged}, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"\nwrote {len(merged)} baselines to {BASELINES}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
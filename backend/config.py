@@ -4,7 +4,10 @@ Configuration settings for the UI Design Expert Agent backend.
 
 import os
 from typing import Optional
-from pydantic import BaseSettings
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:  # pydantic v1
+    from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
@@ -20,8 +23,35 @@ class Settings(BaseSettings):
     port: int = 8000
     debug: bool = False
     
-    # OpenAI Settings
+    # OpenAI Settings (clients are built on first request unless warmed in the background at startup)
     openai_api_key: Optional[str] = None
+    llm_warmup: bool = False
+    
+    # LLM Backend Settings (openai | record | replay; replay needs no network or API key)
+    llm_backend: str = "openai"
+    llm_cassette_dir: str = ".cache/cassettes"
+    llm_replay_token_delay_ms: float = 0.0
+    llm_replay_recorded_timing: bool = False
+    
+    # LLM Limiter Settings (live backends: AIMD concurrency limit shared by all LLM calls, retries
+    # honoring Retry-After, circuit breaker; batch work gets at most batch_share of the limit)
+    llm_limiter_enabled: bool = True
+    llm_limit_initial: int = 8
+    llm_limit_max: int = 64
+    llm_limit_batch_share: float = 0.75
+    llm_retries: int = 3
+    llm_breaker_failures: int = 5
+    llm_breaker_reset_s: float = 30.0
+    
+    # Tracing Settings (JSONL span files under trace_dir; empty = off; print with python -m backend.core.tracing)
+    trace_dir: str = ""
+    trace_sample_rate: float = 1.0
+    
+    # Profiling Settings (X-Profile header / ?profile=1 profiles that request; a non-empty token must match)
+    profiling_enabled: bool = False
+    profiling_token: str = ""
+    profiles_dir: str = ".cache/profiles"
+    profiling_interval_ms: float = 5.0
     
     # CORS Settings
     cors_origins: list = [
@@ -34,9 +64,46 @@ class Settings(BaseSettings):
     # Output Settings
     default_output_dir: str = "ui-agent-output"
     
+    # Concurrency Settings (pipelines running at once per worker process)
+    max_concurrent_pipelines: int = 8
+    
+    # Identical concurrent /api/design/stream briefs share one in-flight run
+    singleflight_enabled: bool = True
+    
+    # Background Job Settings (POST /api/design/jobs; event logs and status files under jobs_dir)
+    jobs_dir: str = ".cache/jobs"
+    jobs_workers: int = 2
+    jobs_max_queued: int = 100
+    jobs_keep_finished: int = 100  # finished jobs kept in memory; older ones are read back from disk
+    
+    # Batch Settings (POST /api/design/batch; LLM requests/minute shared by all batches, 0 = unlimited)
+    batch_max_items: int = 100
+    batch_concurrency: int = 4  # default and cap for a batch's own concurrency
+    batch_llm_requests_per_minute: float = 0
+    batch_llm_burst: float = 0  # bucket size; 0 = one second's worth (at least 1)
+    
+    # SSE Settings (token events are merged per window/byte budget; window 0 disables)
+    sse_coalesce_window_ms: float = 25
+    sse_coalesce_max_bytes: int = 4096
+    sse_queue_size: int = 256
+    sse_phase_timings: bool = False  # attach per-phase milliseconds to phase/final events
+    
+    # Docs Search Settings (markdown/JSONL corpus directory, persisted BM25 file, mmap'd semantic index dir)
+    docs_corpus_dir: str = ""
+    docs_index_path: str = ""
+    docs_dense_index_dir: str = ""
+    
+    # Spec Cache Settings (disk tier is shared by all workers; empty dir = memory only)
+    spec_cache_enabled: bool = True
+    spec_cache_dir: str = ".cache/specs"
+    spec_cache_max_entries: int = 256
+    spec_cache_ttl_s: int = 86400
+    spec_cache_max_disk_mb: int = 256
+    
     class Config:
         env_file = ".env.local"
         case_sensitive = False
+        extra = "ignore"
 
 
 # Global settings instance
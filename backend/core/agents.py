@@ -1,136 +1,445 @@
 # design_agent/agents.py
 from __future__ import annotations
-import json
-from typing import Dict, Any, AsyncIterator
+import asyncio, json, sys
+from collections import Counter
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableLambda, RunnableSequence
+from .core import (SYSTEM_BASE, SCHEMA, MODEL, ROLE_TEMPERATURES, OPS_PROMPT, ENGINE_PROMPT, pack_user_prompt, pack_prefetch_prompt, pack_schema_for_model,
+                   pack_spec_for_agent, validate_and_fix_palette, fix_palette, validate_spec, SpecInvalid)
+from .tools import get_tool, prefetch_tools
+from .exporters import awrite_project, write_project
+from .cache import SpecCache, request_key, set_llm_source
+from .jsonstream import IncrementalJSONParser
+from .json_repair import repair_json, repair_stats
+from .validator import failing_sections
+from . import metrics, ratelimit, tracing
+from .limiter import get_limiter
 
-from .core import SYSTEM_BASE, SCHEMA, pack_user_prompt, pack_schema_for_model, validate_and_fix_palette
-from .tools import docs_search, suggest_palette, ai_patterns, safety_rules
-from .exporters import write_project
+# LangChain/OpenAI clients, prompts and the Strategist executor are built on first use (and then
+# reused), so importing this module stays cheap and doesn't need OPENAI_API_KEY. The old
+# module-level names (design_llm, strategist_exec, ...) still resolve through __getattr__.
 
 # ===== LLMs =====
-design_llm = ChatOpenAI(model="gpt-4o-2024-08-06", temperature=0.5)
-ops_llm    = ChatOpenAI(model="gpt-4o-2024-08-06", temperature=0.2)
-engine_llm = ChatOpenAI(model="gpt-4o-2024-08-06", temperature=0.3)
+# openai (live), record (live + cassette files) or replay (cassettes only, no network); see llm_backends
+LLM_BACKENDS = ("openai", "record", "replay")
+_llm_config: Dict[str, Any] = {"backend": "openai", "cassette_dir": ".cache/cassettes",
+                               "token_delay_ms": 0.0, "recorded_timing": False, "limited": True}
+
+def configure_llms(backend: str = "openai", cassette_dir: str = ".cache/cassettes",
+                   token_delay_ms: float = 0.0, recorded_timing: bool = False, limited: bool = True) -> None:
+    """Select the LLM backend; clients and the Strategist are rebuilt on next use.
+
+    With ``limited``, live calls go through the shared adaptive limiter (see limiter.py).
+    """
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"unknown LLM backend {backend!r}; expected one of {', '.join(LLM_BACKENDS)}")
+    _llm_config.update(backend=backend, cassette_dir=cassette_dir,
+                       token_delay_ms=token_delay_ms, recorded_timing=recorded_timing, limited=limited)
+    set_llm_source(backend, cassette_dir)   # replayed specs are cached apart from live ones
+    for factory in (_chat_llm, get_strategist_agent, get_strategist_exec):
+        factory.cache_clear()
+
+def llm_stats() -> Dict[str, Any]:
+    backends = sys.modules.get(__package__ + ".llm_backends")
+    return {"backend": _llm_config["backend"],
+            "cassettes": backends.cassette_stats() if backends is not None else {},
+            "limiter": get_limiter().stats() if _llm_config["limited"] and _llm_config["backend"] != "replay" else None}
+
+@lru_cache(maxsize=None)
+def _chat_llm(role: str):
+    from .llm_backends import make_chat_model
+    callbacks = [metrics.llm_callback(role)]
+    if not (_llm_config["limited"] and _llm_config["backend"] != "replay"):
+        callbacks.insert(0, ratelimit.llm_callback())   # the limiter takes a token per attempt itself
+    return make_chat_model(role, MODEL, ROLE_TEMPERATURES[role], callbacks=callbacks, **_llm_config)
+
+def get_design_llm():
+    return _chat_llm("design")
+
+def get_ops_llm():
+    return _chat_llm("ops")
+
+def get_engine_llm():
+    return _chat_llm("engine")
 
 # ===== Prompts =====
-design_prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_BASE),
-    ("user", "{schema_json}"),
-    ("user", "{user_brief}"),
-    MessagesPlaceholder("agent_scratchpad"),
-])
-
-ops_prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are Agent Ops. Verify safety, latency, and observability. "
-               "Return a short JSON patch with keys you want to add/update under aiSolution and components."),
-    ("user", "Here is the current spec JSON:\n{spec_json}\n"
-             "Suggest minimal changes to include: safety banners, run timeline visibility, and latency hints.")
-])
-
-engine_prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a UI Engineer. Given the approved spec JSON, confirm tokens and file list are buildable. "
-               "Return 'OK' and any minor fixes as a JSON with keys 'notes' and optional 'patch'."),
-    ("user", "Spec JSON:\n{spec_json}")
-])
+@lru_cache(maxsize=None)
+def get_design_prompt():
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_BASE),
+        ("user", "{schema_json}"),
+        ("user", "{user_brief}"),
+        ("user", "{prefetched}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+
+@lru_cache(maxsize=None)
+def get_ops_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", OPS_PROMPT[0]), ("user", OPS_PROMPT[1])])
+
+@lru_cache(maxsize=None)
+def get_engine_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", ENGINE_PROMPT[0]), ("user", ENGINE_PROMPT[1])])
 
 # ===== Tools bound to Strategist agent =====
-strategist_agent = create_openai_tools_agent(
-    llm=design_llm,
-    tools=[docs_search, suggest_palette, ai_patterns, safety_rules],
-    prompt=design_prompt,
-)
-strategist_exec = AgentExecutor(agent=strategist_agent, tools=[docs_search, suggest_palette, ai_patterns, safety_rules], verbose=False)
+# suggest_palette/ai_patterns/safety_rules are prefetched into the prompt (see prefetch_tools),
+# so only docs_search, which depends on what the model wants to look up, stays an agent tool.
+def make_strategist_agent(llm, tools):
+    from langchain.agents import create_openai_tools_agent
+    return create_openai_tools_agent(llm=llm, tools=tools, prompt=get_design_prompt())
 
-# ====== Orchestration (non-streaming pipeline) ======
-def run_pipeline(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Sequential multi-agent orchestration: Strategist -> Ops -> Engineer -> Export."""
-    # 1) Strategist generates spec (may call tools)
-    user_brief = pack_user_prompt(**payload)
-    schema_json = pack_schema_for_model()
-    strategist_out = strategist_exec.invoke({"schema_json": schema_json, "user_brief": user_brief})
-    raw = strategist_out["output"]
-    spec = json.loads(raw) if isinstance(raw, str) else raw
+def make_strategist_exec(agent, tools):
+    """The Strategist's agent loop; benchmarks build it around their own model and tool set."""
+    from .executor import ParallelAgentExecutor
+    # Several tool calls in one step run concurrently, each capped at 20s
+    return ParallelAgentExecutor(agent=agent, tools=tools, verbose=False,
+                                 return_intermediate_steps=True, max_workers=4, tool_timeout_s=20.0)
 
-    # 2) Validate palette contrast + minimal fixes
-    spec = validate_and_fix_palette(spec)
+@lru_cache(maxsize=None)
+def get_strategist_agent():
+    return make_strategist_agent(get_design_llm(), [get_tool("docs_search")])
 
-    # 3) Agent Ops: add safety/latency/observability adjustments
-    ops_txt = ops_prompt.format(spec_json=json.dumps(spec)).to_messages()
-    ops_resp = ops_llm.invoke(ops_txt)
+@lru_cache(maxsize=None)
+def get_strategist_exec():
+    return make_strategist_exec(get_strategist_agent(), [get_tool("docs_search")])
+
+_LAZY = {
+    "design_llm": get_design_llm, "ops_llm": get_ops_llm, "engine_llm": get_engine_llm,
+    "design_prompt": get_design_prompt, "ops_prompt": get_ops_prompt, "engine_prompt": get_engine_prompt,
+    "strategist_agent": get_strategist_agent, "strategist_exec": get_strategist_exec,
+}
+
+def __getattr__(name: str):
+    factory = _LAZY.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
+
+def warm() -> None:
+    """Build every client and the executor now (e.g. in a startup hook) instead of on first request."""
+    for factory in _LAZY.values():
+        factory()
+
+# Strategist runs and model turns (turns/runs is the average round trips per request)
+agent_stats: Counter = Counter()
+
+def count_turns(steps) -> int:
+    """Model turns an AgentExecutor run took: one per tool-calling message, plus the final answer."""
+    messages = {id(action.message_log[-1]) if getattr(action, "message_log", None) else i
+                for i, (action, _) in enumerate(steps)}
+    return len(messages) + 1
+
+def strategist_inputs(payload: Dict[str, Any]) -> Dict[str, str]:
+    return {"schema_json": pack_schema_for_model(), "user_brief": pack_user_prompt(**payload),
+            "prefetched": pack_prefetch_prompt(prefetch_tools(payload))}
+
+# ====== Targeted re-generation of sections that fail SCHEMA ======
+def section_repair_messages(spec: Dict[str, Any], errors: List[Tuple[str, str]]):
+    """Build a prompt that regenerates only the top-level sections with violations."""
+    sections = [k for k in failing_sections(errors) if k in SCHEMA["properties"]]
+    sub_schema = {"type": "object", "required": sections,
+                  "properties": {k: SCHEMA["properties"][k] for k in sections}}
+    problems = "\n".join(f"{pointer}: {message}" for pointer, message in errors[:50])
+    current = json.dumps({k: spec.get(k) for k in sections})
+    return sections, [
+        ("system", "Return ONLY valid JSON that strictly matches the schema below."),
+        ("user", json.dumps({"schema": sub_schema})),
+        ("user", f"Regenerate only these spec sections so they satisfy the schema.\n"
+                 f"Violations:\n{problems}\nCurrent sections JSON:\n{current}"),
+    ]
+
+def merge_sections(spec: Dict[str, Any], content: str, sections: List[str]) -> List[Tuple[str, str]]:
+    """Merge regenerated sections into the spec; return the violations that remain."""
+    try:
+        patch, _ = repair_json(content)
+    except ValueError:
+        patch = None
+    if isinstance(patch, dict):
+        for key in sections:
+            if key in patch:
+                spec[key] = patch[key]
+    return validate_spec(spec)
+
+# ====== Orchestration (non-streaming pipeline) ======
+def apply_ops_patch(spec: Dict[str, Any], content: str) -> bool:
+    """Apply Agent Ops' shallow patch to aiSolution/components; False if it wasn't usable JSON."""
     try:
-        patch = json.loads(ops_resp.content)
-        # apply shallow patch to aiSolution and maybe components
+        patch = json.loads(content)
         ai_sol = spec.get("aiSolution", {})
         ai_sol.update(patch.get("aiSolution", {}))
         spec["aiSolution"] = ai_sol
         if "components" in patch:
             spec["components"].extend(patch["components"])
     except Exception:
-        pass  # ignore if ops didn't return JSON
+        return False
+    return True
+
+def run_pipeline(payload: Dict[str, Any], cache: Optional[SpecCache] = None) -> Dict[str, Any]:
+    """Sequential multi-agent orchestration: Strategist -> Ops -> Engineer -> Export."""
+    with metrics.pipeline_timer("sync") as run, tracing.trace("pipeline", mode="sync", purpose=payload.get("purpose")):
+        result = _run_pipeline(payload, cache, metrics.PhaseClock())
+        if result.get("cached"):
+            run["outcome"] = "cached"
+        return result
+
+def _run_pipeline(payload: Dict[str, Any], cache: Optional[SpecCache], clock: metrics.PhaseClock) -> Dict[str, Any]:
+    key = request_key(payload) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        spec = cached["spec"]
+        clock.start("export")
+        out_dir = write_project(spec, out_dir=payload.get("out_dir", "ui-agent-output"))
+        clock.stop()
+        return {"spec": spec, "out_dir": out_dir, "cached": True}
+
+    # 1) Strategist generates spec (deterministic tools prefetched; may still call docs_search)
+    clock.start("design_strategist")
+    strategist_out = get_strategist_exec().invoke(strategist_inputs(payload), config=tracing.langchain_config())
+    agent_stats["strategist_runs"] += 1
+    agent_stats["strategist_turns"] += count_turns(strategist_out.get("intermediate_steps", []))
+    clock.start("parsing")
+    raw = strategist_out["output"]
+    spec = repair_json(raw)[0] if isinstance(raw, str) else raw
+    errors = validate_spec(spec)
+    if errors:
+        sections, msgs = section_repair_messages(spec, errors)
+        remaining = errors
+        if sections:
+            remaining = merge_sections(spec, get_design_llm().invoke(msgs, config=tracing.langchain_config()).content,
+                                       sections)
+        if remaining:
+            raise SpecInvalid(remaining)
+
+    # 2) Validate palette contrast + minimal fixes
+    clock.start("palette_validation")
+    spec = validate_and_fix_palette(spec)
+
+    # 3) Agent Ops: add safety/latency/observability adjustments
+    clock.start("agent_ops")
+    ops_txt = get_ops_prompt().format_messages(spec_json=pack_spec_for_agent(spec, "ops"))
+    ops_resp = get_ops_llm().invoke(ops_txt, config=tracing.langchain_config())
+    apply_ops_patch(spec, ops_resp.content)  # ignored if ops didn't return JSON
 
     # 4) UI Engineer sanity + export
-    eng_msgs = engine_prompt.format(spec_json=json.dumps(spec)).to_messages()
-    _ = engine_llm.invoke(eng_msgs)  # we won't parse, just trust or log notes
+    clock.start("ui_engineer")
+    eng_msgs = get_engine_prompt().format_messages(spec_json=pack_spec_for_agent(spec, "engine"))
+    _ = get_engine_llm().invoke(eng_msgs, config=tracing.langchain_config())  # we won't parse, just trust or log notes
 
+    if cache is not None:
+        cache.put(key, spec)
+    clock.start("export")
     out_dir = write_project(spec, out_dir=payload.get("out_dir", "ui-agent-output"))
+    clock.stop()
+    return {"spec": spec, "out_dir": out_dir}
+
+async def arun_pipeline(payload: Dict[str, Any], cache: Optional[SpecCache] = None) -> Dict[str, Any]:
+    """Async variant of run_pipeline that never blocks the event loop.
+
+    Ops and Engineer both review the palette-validated spec and run concurrently: Ops only
+    patches aiSolution/components, which the Engineer's token/file-list check doesn't read.
+    """
+    with metrics.pipeline_timer("async") as run, tracing.trace("pipeline", mode="async", purpose=payload.get("purpose")):
+        run["clock"] = clock = metrics.PhaseClock()
+        result = await _arun_pipeline(payload, cache, clock)
+        if result.get("cached"):
+            run["outcome"] = "cached"
+        return result
+
+async def _timed_phase(phase: str, awaitable):
+    with metrics.timer(metrics.PHASE_SECONDS, phase=phase), tracing.span(phase, "phase"):
+        return await awaitable
+
+async def _arun_pipeline(payload: Dict[str, Any], cache: Optional[SpecCache],
+                         clock: metrics.PhaseClock) -> Dict[str, Any]:
+    out_dir = payload.get("out_dir", "ui-agent-output")
+    key = request_key(payload) if cache is not None else None
+    cached = await cache.aget(key) if cache is not None else None
+    if cached is not None:
+        spec = cached["spec"]
+        clock.start("export")
+        out_dir = await awrite_project(spec, out_dir)
+        clock.stop()
+        return {"spec": spec, "out_dir": out_dir, "cached": True}
+
+    # 1) Strategist generates spec (deterministic tools prefetched; may still call docs_search)
+    clock.start("design_strategist")
+    strategist_out = await get_strategist_exec().ainvoke(strategist_inputs(payload), config=tracing.langchain_config())
+    agent_stats["strategist_runs"] += 1
+    agent_stats["strategist_turns"] += count_turns(strategist_out.get("intermediate_steps", []))
+    clock.start("parsing")
+    raw = strategist_out["output"]
+    spec = repair_json(raw)[0] if isinstance(raw, str) else raw
+    errors = validate_spec(spec)
+    if errors:
+        sections, msgs = section_repair_messages(spec, errors)
+        remaining = errors
+        if sections:
+            fix = await get_design_llm().ainvoke(msgs, config=tracing.langchain_config())
+            remaining = merge_sections(spec, fix.content, sections)
+        if remaining:
+            raise SpecInvalid(remaining)
+
+    # 2) Validate palette contrast + minimal fixes
+    clock.start("palette_validation")
+    spec = validate_and_fix_palette(spec)
+
+    # 3+4) Agent Ops and UI Engineer in parallel (each timed on its own, not as a clock phase)
+    clock.start("agent_ops+ui_engineer", timed=False)
+    ops_msgs = get_ops_prompt().format_messages(spec_json=pack_spec_for_agent(spec, "ops"))
+    eng_msgs = get_engine_prompt().format_messages(spec_json=pack_spec_for_agent(spec, "engine"))
+    ops_resp, _ = await asyncio.gather(
+        _timed_phase("agent_ops", get_ops_llm().ainvoke(ops_msgs, config=tracing.langchain_config())),
+        _timed_phase("ui_engineer", get_engine_llm().ainvoke(eng_msgs, config=tracing.langchain_config())),
+    )
+    apply_ops_patch(spec, ops_resp.content)
+
+    if cache is not None:
+        await cache.aput(key, spec)
+    clock.start("export")
+    out_dir = await awrite_project(spec, out_dir)
+    clock.stop()
     return {"spec": spec, "out_dir": out_dir}
 
 # ====== Streaming Orchestration for UI (yields events) ======
-async def astream_pipeline(payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
-    """Yield small JSON events suitable for SSE."""
+# Events that depend on the individual request and are never replayed from cache
+_NON_REPLAYED = {"token", "section", "export", "final"}
+
+async def astream_pipeline(payload: Dict[str, Any], cache: Optional[SpecCache] = None,
+                           timings: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Yield small JSON events suitable for SSE.
+
+    With a ``cache``, a hit re-emits the recorded phase/status events instantly and skips the LLM chain.
+    With ``timings``, ``phase`` and ``final`` events carry the milliseconds of each phase finished so far.
+    """
+    with metrics.pipeline_timer("stream") as run, tracing.trace("pipeline", mode="stream", purpose=payload.get("purpose")):
+        run["clock"] = clock = metrics.PhaseClock()
+        # each stage closes the one it reads from, so a disconnect stops the LLM stream right away
+        async with aclosing(_astream_cached(payload, cache, clock, timings)) as events:
+            async for event in events:
+                if event["type"] == "status" and event["text"] == "cache_hit":
+                    run["outcome"] = "cached"
+                yield event
+
+async def _astream_cached(payload: Dict[str, Any], cache: Optional[SpecCache], clock: metrics.PhaseClock,
+                          timings: bool) -> AsyncIterator[Dict[str, Any]]:
+    if cache is None:
+        async with aclosing(_astream_generate(payload, clock, timings)) as events:
+            async for event in events:
+                yield event
+        return
+
+    key = request_key(payload)
+    cached = await cache.aget(key)
+    if cached is not None:
+        yield {"type": "status", "text": "cache_hit"}
+        for event in cached["events"]:
+            yield event
+        clock.start("export")
+        out_dir = await awrite_project(cached["spec"], payload.get("out_dir","ui-agent-output"))
+        yield {"type":"export", "text": out_dir}
+        yield _final_event(cached["spec"], clock, timings)
+        return
+
+    replay = []
+    async with aclosing(_astream_generate(payload, clock, timings)) as events:
+        async for event in events:
+            if event["type"] == "final":
+                await cache.aput(key, event["spec"], replay)
+            elif event["type"] not in _NON_REPLAYED:
+                # timings describe this run, not the replay
+                replay.append({k: v for k, v in event.items() if k != "timings"})
+            yield event
+
+def _phase_event(name: str, clock: metrics.PhaseClock, timings: bool, timed_as: Optional[str] = None) -> Dict[str, Any]:
+    done = clock.start(timed_as or name)
+    event = {"type": "phase", "text": name}
+    if timings:
+        event["timings"] = done
+    return event
+
+def _final_event(spec: Dict[str, Any], clock: metrics.PhaseClock, timings: bool) -> Dict[str, Any]:
+    done = clock.stop()
+    event = {"type": "final", "spec": spec}
+    if timings:
+        event["timings"] = done
+    return event
+
+async def _astream_generate(payload: Dict[str, Any], clock: metrics.PhaseClock,
+                            timings: bool = False) -> AsyncIterator[Dict[str, Any]]:
     yield {"type": "status", "text": "starting"}
 
     # Strategist (stream tokens)
-    user_brief = pack_user_prompt(**payload)
-    schema_json = pack_schema_for_model()
-    messages = design_prompt.format_messages(schema_json=schema_json, user_brief=user_brief, agent_scratchpad=[])
-    yield {"type":"phase", "text":"design_strategist"}
-
-    # token stream from LLM (as text; at end we parse JSON)
-    json_text = ""
-    async for event in design_llm.astream_events(messages, version="v1"):
-        if event["event"] == "on_chat_model_stream":
-            chunk = event["data"]["chunk"].content or ""
-            json_text += chunk
+    yield _phase_event("design_strategist", clock, timings)
+    inputs = strategist_inputs(payload)
+    schema_json = inputs["schema_json"]
+    messages = get_design_prompt().format_messages(**inputs, agent_scratchpad=[])
+    agent_stats["strategist_runs"] += 1
+    agent_stats["strategist_turns"] += 1
+
+    # token stream from LLM; top-level sections are reported as soon as they close. Plain astream:
+    # astream_events(v1) added ~0.75ms of callback bookkeeping per token.
+    parser = IncrementalJSONParser(expand=("designSystem",))
+    async with aclosing(get_design_llm().astream(messages, config=tracing.langchain_config())) as stream:
+        async for message in stream:
+            chunk = message.content or ""
             yield {"type": "token", "text": chunk}
+            for path, value in parser.feed(chunk):
+                if path == "designSystem.palette" and isinstance(value, dict):
+                    # audited the moment it closes; the full spec is re-checked after parsing
+                    yield {"type": "section", "path": path, "value": value, "contrast": fix_palette(value)}
+                else:
+                    yield {"type": "section", "path": path, "value": value}
+    json_text = parser.text()
+    clock.start("parsing")
     yield {"type": "status", "text": "parsing"}
     try:
-        spec = json.loads(json_text)
-    except Exception:
-        # Fallback: ask the model to reformat as strict JSON
-        fix = await design_llm.ainvoke([
+        spec, repairs = repair_json(json_text)
+        if repairs:
+            yield {"type": "repair", "via": "local", "applied": repairs}
+    except ValueError:
+        # Residue the local repair can't handle: ask the model to reformat as strict JSON
+        repair_stats["llm_fallbacks"] += 1
+        fix = await get_design_llm().ainvoke([
             ("system","Return ONLY valid JSON that strictly matches the schema below."),
             ("user", schema_json),
             ("user", f"Fix this into valid JSON:\n{json_text}")
-        ])
-        spec = json.loads(fix.content)
+        ], config=tracing.langchain_config())
+        spec, repairs = repair_json(fix.content)
+        yield {"type": "repair", "via": "llm", "applied": repairs}
+
+    # Schema check; only the failing sections are sent back for re-generation
+    errors = validate_spec(spec)
+    if errors:
+        sections, msgs = section_repair_messages(spec, errors)
+        remaining = errors
+        if sections:
+            fix = await get_design_llm().ainvoke(msgs, config=tracing.langchain_config())
+            remaining = merge_sections(spec, fix.content, sections)
+        yield {"type": "validation", "sections": sections,
+               "errors": [{"path": p, "message": m} for p, m in errors[:50]],
+               "remaining": len(remaining)}
+        if remaining:
+            raise SpecInvalid(remaining)
 
     # Validate contrast
+    clock.start("palette_validation")
     spec = validate_and_fix_palette(spec)
-    yield {"type":"phase", "text":"agent_ops"}
+    yield _phase_event("agent_ops", clock, timings)
 
     # Ops pass
-    ops_msgs = ops_prompt.format(spec_json=json.dumps(spec)).to_messages()
-    ops_resp = await ops_llm.ainvoke(ops_msgs)
-    try:
-        patch = json.loads(ops_resp.content)
-        ai_sol = spec.get("aiSolution", {})
-        ai_sol.update(patch.get("aiSolution", {}))
-        spec["aiSolution"] = ai_sol
-        if "components" in patch:
-            spec["components"].extend(patch["components"])
-        yield {"type":"ops_patch", "text":"applied"}
-    except Exception:
-        yield {"type":"ops_patch", "text":"none"}
+    ops_msgs = get_ops_prompt().format_messages(spec_json=pack_spec_for_agent(spec, "ops"))
+    ops_resp = await get_ops_llm().ainvoke(ops_msgs, config=tracing.langchain_config())
+    applied = apply_ops_patch(spec, ops_resp.content)
+    yield {"type":"ops_patch", "text":"applied" if applied else "none"}
 
-    # Engineer & export
-    yield {"type":"phase", "text":"ui_engineer"}
-    out_dir = write_project(spec, out_dir=payload.get("out_dir","ui-agent-output"))
+    # Engineer & export (no Engineer model call when streaming, so the phase is the export)
+    yield _phase_event("ui_engineer", clock, timings, timed_as="export")
+    out_dir = await awrite_project(spec, payload.get("out_dir","ui-agent-output"))
     yield {"type":"export", "text": out_dir}
 
-    yield {"type":"final", "spec": spec}
+    yield _final_event(spec, clock, timings)
@@ -0,0 +1,65 @@
+# design_agent/batch.py
+from __future__ import annotations
+import asyncio, os, time
+from collections import Counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .limiter import llm_priority
+from .ratelimit import TokenBucket, limit_llm_requests
+
+# Many briefs run with at most ``concurrency`` pipelines at a time; their LLM requests share an
+# optional token bucket and run at batch priority (see limiter.py). One item failing doesn't stop
+# the others: every item ends in an "item" event (status ok or error), emitted in completion order,
+# and the batch in a "summary" event.
+
+def distinct_out_dirs(payloads: List[Dict[str, Any]], default: str = "ui-agent-output") -> List[Dict[str, Any]]:
+    """Copies of ``payloads`` in which items sharing an out_dir write to ``<out_dir>/item-<index>`` instead."""
+    counts = Counter(p.get("out_dir") or default for p in payloads)
+    out = []
+    for index, payload in enumerate(payloads):
+        out_dir = payload.get("out_dir") or default
+        if counts[out_dir] > 1:
+            out_dir = os.path.join(out_dir, f"item-{index:03d}")
+        out.append(dict(payload, out_dir=out_dir))
+    return out
+
+async def arun_batch(payloads: List[Dict[str, Any]],
+                     run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                     concurrency: int = 4,
+                     bucket: Optional[TokenBucket] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``run(payload)`` (e.g. arun_pipeline) for every payload and yield per-item events as they finish.
+
+    Items that share an out_dir get their own subdirectory (distinct_out_dirs). Closing the
+    generator early cancels the items still running or waiting.
+    """
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def item(index: int, payload: Dict[str, Any]) -> None:
+        async with slots:
+            began = time.perf_counter()
+            event: Dict[str, Any] = {"type": "item", "index": index}
+            try:
+                with limit_llm_requests(bucket), llm_priority("batch"):
+                    result = await run(payload)
+                event.update(status="ok", out_dir=result["out_dir"], cached=bool(result.get("cached")),
+                             spec=result["spec"])
+            except Exception as exc:
+                event.update(status="error", error=f"{type(exc).__name__}: {exc}")
+            event["seconds"] = round(time.perf_counter() - began, 3)
+        done.put_nowait(event)
+
+    tasks = [asyncio.create_task(item(i, payload)) for i, payload in enumerate(distinct_out_dirs(payloads))]
+    failed = 0
+    try:
+        for _ in tasks:
+            event = await done.get()
+            failed += event["status"] == "error"
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    yield {"type": "summary", "total": len(payloads), "ok": len(payloads) - failed, "failed": failed,
+           "seconds": round(time.perf_counter() - start, 3)}
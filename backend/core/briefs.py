@@ -0,0 +1,18 @@
+# design_agent/briefs.py
+from __future__ import annotations
+from pydantic import BaseModel
+
+class DesignRequest(BaseModel):
+    """One design brief; the API endpoints and the CLI validate and default payloads with it."""
+    purpose: str
+    audience: str
+    tone: str
+    subject: str
+    brand: str = ""
+    constraints: str = ""
+    ai_use_cases: str = ""
+    latency_budget: int = 2000
+    needs_citations: str = "false"
+    safety_level: str = "moderate"
+    telemetry_opt_in: str = "off"
+    out_dir: str = "ui-agent-output"
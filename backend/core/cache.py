@@ -0,0 +1,248 @@
+# design_agent/cache.py
+from __future__ import annotations
+import asyncio, hashlib, json, os, tempfile, threading, time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .core import (SYSTEM_BASE, USER_TEMPLATE, PREFETCH_TEMPLATE, SCHEMA, OPS_PROMPT, ENGINE_PROMPT,
+                   MODEL, ROLE_TEMPERATURES)
+
+# Bump when the cached payload layout changes; prompt/schema/model edits are picked up automatically.
+CACHE_FORMAT_VERSION = 1
+AGENT_PROMPTS = (SYSTEM_BASE, USER_TEMPLATE, PREFETCH_TEMPLATE) + OPS_PROMPT + ENGINE_PROMPT
+
+def prompt_version(model: str = MODEL, temperatures: Dict[str, float] = ROLE_TEMPERATURES,
+                   prompts: Tuple[str, ...] = AGENT_PROMPTS) -> str:
+    """Hash of everything besides the request that shapes a spec: every agent's prompts, the schema,
+    the model and the per-role temperatures."""
+    blob = json.dumps({"prompts": list(prompts), "schema": SCHEMA, "model": model, "temperatures": temperatures},
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+PROMPT_VERSION = prompt_version()
+
+# Where specs come from: "live" (openai and record both call the model) or "replay:<cassette dir>".
+# Set by agents.configure_llms so replayed output is never served to live requests or vice versa.
+_llm_source = "live"
+
+def set_llm_source(backend: str, cassette_dir: str = "") -> None:
+    global _llm_source
+    _llm_source = f"replay:{os.path.abspath(cassette_dir)}" if backend == "replay" else "live"
+
+# Fields that only affect where output is written, not what gets generated
+KEY_EXCLUDE = frozenset({"out_dir"})
+
+# Other workers write to the same directory, so the running size estimate is re-checked by a full
+# scan at least this often (and whenever it says the budget is exceeded)
+DISK_RESCAN_S = 60.0
+
+def _normalize(value: Any) -> str:
+    return " ".join(str(value).split())
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Content hash of a DesignRequest payload (minus out_dir), the prompt version and the LLM source."""
+    fields = {k: _normalize(v) for k, v in payload.items() if k not in KEY_EXCLUDE}
+    blob = json.dumps({"fmt": CACHE_FORMAT_VERSION, "prompt": PROMPT_VERSION, "llm": _llm_source, "req": fields},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SpecCache:
+    """Two-tier cache of generated specs: in-process LRU in front of a directory shared by workers.
+
+    Entries are ``{"spec": ..., "events": [...]}`` where ``events`` are the non-token stream
+    events recorded on the original run, so ``/api/design/stream`` can replay them. Async callers
+    use aget/aput, which keep disk I/O off the event loop.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 256,
+                 ttl_s: float = 24 * 3600, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_disk_bytes = max_disk_bytes
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.evictions = {"memory": 0, "disk": 0, "expired": 0}
+        self._disk_bytes: Optional[int] = None   # estimated size of cache_dir since the last scan
+        self._scanned_at = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # ----- public API -----
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        blob = self._mem_get(key, now)
+        if blob is None:
+            blob = self._load(key, now)
+        return None if blob is None else json.loads(blob)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() for the event loop: memory hits are answered inline, disk reads run in a thread."""
+        now = time.time()
+        blob = self._mem_get(key, now)
+        if blob is None:
+            blob = await asyncio.to_thread(self._load, key, now) if self.cache_dir else self._load(key, now)
+        return None if blob is None else json.loads(blob)
+
+    def put(self, key: str, spec: Dict[str, Any], events: Optional[list] = None) -> None:
+        created, blob = self._store(key, spec, events)
+        self._disk_put(key, created, blob)
+
+    async def aput(self, key: str, spec: Dict[str, Any], events: Optional[list] = None) -> None:
+        """put() for the event loop: the disk write (and any budget trim) runs in a thread."""
+        created, blob = self._store(key, spec, events)
+        if self.cache_dir:
+            await asyncio.to_thread(self._disk_put, key, created, blob)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    self._unlink(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.hits["memory"] + self.hits["disk"]
+            lookups = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": dict(self.evictions),
+                "memory_entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.cache_dir),
+            }
+
+    # ----- memory tier -----
+    def _mem_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is None:
+                return None
+            created, blob = item
+            if now - created <= self.ttl_s:
+                self._mem.move_to_end(key)
+                self.hits["memory"] += 1
+                return blob
+            del self._mem[key]
+            self.evictions["expired"] += 1
+        return None
+
+    def _load(self, key: str, now: float) -> Optional[str]:
+        """Disk lookup after a memory miss; a hit is promoted to the memory tier."""
+        found = self._disk_get(key, now)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            created, blob = found
+            self.hits["disk"] += 1
+            self._mem_put(key, created, blob)
+        return blob
+
+    def _store(self, key: str, spec: Dict[str, Any], events: Optional[list]) -> Tuple[float, str]:
+        created = time.time()
+        blob = json.dumps({"spec": spec, "events": events or []}, separators=(",", ":"))
+        with self._lock:
+            self._mem_put(key, created, blob)
+        return created, blob
+
+    def _mem_put(self, key: str, created: float, blob: str) -> None:
+        self._mem[key] = (created, blob)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions["memory"] += 1
+
+    # ----- disk tier -----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                created = float(f.readline())
+                blob = f.read()
+        except (OSError, ValueError):
+            return None
+        if now - created > self.ttl_s:
+            self._unlink(path)
+            with self._lock:
+                self.evictions["expired"] += 1
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last-access time for size eviction
+        except OSError:
+            pass
+        return created, blob
+
+    def _disk_put(self, key: str, created: float, blob: str) -> None:
+        if not self.cache_dir:
+            return
+        # write-then-rename so concurrent workers never observe a half-written entry
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f"{created}\n")
+                f.write(blob)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+        except OSError:
+            self._unlink(tmp)
+            return
+        # the directory is only scanned when the running estimate says it's over budget, or on a timer
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            due = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                   or time.monotonic() - self._scanned_at > DISK_RESCAN_S)
+        if due:
+            self._enforce_disk_budget()
+
+    def _enforce_disk_budget(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total > self.max_disk_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                if self._unlink(path):
+                    total -= size
+                    with self._lock:
+                        self.evictions["disk"] += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._scanned_at = time.monotonic()
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,299 @@
+# design_agent/contrast.py
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 8-bit sRGB channel -> linear light, so luminance is a table lookup plus a dot product
+_LIN_LUT = np.array([(u / 12.92) if u <= 0.04045 else ((u + 0.055) / 1.055) ** 2.4
+                     for u in (i / 255.0 for i in range(256))])
+_WEIGHTS = np.array([0.2126, 0.7152, 0.0722])
+
+TEXT_LEVEL = 4.5      # WCAG AA normal text
+UI_LEVEL = 3.0        # WCAG AA large text / non-text UI (1.4.11)
+
+BACKGROUND_KEYS = ("bg", "surface")
+# Text tokens and the surface each one sits on
+TEXT_PAIRS = (("onBg", "bg"), ("onSurface", "surface"), ("onPrimary", "primary"))
+_TEXT_KEYS = {fg for fg, _ in TEXT_PAIRS} | set(BACKGROUND_KEYS)
+
+
+def normalize_hex(color: str) -> Optional[str]:
+    """``#RGB``/``#RRGGBB`` (with or without '#') -> ``RRGGBB``; None if not a hex color."""
+    if not isinstance(color, str):
+        return None
+    h = color.strip().lstrip("#")
+    if len(h) == 3:
+        h = "".join(c * 2 for c in h)
+    if len(h) != 6:
+        return None
+    try:
+        int(h, 16)
+    except ValueError:
+        return None
+    return h.upper()
+
+
+def parse_hex(colors: Sequence[str]) -> np.ndarray:
+    """Parse normalized ``RRGGBB`` strings into an (n, 3) uint8 array in one call."""
+    if not colors:
+        return np.zeros((0, 3), dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex("".join(colors)), dtype=np.uint8).reshape(-1, 3)
+
+
+def luminances(rgb: np.ndarray) -> np.ndarray:
+    return _LIN_LUT[rgb] @ _WEIGHTS
+
+
+def ratios(lum_a: np.ndarray, lum_b: np.ndarray) -> np.ndarray:
+    """Elementwise (broadcasting) WCAG contrast ratio between two luminance arrays."""
+    hi = np.maximum(lum_a, lum_b)
+    lo = np.minimum(lum_a, lum_b)
+    return (hi + 0.05) / (lo + 0.05)
+
+
+def _states(ai_states: Optional[Iterable[Any]]) -> List[Dict[str, Any]]:
+    return [s for s in ai_states or () if isinstance(s, dict) and "color" in s]
+
+
+def palette_colors(pal: Dict[str, Any], ai_states: Optional[Iterable[Dict[str, Any]]] = None
+                   ) -> Tuple[List[str], List[str], List[str]]:
+    """Return (names, normalized hex, invalid names) for palette keys plus ``aiStates.<name>``."""
+    names, hexes, invalid = [], [], []
+    items = list(pal.items())
+    items.extend((f"aiStates.{s.get('name', i)}", s["color"]) for i, s in enumerate(_states(ai_states)))
+    for name, color in items:
+        h = normalize_hex(color)
+        if h is None:
+            invalid.append(name)
+        else:
+            names.append(name)
+            hexes.append(h)
+    return names, hexes, invalid
+
+
+def _matrix(hexes: Sequence[str]) -> np.ndarray:
+    lum = luminances(parse_hex(hexes))
+    return ratios(lum[:, None], lum[None, :])
+
+
+def contrast_matrix(pal: Dict[str, Any], ai_states=None) -> Tuple[List[str], np.ndarray]:
+    """Full colour x colour contrast matrix for a palette, computed in one shot."""
+    names, hexes, _ = palette_colors(pal, ai_states)
+    return names, _matrix(hexes)
+
+
+def audit_rules(names: Iterable[str]) -> List[Tuple[str, str, float]]:
+    """(foreground, background, required ratio) pairs that apply to a set of colour names."""
+    present = set(names)
+    rules = [(fg, bg, TEXT_LEVEL) for fg, bg in TEXT_PAIRS if fg in present and bg in present]
+    for fg in names:
+        if fg in _TEXT_KEYS:
+            continue
+        for bg in BACKGROUND_KEYS:
+            if bg in present:
+                rules.append((fg, bg, UI_LEVEL))
+    return rules
+
+
+def audit_palette(pal: Dict[str, Any], ai_states=None) -> Dict[str, Any]:
+    """Check every applicable foreground/background pair; return the failing ones."""
+    names, hexes, invalid = palette_colors(pal, ai_states)
+    matrix = _matrix(hexes)
+    index = {n: i for i, n in enumerate(names)}
+    rules = audit_rules(names)
+    failures = []
+    if rules:
+        fi = np.fromiter((index[fg] for fg, _, _ in rules), dtype=np.intp, count=len(rules))
+        bi = np.fromiter((index[bg] for _, bg, _ in rules), dtype=np.intp, count=len(rules))
+        need = np.fromiter((lvl for _, _, lvl in rules), dtype=float, count=len(rules))
+        got = matrix[fi, bi]
+        for k in np.nonzero(got < need)[0]:
+            fg, bg, lvl = rules[k]
+            failures.append({"fg": fg, "bg": bg, "fgColor": "#" + hexes[fi[k]], "bgColor": "#" + hexes[bi[k]],
+                             "ratio": round(float(got[k]), 2), "required": lvl})
+    return {"checked": len(rules), "failures": failures, "invalid": invalid}
+
+
+def _fast_hex(values: List[Any]) -> Optional[str]:
+    """Concatenated ``RRGGBB`` for values that are all ``#RRGGBB``; None if any needs normalizing."""
+    try:
+        joined = "".join(values)
+    except TypeError:
+        return None
+    n = len(values)
+    if len(joined) != 7 * n or joined[::7] != "#" * n:
+        return None
+    packed = joined.replace("#", "")
+    return packed if len(packed) == 6 * n else None
+
+
+def audit_specs(specs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Audit many stored specs at once.
+
+    Specs are grouped by palette layout (keys + number of aiStates); each group is parsed as
+    one (specs, colours, 3) array and every rule of every spec is checked in one vectorized pass.
+    """
+    results: List[Dict[str, Any]] = [{"checked": 0, "failures": [], "invalid": []} for _ in specs]
+    groups: Dict[Tuple, List[Tuple[int, List[str], str]]] = {}
+    slow: List[int] = []
+    for n, spec in enumerate(specs):
+        ds = spec.get("designSystem", {})
+        pal = ds.get("palette", {})
+        states = _states(ds.get("aiStates"))
+        values = list(pal.values()) + [s["color"] for s in states]
+        packed = _fast_hex(values)
+        if packed is None:
+            slow.append(n)
+            continue
+        groups.setdefault((tuple(pal), len(states)), []).append((n, states, packed))
+
+    for (keys, n_states), members in groups.items():
+        try:
+            rgb = np.frombuffer(bytes.fromhex("".join(m[2] for m in members)), dtype=np.uint8)
+        except ValueError:
+            slow.extend(m[0] for m in members)
+            continue
+        layout = list(keys) + [f"aiStates.{i}" for i in range(n_states)]
+        index = {name: i for i, name in enumerate(layout)}
+        rules = audit_rules(layout)
+        for n, _, _ in members:
+            results[n]["checked"] = len(rules)
+        if not rules:
+            continue
+        fi = np.array([index[fg] for fg, _, _ in rules], dtype=np.intp)
+        bi = np.array([index[bg] for _, bg, _ in rules], dtype=np.intp)
+        need = np.array([lvl for _, _, lvl in rules])
+        lum = luminances(rgb.reshape(len(members), len(layout), 3))
+        got = ratios(lum[:, fi], lum[:, bi])
+        rows, cols = np.nonzero(got < need)
+        names_of: Dict[int, List[str]] = {}
+        for g, r, ratio in zip(rows.tolist(), cols.tolist(), np.round(got[rows, cols], 2).tolist()):
+            n, states, packed = members[g]
+            f, b = fi[r], bi[r]
+            names = names_of.get(g)
+            if names is None:
+                names = names_of[g] = list(keys) + [f"aiStates.{s.get('name', i)}" for i, s in enumerate(states)]
+            results[n]["failures"].append({
+                "fg": names[f], "bg": names[b],
+                "fgColor": "#" + packed[6 * f:6 * f + 6], "bgColor": "#" + packed[6 * b:6 * b + 6],
+                "ratio": ratio, "required": rules[r][2]})
+
+    for n in sorted(slow):
+        ds = specs[n].get("designSystem", {})
+        results[n] = audit_palette(ds.get("palette", {}), ds.get("aiStates"))
+    return results
+
+
+# ====== Perceptual correction (OKLab / OKLCH) ======
+_M1 = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                [0.2119034982, 0.6806995451, 0.1073969566],
+                [0.0883024619, 0.2817188376, 0.6299787005]])
+_M2 = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                [1.9779984951, -2.4285922050, 0.4505937099],
+                [0.0259040371, 0.7827717662, -0.8086757660]])
+_M2_INV = np.linalg.inv(_M2)
+_M1_INV = np.linalg.inv(_M1)
+
+# Candidate grid around each colour: every lightness, progressively less chroma, small hue shifts
+_GRID_L = np.linspace(0.0, 1.0, 101)
+_GRID_CHROMA = np.array([1.0, 0.9, 0.8, 0.65, 0.5, 0.35, 0.2, 0.0])
+_GRID_HUE = np.radians([0.0, -4.0, 4.0, -8.0, 8.0])
+
+
+def srgb8_to_oklab(rgb: np.ndarray) -> np.ndarray:
+    lms = _LIN_LUT[rgb] @ _M1.T
+    return np.cbrt(lms) @ _M2.T
+
+
+def oklab_to_linear(lab: np.ndarray) -> np.ndarray:
+    return ((lab @ _M2_INV.T) ** 3) @ _M1_INV.T
+
+
+def _encode(lin: np.ndarray) -> np.ndarray:
+    lin = np.clip(lin, 0.0, 1.0)
+    srgb = np.where(lin <= 0.0031308, 12.92 * lin, 1.055 * np.power(lin, 1 / 2.4) - 0.055)
+    return np.rint(srgb * 255.0).astype(np.uint8)
+
+
+def nearest_passing(colors: Sequence[str], constraints: Sequence[Sequence[Tuple[str, float]]]
+                    ) -> List[Optional[str]]:
+    """For each colour, the perceptually closest colour meeting all of its (background, ratio) constraints.
+
+    All colours are solved together: a shared OKLCH candidate grid is built around every colour,
+    gamut-mapped to 8-bit sRGB, and the passing candidate with the smallest OKLab distance wins.
+    Returns ``#RRGGBB`` per colour, or None when no candidate in the grid passes.
+    """
+    n = len(colors)
+    if n == 0:
+        return []
+    width = max(len(c) for c in constraints) or 1
+    bg_lum = np.zeros((n, width))
+    need = np.zeros((n, width))   # padding needs ratio >= 0, which always holds
+    for i, pairs in enumerate(constraints):
+        if pairs:
+            bg_lum[i, :len(pairs)] = luminances(parse_hex([normalize_hex(bg) for bg, _ in pairs]))
+            need[i, :len(pairs)] = [lvl for _, lvl in pairs]
+
+    origin = srgb8_to_oklab(parse_hex([normalize_hex(c) for c in colors]))          # (n, 3)
+    chroma = np.hypot(origin[:, 1], origin[:, 2])
+    hue = np.arctan2(origin[:, 2], origin[:, 1])
+    L, C, H = np.meshgrid(_GRID_L, _GRID_CHROMA, _GRID_HUE, indexing="ij")
+    L, C, H = L.ravel(), C.ravel(), H.ravel()                                        # (k,)
+    cand_c = chroma[:, None] * C[None, :]
+    cand_h = hue[:, None] + H[None, :]
+    lab = np.stack([np.broadcast_to(L, cand_c.shape), cand_c * np.cos(cand_h), cand_c * np.sin(cand_h)], axis=-1)
+
+    lin = oklab_to_linear(lab)                                                       # (n, k, 3)
+    in_gamut = np.all((lin >= -1e-4) & (lin <= 1 + 1e-4), axis=-1)
+    rgb = _encode(lin)
+    lum = _LIN_LUT[rgb] @ _WEIGHTS                                                   # (n, k)
+    passes = np.all(ratios(lum[:, :, None], bg_lum[:, None, :]) >= need[:, None, :], axis=-1) & in_gamut
+    dist = np.sum((srgb8_to_oklab(rgb) - origin[:, None, :]) ** 2, axis=-1)
+    dist[~passes] = np.inf
+    best = np.argmin(dist, axis=1)
+
+    out: List[Optional[str]] = []
+    for i in range(n):
+        if np.isinf(dist[i, best[i]]):
+            out.append(None)
+        else:
+            out.append("#%02X%02X%02X" % tuple(int(v) for v in rgb[i, best[i]]))
+    return out
+
+
+def correct_palette(pal: Dict[str, Any], ai_states=None, failures: Optional[List[Dict[str, Any]]] = None
+                    ) -> List[Dict[str, Any]]:
+    """Replace every failing foreground with its nearest passing colour, in place.
+
+    A corrected colour has to satisfy every rule it takes part in as a foreground, not just the
+    failing one. Colours that are also a background (``primary`` under ``onPrimary``) are solved
+    first; the text on them is then re-audited and solved against their corrected values.
+    Returns ``{"fg", "from", "to"}`` per corrected colour (``to`` is None if unsolvable).
+    """
+    if failures is None:
+        failures = audit_palette(pal, ai_states)["failures"]
+    states = {f"aiStates.{s.get('name', i)}": s for i, s in enumerate(_states(ai_states))}
+    fixes: List[Dict[str, Any]] = []
+    for backgrounds in (True, False):
+        names, hexes, _ = palette_colors(pal, ai_states)
+        rules = audit_rules(names)
+        used_as_bg = {bg for _, bg, _ in rules}
+        failing = [fg for fg in dict.fromkeys(f["fg"] for f in failures) if (fg in used_as_bg) == backgrounds]
+        if failing:
+            colors = dict(zip(names, hexes))
+            constraints = [[("#" + colors[bg], lvl) for fg2, bg, lvl in rules if fg2 == fg] for fg in failing]
+            solved = nearest_passing(["#" + colors[fg] for fg in failing], constraints)
+            for fg, new in zip(failing, solved):
+                old = states[fg]["color"] if fg in states else pal[fg]
+                fixes.append({"fg": fg, "from": old, "to": new})
+                if new is None:
+                    continue
+                if fg in states:
+                    states[fg]["color"] = new
+                else:
+                    pal[fg] = new
+            if backgrounds:
+                # text on a corrected background may pass or fail differently now
+                failures = audit_palette(pal, ai_states)["failures"]
+    return fixes
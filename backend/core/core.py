@@ -1,7 +1,15 @@
 # design_agent/core.py
 from __future__ import annotations
 import json, math
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from .validator import compile_schema
+from .contrast import audit_palette, correct_palette, nearest_passing, normalize_hex
+
+# ====== Model ======
+MODEL = "gpt-4o-2024-08-06"
+ROLE_TEMPERATURES = {"design": 0.5, "ops": 0.2, "engine": 0.3}
 
 # ====== Prompts & JSON Schema ======
 SYSTEM_BASE = """You are a senior UI designer for React/Next.js + Tailwind.
@@ -53,6 +61,11 @@ Return JSON matching the schema. Include Tailwind tokens, AI state tokens,
 and a Next.js App Router file list with ChatComposer, MessageBubble, RunTimeline.
 """
 
+PREFETCH_TEMPLATE = """Tool results already computed for this brief (suggest_palette, ai_patterns, safety_rules).
+Use them directly; do not call these tools again:
+{prefetched}
+"""
+
 SCHEMA: Dict[str, Any] = {
   "type":"object",
   "properties":{
@@ -110,7 +123,7 @@ SCHEMA: Dict[str, Any] = {
     }}},
     "tailwind":{"type":"object","properties":{
       "configTokens":{"type":"object"},"utilityClasses":{"type":"object"}
-    }},
+    },"required":["configTokens"]},
     "next":{"type":"object","properties":{
       "fileTree":{"type":"array"},"routing":{"type":"object"},
       "components":{"type":"array"}
@@ -120,6 +133,16 @@ SCHEMA: Dict[str, Any] = {
   "required":["designSystem","ux","aiSolution","components","tailwind","next","narrativeDescription"]
 }
 
+# Compiled once at import; returns (json_pointer, message) for every violation
+validate_spec = compile_schema(SCHEMA)
+
+class SpecInvalid(ValueError):
+    """The spec still violates the schema after the targeted section repair; nothing is exported."""
+    def __init__(self, errors: List[Tuple[str, str]]):
+        self.errors = errors
+        paths = ", ".join(path or "/" for path, _ in errors[:10])
+        super().__init__(f"spec still invalid after repair at {paths}{' ...' if len(errors) > 10 else ''}")
+
 # ====== Color & contrast helpers ======
 def _clip01(x: float) -> float:
     return max(0.0, min(1.0, x))
@@ -127,10 +150,13 @@ def _clip01(x: float) -> float:
 def _srgb_to_lin(u: float) -> float:
     return (u/12.92) if u <= 0.04045 else ((u+0.055)/1.055) ** 2.4
 
+_LIN_LUT = [_srgb_to_lin(i / 255.0) for i in range(256)]
+
 def luminance(hex_color: str) -> float:
-    h = hex_color.lstrip("#")
-    r, g, b = tuple(int(h[i:i+2], 16) / 255.0 for i in (0, 2, 4))
-    r, g, b = _srgb_to_lin(r), _srgb_to_lin(g), _srgb_to_lin(b)
+    h = normalize_hex(hex_color)
+    if h is None:
+        raise ValueError(f"not a hex color: {hex_color!r}")
+    r, g, b = (_LIN_LUT[int(h[i:i+2], 16)] for i in (0, 2, 4))
     return 0.2126*r + 0.7152*g + 0.0722*b
 
 def contrast_ratio(c1: str, c2: str) -> float:
@@ -141,21 +167,68 @@ def contrast_ratio(c1: str, c2: str) -> float:
 def wcag_pass(fg: str, bg: str, level: float = 4.5) -> bool:
     return contrast_ratio(fg, bg) >= level
 
-# Simple fallback if contrast fails: try white, else black
-def improve_contrast(fg: str, bg: str) -> str:
-    return "#FFFFFF" if contrast_ratio("#FFFFFF", bg) >= 4.5 else "#0B0B0B"
+# Nearest passing colour in OKLab; white/black only if nothing on the candidate grid passes
+def improve_contrast(fg: str, bg: str, level: float = 4.5) -> str:
+    fixed = nearest_passing([fg], [[(bg, level)]])[0]
+    if fixed is not None:
+        return fixed
+    return "#FFFFFF" if contrast_ratio("#FFFFFF", bg) >= level else "#0B0B0B"
 
 # ====== Spec validation / correction ======
+def fix_palette(pal: Dict[str, str], ai_states: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Audit every applicable colour pair and correct failing foregrounds in place.
+
+    Each failing colour moves to the perceptually closest colour that passes all of its pairs
+    (4.5:1 for text tokens, 3:1 for UI colours). ``failures`` is a re-audit of the corrected
+    palette: the pairs that still fail.
+    """
+    audit = audit_palette(pal, ai_states)
+    fixes = correct_palette(pal, ai_states, audit["failures"])
+    if fixes:
+        audit = audit_palette(pal, ai_states)
+    return {"checked": audit["checked"], "fixes": fixes, "failures": audit["failures"], "invalid": audit["invalid"]}
+
 def validate_and_fix_palette(spec: Dict[str, Any]) -> Dict[str, Any]:
-    pal = spec["designSystem"]["palette"]
-    for fg_key, bg_key in [("onBg","bg"), ("onSurface","surface"), ("onPrimary","primary")]:
-        if not wcag_pass(pal[fg_key], pal[bg_key], 4.5):
-            pal[fg_key] = improve_contrast(pal[fg_key], pal[bg_key])
-    spec["designSystem"]["palette"] = pal
+    ds = spec["designSystem"]
+    fix_palette(ds["palette"], ds.get("aiStates"))
     return spec
 
 def pack_user_prompt(**kwargs) -> str:
     return USER_TEMPLATE.format(**kwargs)
 
+def pack_prefetch_prompt(prefetched: str) -> str:
+    return PREFETCH_TEMPLATE.format(prefetched=prefetched)
+
+def compact_json(value: Any) -> str:
+    """JSON without insignificant whitespace, for prompt text."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+@lru_cache(maxsize=1)
 def pack_schema_for_model() -> str:
-    return json.dumps({"schema": SCHEMA}) 
+    return compact_json({"schema": SCHEMA})
+
+# Spec sections each downstream agent reads. Ops patches aiSolution/components (ux carries the
+# streaming and citation strategy it checks latency hints against); the Engineer checks that the
+# design tokens, Tailwind config and file tree are buildable.
+AGENT_SECTIONS: Dict[str, tuple] = {
+    "ops": ("aiSolution", "components", "ux"),
+    "engine": ("designSystem", "tailwind", "next"),
+}
+
+# (system, user) prompts of Agent Ops and the UI Engineer; {spec_json} is pack_spec_for_agent's output
+OPS_PROMPT = (
+    "You are Agent Ops. Verify safety, latency, and observability. "
+    "Return a short JSON patch with keys you want to add/update under aiSolution and components.",
+    "Here are the spec sections you review (" + ", ".join(AGENT_SECTIONS["ops"]) + ") as JSON:\n"
+    "{spec_json}\n"
+    "Suggest minimal changes to include: safety banners, run timeline visibility, and latency hints.",
+)
+ENGINE_PROMPT = (
+    "You are a UI Engineer. Given the approved spec JSON, confirm tokens and file list are buildable. "
+    "Return 'OK' and any minor fixes as a JSON with keys 'notes' and optional 'patch'.",
+    "Spec sections (" + ", ".join(AGENT_SECTIONS["engine"]) + ") as JSON:\n{spec_json}",
+)
+
+def pack_spec_for_agent(spec: Dict[str, Any], agent: str) -> str:
+    """The sections of ``spec`` that ``agent`` needs, as compact JSON."""
+    return compact_json({k: spec[k] for k in AGENT_SECTIONS[agent] if k in spec})
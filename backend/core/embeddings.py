@@ -0,0 +1,215 @@
+# design_agent/embeddings.py
+from __future__ import annotations
+import json, os, re, shutil, sys, tempfile, threading, zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Offline text embeddings: signed feature hashing of words and character n-grams.
+
+    Uses crc32 (not ``hash()``, which is salted per process) so every worker and every
+    later append produces identical vectors for the same text.
+    """
+
+    def __init__(self, dim: int = 512, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def config(self) -> Dict[str, int]:
+        return {"dim": self.dim, "ngram": self.ngram}
+
+    def _features(self, text: str) -> Iterable[str]:
+        n = self.ngram
+        for word in _WORD.findall(text.lower()):
+            yield word
+            padded = f"<{word}>"
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        dim = self.dim
+        for row, text in enumerate(texts):
+            vec = out[row]
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode("utf-8"))
+                vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class DenseIndex:
+    """Append-only vector index on disk: ``vectors.npy`` (memory-mapped float32), ``docs.jsonl``, ``meta.json``.
+
+    Readers map ``vectors.npy`` read-only, so every worker process shares the same page-cache
+    copy. A single writer appends in place (capacity grows by doubling, without re-embedding)
+    and publishes the new row count in ``meta.json`` last; readers pick it up on their next query.
+    Within a process the index is shared by concurrent tool calls: refresh and append hold a lock,
+    and search scores a snapshot of the mapping and row count taken under it.
+    """
+
+    def __init__(self, directory: str, embedder: HashingEmbedder):
+        self.directory = directory
+        self.embedder = embedder
+        self.sources: List[str] = []
+        self.snippets: List[str] = []
+        self.count = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._meta_mtime = 0
+        self._docs_offset = 0
+        self._lock = threading.RLock()
+
+    # ----- paths / metadata -----
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Dict[str, object]:
+        with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, capacity: int) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "capacity": capacity, "embedder": self.embedder.config()}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    @classmethod
+    def create(cls, directory: str, embedder: Optional[HashingEmbedder] = None, capacity: int = 1024) -> "DenseIndex":
+        embedder = embedder or HashingEmbedder()
+        os.makedirs(directory, exist_ok=True)
+        index = cls(directory, embedder)
+        np.lib.format.open_memmap(index._path("vectors.npy"), mode="w+", dtype=np.float32,
+                                  shape=(capacity, embedder.dim)).flush()
+        open(index._path("docs.jsonl"), "w").close()
+        index._write_meta(capacity)
+        index.refresh()
+        return index
+
+    @classmethod
+    def build(cls, directory: str, docs: Sequence[Tuple[str, str]],
+              embedder: Optional[HashingEmbedder] = None) -> "DenseIndex":
+        """Index ``docs`` in a private staging directory, then publish it at ``directory`` with one rename.
+
+        Concurrent builders (workers starting together) never write into the same files: whoever
+        renames first wins, and the others discard their copy and open the published index.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{os.path.basename(os.path.abspath(directory))}.building-", dir=parent)
+        try:
+            cls.create(staging, embedder, capacity=max(1024, len(docs))).append(docs)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                if not cls.exists(directory):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory: str) -> "DenseIndex":
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(directory, HashingEmbedder(**meta["embedder"]))
+        index.refresh()
+        return index
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    # ----- reading -----
+    def refresh(self) -> None:
+        """Re-map the vectors and read newly appended docs if a writer published more rows."""
+        with self._lock:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+            if mtime == self._meta_mtime and self._vectors is not None:
+                return
+            meta = self._read_meta()
+            vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            with open(self._path("docs.jsonl"), "r", encoding="utf-8") as f:
+                f.seek(self._docs_offset)
+                while len(self.sources) < meta["count"]:
+                    line = f.readline()
+                    if not line:
+                        break
+                    row = json.loads(line)
+                    self.sources.append(row["source"])
+                    self.snippets.append(row["snippet"])
+                self._docs_offset = f.tell()
+            self._vectors = vectors
+            self.count = min(int(meta["count"]), len(self.sources))
+            self._meta_mtime = mtime
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, object]]:
+        with self._lock:
+            self.refresh()
+            # sources/snippets only grow, so rows below this count stay valid after the lock is released
+            vectors, count, sources, snippets = self._vectors, self.count, self.sources, self.snippets
+        if count == 0 or k <= 0:
+            return []
+        q = self.embedder.embed([query])[0]
+        scores = vectors[:count] @ q
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"source": sources[i], "snippet": snippets[i], "score": round(float(scores[i]), 4)}
+                for i in top.tolist()]
+
+    # ----- writing (single writer) -----
+    def append(self, docs: Sequence[Tuple[str, str]]) -> int:
+        """Embed and append documents; returns the new document count."""
+        if not docs:
+            return self.count
+        vectors = self.embedder.embed([f"{source} {snippet}" for source, snippet in docs])
+        with self._lock:
+            self.refresh()
+            capacity = self._vectors.shape[0]
+            needed = self.count + len(docs)
+            if needed > capacity:
+                capacity = self._grow(max(needed, 2 * capacity))
+            rows = np.load(self._path("vectors.npy"), mmap_mode="r+")
+            rows[self.count:needed] = vectors
+            rows.flush()
+            del rows
+            with open(self._path("docs.jsonl"), "a", encoding="utf-8") as f:
+                for source, snippet in docs:
+                    f.write(json.dumps({"source": source, "snippet": snippet}) + "\n")
+            self.count = needed
+            self._write_meta(capacity)
+            self.refresh()
+            return self.count
+
+    def _grow(self, capacity: int) -> int:
+        """Copy the rows into a bigger file; called by append with the lock held."""
+        old = np.load(self._path("vectors.npy"), mmap_mode="r")
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".npy")
+        os.close(fd)
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, old.shape[1]))
+        grown[:self.count] = old[:self.count]
+        grown.flush()
+        del grown, old
+        os.replace(tmp, self._path("vectors.npy"))  # readers keep their old mapping until refresh
+        return capacity
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Append a corpus directory to a dense index: python -m backend.core.embeddings INDEX_DIR CORPUS_DIR"""
+    from .retrieval import load_corpus
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) != 2:
+        print(main.__doc__)
+        raise SystemExit(2)
+    index_dir, corpus_dir = args
+    index = DenseIndex.open(index_dir) if DenseIndex.exists(index_dir) else DenseIndex.create(index_dir)
+    print("documents:", index.append(load_corpus(corpus_dir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# design_agent/executor.py
+from __future__ import annotations
+import asyncio, contextvars, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterator, List, Optional, Union
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.tools import BaseTool
+
+# One bounded pool per worker count, shared by every executor that asks for that size
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _pool(max_workers: int) -> ThreadPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = _pools[max_workers] = ThreadPoolExecutor(max_workers, thread_name_prefix="agent-tool")
+        return pool
+
+def _sync_only(tool: Optional[BaseTool]) -> bool:
+    """True for a tool without a native coroutine, whose arun would run it on the loop's default executor."""
+    if tool is None:
+        return False
+    return getattr(tool, "coroutine", False) is None or type(tool)._arun is BaseTool._arun
+
+def _timeout_step(action: AgentAction, timeout: float) -> AgentStep:
+    return AgentStep(action=action, observation=f"Tool '{action.tool}' timed out after {timeout:g}s; "
+                                                "continue without its result.")
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """AgentExecutor that runs the tool calls of one agent step concurrently.
+
+    The stock sync loop runs a step's tool calls one after another. Here each call is submitted to
+    a bounded thread pool as soon as the step is planned and the results are collected in the
+    order the model issued them, so a step costs its slowest tool instead of the sum. The async
+    loop already gathers the calls, and runs sync-only tools on the same bounded pool rather than
+    LangChain's default executor. Both paths add per-tool timeouts, after which the agent gets a
+    "timed out" observation (the model can retry or answer without it) instead of stalling.
+    """
+
+    max_workers: int = 4
+    tool_timeout_s: Optional[float] = 30.0
+    tool_timeouts: Dict[str, float] = {}   # per-tool overrides of tool_timeout_s
+
+    def _timeout_for(self, tool: str) -> Optional[float]:
+        return self.tool_timeouts.get(tool, self.tool_timeout_s)
+
+    # ----- sync -----
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        # Only called from _iter_next_step below, which resolves the future in issue order
+        ctx = contextvars.copy_context()
+        return _pool(self.max_workers).submit(
+            ctx.run, super()._perform_agent_action, name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps,
+                        run_manager=None) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        # The base step yields every planned AgentAction, then one _perform_agent_action result per
+        # action in the same order; here those results are futures, so all calls are in flight
+        # before the first one is awaited.
+        actions: List[AgentAction] = []
+        pending: List[Future] = []
+        for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, Future):
+                pending.append(item)
+                continue
+            if isinstance(item, AgentAction):
+                actions.append(item)
+            yield item
+        started = time.monotonic()
+        for action, future in zip(actions, pending):
+            timeout = self._timeout_for(action.tool)
+            try:
+                yield future.result(None if timeout is None else max(0.0, started + timeout - time.monotonic()))
+            except FutureTimeout:
+                future.cancel()   # a call that already started keeps its worker until it returns
+                yield _timeout_step(action, timeout)
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        timeout = self._timeout_for(agent_action.tool)
+        if _sync_only(name_to_tool_map.get(agent_action.tool)):
+            ctx = contextvars.copy_context()
+            call = asyncio.get_running_loop().run_in_executor(
+                _pool(self.max_workers), ctx.run, super()._perform_agent_action, name_to_tool_map, color_mapping,
+                agent_action, run_manager.get_sync() if run_manager else None)
+        else:
+            call = super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        try:
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            return _timeout_step(agent_action, timeout)
@@ -1,7 +1,9 @@
 # design_agent/exporters.py
 from __future__ import annotations
-import json, os
-from typing import Dict, Any
+import asyncio, json, os, shutil, tempfile, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tracing import traced
 
 def emit_tailwind_config(tokens: Dict[str, Any]) -> str:
     colors = tokens.get("colors", {})
@@ -254,17 +256,7 @@ export default function SafetyBanner({
 }
 """
 
-def write_project(spec: Dict[str, Any], out_dir="ui-agent-output") -> str:
-    os.makedirs(out_dir, exist_ok=True)
-    pal = spec["designSystem"]["palette"]
-    # Tailwind
-    tw = emit_tailwind_config(spec["tailwind"]["configTokens"])
-    open(os.path.join(out_dir, "tailwind.config.ts"), "w").write(tw)
-    # Next.js
-    os.makedirs(os.path.join(out_dir, "app"), exist_ok=True)
-    open(os.path.join(out_dir, "app","layout.tsx"), "w").write(emit_layout_tsx(pal))
-    open(os.path.join(out_dir, "app","page.tsx"), "w").write(
-        """import Hero from "../components/Hero";
+PAGE_TSX = """import Hero from "../components/Hero";
 import ChatComposer from "../components/ChatComposer";
 import RunTimeline from "../components/RunTimeline";
 export default function Page(){
@@ -276,17 +268,72 @@ export default function Page(){
     </div>
   </main>
 }"""
-    )
-    os.makedirs(os.path.join(out_dir, "components"), exist_ok=True)
-    open(os.path.join(out_dir, "components","Hero.tsx"), "w").write(emit_hero_tsx(pal))
-    open(os.path.join(out_dir, "components","ChatComposer.tsx"), "w").write(emit_chat_composer_tsx())
-    open(os.path.join(out_dir, "components","RunTimeline.tsx"), "w").write(emit_run_timeline_tsx())
-    
-    # Add AI-specific components
-    open(os.path.join(out_dir, "components","MessageBubble.tsx"), "w").write(emit_message_bubble_tsx())
-    open(os.path.join(out_dir, "components","CitationPanel.tsx"), "w").write(emit_citation_panel_tsx())
-    open(os.path.join(out_dir, "components","SafetyBanner.tsx"), "w").write(emit_safety_banner_tsx())
-    
-    # Save spec
-    open(os.path.join(out_dir, "ui-spec.json"), "w").write(json.dumps(spec, indent=2))
+
+def project_files(spec: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(relative path, content) of every file in the generated project."""
+    pal = spec["designSystem"]["palette"]
+    return [
+        # Tailwind
+        ("tailwind.config.ts", emit_tailwind_config(spec["tailwind"]["configTokens"])),
+        # Next.js
+        (os.path.join("app", "layout.tsx"), emit_layout_tsx(pal)),
+        (os.path.join("app", "page.tsx"), PAGE_TSX),
+        (os.path.join("components", "Hero.tsx"), emit_hero_tsx(pal)),
+        (os.path.join("components", "ChatComposer.tsx"), emit_chat_composer_tsx()),
+        (os.path.join("components", "RunTimeline.tsx"), emit_run_timeline_tsx()),
+        # AI-specific components
+        (os.path.join("components", "MessageBubble.tsx"), emit_message_bubble_tsx()),
+        (os.path.join("components", "CitationPanel.tsx"), emit_citation_panel_tsx()),
+        (os.path.join("components", "SafetyBanner.tsx"), emit_safety_banner_tsx()),
+        # Spec
+        ("ui-spec.json", json.dumps(spec, indent=2)),
+    ]
+
+class ExportCancelled(Exception):
+    """The export was cancelled before it was published; nothing was written to out_dir."""
+
+def _write_files(root: str, files: List[Tuple[str, str]], cancel: Optional[threading.Event] = None) -> None:
+    for rel, content in files:
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled(root)
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+@traced("write_project", kind="io")
+def write_project(spec: Dict[str, Any], out_dir="ui-agent-output", cancel: Optional[threading.Event] = None) -> str:
+    """Write the project into ``out_dir``.
+
+    With a ``cancel`` event the files are staged in a sibling temp directory and moved into
+    ``out_dir`` only once all of them are written; if ``cancel`` is set first, the staging
+    directory is removed and ExportCancelled raised, so a cancelled run leaves no partial project.
+    """
+    files = project_files(spec)
+    if cancel is None:
+        _write_files(out_dir, files)
+        return out_dir
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(os.path.abspath(out_dir))}.partial-", dir=parent)
+    try:
+        _write_files(staging, files, cancel)
+        for rel, _ in files:
+            # same filesystem, so each file lands atomically
+            target = os.path.join(out_dir, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(staging, rel), target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
     return out_dir
+
+async def awrite_project(spec: Dict[str, Any], out_dir="ui-agent-output") -> str:
+    """write_project in a worker thread. If the awaiting task is cancelled, the thread is told to
+    stop and discards what it staged (a project already being moved into place is finished)."""
+    cancel = threading.Event()
+    try:
+        return await asyncio.to_thread(write_project, spec, out_dir, cancel)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
@@ -0,0 +1,182 @@
+# design_agent/json_repair.py
+from __future__ import annotations
+import json, re
+from collections import Counter
+from typing import Any, List, Optional, Tuple
+
+# clean: parsed as-is; repaired: fixed locally (an LLM repair call saved);
+# failed: residue the caller has to escalate; per-repair counts are keyed "repair:<name>"
+repair_stats: Counter = Counter()
+
+_FENCE = re.compile(r"```[a-zA-Z0-9_-]*[ \t]*\n?(.*?)(?:```|\Z)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _strip_fences(text: str, repairs: List[str]) -> str:
+    """The body of a fence that opens before the JSON does; a fence inside a string value is content."""
+    m = _FENCE.search(text)
+    brace = text.find("{")
+    if m and (brace < 0 or m.start() < brace):
+        repairs.append("code_fence")
+        return m.group(1)
+    return text
+
+
+def _last_sig(out: List[str]) -> int:
+    """Index of the last non-whitespace piece in ``out`` (-1 if none)."""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    return i
+
+
+def _read_string(s: str, i: int, repairs: List[str]) -> Tuple[str, int]:
+    """Read the string literal starting at ``s[i]``; return it double-quoted and the next index."""
+    quote = s[i]
+    n = len(s)
+    j = i + 1
+    buf: List[str] = []
+    while j < n:
+        d = s[j]
+        if d == "\\" and j + 1 < n:
+            if quote == "'" and s[j + 1] == "'":
+                buf.append("'")
+            else:
+                buf.append(s[j:j + 2])
+            j += 2
+            continue
+        if d == quote:
+            break
+        if d == '"':            # only reachable inside a single-quoted string
+            buf.append('\\"')
+        elif d == "\n":
+            buf.append("\\n")
+            if "raw_newline" not in repairs:
+                repairs.append("raw_newline")
+        else:
+            buf.append(d)
+        j += 1
+    else:
+        repairs.append("unterminated_string")
+    if quote == "'" and "single_quotes" not in repairs:
+        repairs.append("single_quotes")
+    return '"' + "".join(buf) + '"', j + 1
+
+
+def _rewrite(s: str, repairs: List[str], object_only: bool = True) -> str:
+    out: List[str] = []
+    stack: List[str] = []
+    key_at: Optional[int] = None     # position in ``out`` of an object key not yet followed by ':'
+    i, n = 0, len(s)
+    if object_only:
+        start = s.find("{")     # a '[' in leading chatter isn't where the object starts
+    else:
+        start = min((p for p in (s.find("{"), s.find("[")) if p >= 0), default=-1)
+    if start < 0:
+        return s
+    if s[:start].strip():
+        repairs.append("leading_text")
+    i = start
+    while i < n:
+        c = s[i]
+        if c in "\"'":
+            piece, i = _read_string(s, i, repairs)
+            last = _last_sig(out)
+            if stack and stack[-1] == "{" and last >= 0 and out[last] in ("{", ","):
+                key_at = len(out)
+            out.append(piece)
+            continue
+        if c in "{[":
+            stack.append(c)
+            out.append(c)
+        elif c in "}]":
+            last = _last_sig(out)
+            if last >= 0 and out[last] == ",":
+                del out[last]
+                if "trailing_comma" not in repairs:
+                    repairs.append("trailing_comma")
+            if not stack:
+                break
+            opener = stack.pop()
+            closer = "}" if opener == "{" else "]"
+            if c != closer and "mismatched_bracket" not in repairs:
+                repairs.append("mismatched_bracket")
+            out.append(closer)
+            key_at = None
+            if not stack:
+                if s[i + 1:].strip():
+                    repairs.append("trailing_text")
+                break
+        elif c == ":":
+            key_at = None
+            out.append(c)
+        elif c == "/" and i + 1 < n and s[i + 1] in "/*":
+            end = s.find("\n", i) if s[i + 1] == "/" else s.find("*/", i + 2)
+            i = n if end < 0 else end + (1 if s[i + 1] == "/" else 2)
+            if "comment" not in repairs:
+                repairs.append("comment")
+            continue
+        elif c.isalpha():
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            if word in _LITERALS:
+                word = _LITERALS[word]
+                if "python_literal" not in repairs:
+                    repairs.append("python_literal")
+            out.append(word)
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if stack:
+        # truncated output: drop a dangling key, complete a dangling value, close what's open
+        if key_at is not None and stack[-1] == "{":
+            del out[key_at:]
+        last = _last_sig(out)
+        if last >= 0 and out[last] == ",":
+            del out[last]
+        elif last >= 0 and out[last] == ":":
+            out.append("null")
+        out.extend("}" if o == "{" else "]" for o in reversed(stack))
+        repairs.append("closed_brackets")
+    return "".join(out)
+
+
+def _check_object(value: Any, object_only: bool) -> None:
+    if object_only and not isinstance(value, dict):
+        repair_stats["failed"] += 1
+        raise ValueError(f"expected a JSON object, got {type(value).__name__}")
+
+
+def repair_json(text: str, object_only: bool = True) -> Tuple[Any, List[str]]:
+    """Parse model output as JSON, locally fixing the common breakages.
+
+    Handles markdown fences, leading/trailing chatter, trailing commas, single quotes,
+    comments, Python literals and truncated output. Returns ``(value, repairs_applied)``;
+    raises ValueError when the text is beyond local repair, or (``object_only``, the default
+    for specs and patches) when it isn't a JSON object.
+    """
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError):
+        pass
+    else:
+        _check_object(value, object_only)
+        repair_stats["clean"] += 1
+        return value, []
+    repairs: List[str] = []
+    candidate = _rewrite(_strip_fences(text, repairs), repairs, object_only)
+    try:
+        value = json.loads(candidate)
+    except ValueError as e:
+        repair_stats["failed"] += 1
+        raise ValueError(f"unrepairable JSON ({', '.join(repairs) or 'no known repair applies'}): {e}") from e
+    _check_object(value, object_only)
+    repair_stats["repaired"] += 1
+    for name in repairs:
+        repair_stats[f"repair:{name}"] += 1
+    return value, repairs
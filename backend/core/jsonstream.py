@@ -0,0 +1,158 @@
+# design_agent/jsonstream.py
+from __future__ import annotations
+import json, re
+from bisect import bisect_right
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Characters that can change parser state; everything else is skipped by the regex scan
+_SIGNIFICANT = re.compile(r'[{}\[\]",:\\]')
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "emit", "expect_key", "key", "key_start", "value_start")
+
+    def __init__(self, kind: str, path: Tuple[str, ...], emit: bool):
+        self.kind = kind            # "{" or "["
+        self.path = path
+        self.emit = emit            # emit each member of this object as it closes
+        self.expect_key = kind == "{"
+        self.key: Optional[str] = None
+        self.key_start = -1
+        self.value_start = -1
+
+
+class IncrementalJSONParser:
+    """Resumable scanner that reports object members as soon as they are complete.
+
+    Feed arbitrary text chunks; ``feed`` returns ``(dotted_path, value)`` for every member of the
+    root object that closed inside the chunk. Objects named in ``expand`` report their members
+    individually (e.g. ``designSystem.palette``) instead of one event for the whole object.
+    Text before the root ``{`` (markdown fences, chatter) is ignored.
+    """
+
+    def __init__(self, expand: Iterable[str] = ("designSystem",)):
+        self.expand = {tuple(p.split(".")) for p in expand}
+        self._chunks: List[str] = []
+        self._starts: List[int] = []    # absolute offset of each chunk
+        self._pos = 0               # absolute offset of the next unscanned character
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self.done = False
+
+    # ----- text buffer -----
+    # Chunks are kept as fed; a member's value is sliced out of the chunks it spans, and the
+    # whole text is joined only when asked for, so parsing stays linear in the document size.
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks, self._starts = ["".join(self._chunks)], [0]
+        return self._chunks[0] if self._chunks else ""
+
+    def _slice(self, start: int, end: int) -> str:
+        i = bisect_right(self._starts, start) - 1
+        parts = []
+        while start < end:
+            chunk, offset = self._chunks[i], self._starts[i]
+            parts.append(chunk[start - offset:end - offset])
+            start = offset + len(chunk)
+            i += 1
+        return "".join(parts)
+
+    # ----- scanning -----
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if not chunk:
+            return []
+        base = self._pos
+        self._chunks.append(chunk)
+        self._starts.append(base)
+        self._pos += len(chunk)
+        if self.done:
+            return []
+
+        out: List[Tuple[str, Any]] = []
+        skip = 0
+        if self._escape:            # escape sequence split across chunks
+            self._escape = False
+            skip = 1
+        for m in _SIGNIFICANT.finditer(chunk, skip):
+            i = m.start()
+            if i < skip:
+                continue
+            c = m.group()
+            at = base + i
+            if self._in_string:
+                if c == "\\":
+                    if i + 1 < len(chunk):
+                        skip = i + 2
+                    else:
+                        self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._close_string(at)
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = at
+                if self._stack and self._stack[-1].expect_key:
+                    self._stack[-1].key_start = at
+            elif c in "{[":
+                self._open(c, at)
+            elif c == ":":
+                if self._stack:
+                    top = self._stack[-1]
+                    top.expect_key = False
+                    top.value_start = at + 1
+            elif c == ",":
+                if self._stack:
+                    top = self._stack[-1]
+                    self._member_done(top, at, out)
+                    top.expect_key = top.kind == "{"
+            elif c in "}]":
+                if not self._stack:
+                    continue
+                top = self._stack.pop()
+                self._member_done(top, at, out)
+                if not self._stack:
+                    self.done = True
+                    break
+        return out
+
+    def _open(self, kind: str, at: int) -> None:
+        if not self._stack:
+            if kind != "{":
+                return              # only an object root is supported
+            self._stack.append(_Frame(kind, (), True))
+            return
+        parent = self._stack[-1]
+        if parent.kind == "{" and parent.key is not None:
+            path = parent.path + (parent.key,)
+        else:
+            path = parent.path + ("[]",)
+        emit = kind == "{" and path in self.expand and parent.emit
+        self._stack.append(_Frame(kind, path, emit))
+
+    def _close_string(self, at: int) -> None:
+        if not self._stack:
+            return
+        top = self._stack[-1]
+        # only keys of emitting objects can be part of a reported path
+        if top.emit and top.expect_key and top.key_start == self._string_start:
+            try:
+                top.key = json.loads(self._slice(top.key_start, at + 1))
+            except ValueError:
+                top.key = None
+
+    def _member_done(self, frame: _Frame, at: int, out: List[Tuple[str, Any]]) -> None:
+        if frame.kind != "{" or not frame.emit or frame.key is None or frame.value_start < 0:
+            return
+        path = frame.path + (frame.key,)
+        frame.key = None
+        start, frame.value_start = frame.value_start, -1
+        if path in self.expand:
+            return                  # members were already reported individually
+        try:
+            value = json.loads(self._slice(start, at))
+        except ValueError:
+            return
+        out.append((".".join(path), value))
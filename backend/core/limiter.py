@@ -0,0 +1,335 @@
+# design_agent/limiter.py
+from __future__ import annotations
+import asyncio, contextvars, heapq, itertools, random, threading, time
+from contextlib import aclosing, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .ratelimit import take_llm_token
+
+# Process-wide guard for upstream LLM calls, shared by every live chat model (llm_backends.LimitedChatModel):
+# - AIMD concurrency: each successful call raises the limit by 1/limit (about +1 per limit's worth
+#   of calls); an overload signal (429/503) multiplies it by ``backoff``, at most once per ``cooldown_s``
+#   so one burst of 429s counts as one signal.
+# - A Retry-After from the upstream holds back every new call until it has passed.
+# - Overloaded and transient failures (other 5xx, connection errors, timeouts) are retried with
+#   full-jitter exponential backoff, or after Retry-After plus jitter; a stream only before its first chunk.
+#   Each attempt, retries included, first takes a token from the active rate-limit bucket (ratelimit.py).
+# - A circuit breaker fails calls fast with UpstreamUnavailable after ``failure_threshold``
+#   consecutive transient failures, and lets a single probe through once ``reset_s`` has passed.
+# - Priorities: waiting interactive calls start before batch ones, and batch calls only take
+#   ``batch_share`` of the limit, so interactive streams find a free slot even under batch load.
+# Sync callers (the CLI's run_pipeline) get the retries and the breaker, not a concurrency slot.
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="interactive")
+
+@contextmanager
+def llm_priority(name: str) -> Iterator[None]:
+    """Run the LLM calls made in this block (and the tasks it starts) at priority ``name``."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown LLM priority {name!r}; expected one of {sorted(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamUnavailable(RuntimeError):
+    """The circuit breaker is open: recent upstream calls kept failing, so this one was not attempted."""
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from the ``retry-after-ms`` / ``retry-after`` (seconds or HTTP date) header of an API error."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Transport failures by class name (openai, httpx and aiohttp), so none of them has to be imported here
+_TRANSIENT = ("APIConnectionError", "APITimeoutError", "TransportError", "ClientConnectionError",
+              "ServerTimeoutError")
+
+def _transport_error(exc: Optional[BaseException]) -> bool:
+    """A timeout or connection failure, or an error raised from one (SDKs wrap their HTTP client's)."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (ConnectionError, TimeoutError)) or any(c.__name__ in _TRANSIENT for c in type(exc).__mro__):
+            return True
+        exc = exc.__cause__
+    return False
+
+def classify(exc: BaseException) -> str:
+    """"overload" (429/503: the upstream is up but wants less), "transient" (other 5xx, connection
+    errors, timeouts) or "fatal" (anything else, e.g. a 400: not retried)."""
+    status = getattr(exc, "status_code", None)
+    if status in (429, 503):
+        return "overload"
+    if (isinstance(status, int) and status >= 500) or _transport_error(exc):
+        return "transient"
+    return "fatal"
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a priority queue of waiting calls (event-loop only)."""
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64, backoff: float = 0.5,
+                 cooldown_s: float = 1.0, batch_share: float = 0.75):
+        self.limit = float(initial)
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.backoff, self.cooldown_s, self.batch_share = backoff, cooldown_s, batch_share
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._last_cut = float("-inf")
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _capacity(self, priority: int) -> int:
+        if priority == 0:
+            return int(self.limit)
+        return max(1, int(self.limit * self.batch_share))
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for a slot; higher-priority (lower number) waiters are served first, FIFO within one."""
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(None)   # granted just as we were cancelled: hand it on
+            raise
+
+    def release(self, outcome: Optional[str]) -> None:
+        """Free a slot; ``ok`` grows the limit additively, ``overload`` cuts it multiplicatively."""
+        self.in_flight -= 1
+        if outcome == "ok":
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif outcome == "overload":
+            now = time.monotonic()
+            if now - self._last_cut >= self.cooldown_s:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_cut = now
+        self._wake()
+
+    def pause(self, seconds: float) -> None:
+        """Start no call for ``seconds`` (an upstream Retry-After)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def paused_s(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def _wake(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            if self._waiters and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+        else:
+            while self._waiters:
+                priority, _, fut = self._waiters[0]
+                if fut.done():
+                    heapq.heappop(self._waiters)     # cancelled while waiting
+                    continue
+                if self.in_flight >= self._capacity(priority):
+                    break
+                heapq.heappop(self._waiters)
+                self.in_flight += 1
+                fut.set_result(None)
+        metrics.LLM_CONCURRENCY_LIMIT.set(round(self.limit, 2))
+        metrics.LLM_IN_FLIGHT.set(self.in_flight)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._wake()
+
+
+class CircuitBreaker:
+    """closed -> open after ``failure_threshold`` consecutive failures -> half-open (one probe) after ``reset_s``."""
+
+    def __init__(self, failure_threshold: int = 5, reset_s: float = 30.0):
+        self.failure_threshold, self.reset_s = failure_threshold, reset_s
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()   # sync calls come from worker threads
+
+    def before(self) -> None:
+        """Raise UpstreamUnavailable unless a call may go out now."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_s - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+        metrics.LLM_REJECTED.inc()
+        raise UpstreamUnavailable(f"upstream LLM failing; calls paused for {max(remaining, 0):.0f}s more")
+
+    def success(self) -> None:
+        with self._lock:
+            self.state, self.failures, self._probing = "closed", 0, False
+        metrics.LLM_BREAKER_OPEN.set(0)
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state, self._opened_at, self._probing = "open", time.monotonic(), False
+        if self.state == "open":
+            metrics.LLM_BREAKER_OPEN.set(1)
+
+    def abandon(self) -> None:
+        """A call let through ended without a verdict (cancelled); allow another probe."""
+        with self._lock:
+            self._probing = False
+
+
+class LLMLimiter:
+    def __init__(self, concurrency: Optional[AdaptiveLimiter] = None, breaker: Optional[CircuitBreaker] = None,
+                 retries: int = 3, backoff_base_s: float = 0.5, backoff_max_s: float = 20.0):
+        self.concurrency = concurrency or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.retries, self.backoff_base_s, self.backoff_max_s = retries, backoff_base_s, backoff_max_s
+        self.counts = {"calls": 0, "retries": 0, "overloaded": 0, "failed": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, limit=round(self.concurrency.limit, 2), in_flight=self.concurrency.in_flight,
+                    waiting=self.concurrency.waiting(), paused_s=round(self.concurrency.paused_s(), 2),
+                    breaker=self.breaker.state)
+
+    def _failed(self, exc: BaseException, attempt: int, retryable: bool = True) -> Tuple[str, Optional[float]]:
+        """Record a failed attempt; returns its kind and the delay before retrying, or None to give up."""
+        kind = classify(exc)
+        hint = retry_after(exc)
+        if kind == "transient":
+            self.breaker.failure()
+        elif getattr(exc, "status_code", None) is not None:
+            self.breaker.success()   # the upstream answered
+        else:
+            self.breaker.abandon()   # failed before or after the upstream: no verdict on its health
+        if kind == "overload":
+            self.counts["overloaded"] += 1
+            if hint:
+                self.concurrency.pause(min(hint, self.backoff_max_s))
+        if kind == "fatal" or not retryable or attempt >= self.retries or (hint or 0) > self.backoff_max_s:
+            self.counts["failed"] += 1
+            return kind, None
+        self.counts["retries"] += 1
+        metrics.LLM_RETRIES.inc(reason=kind)
+        if hint is not None:
+            return kind, hint + random.uniform(0, self.backoff_base_s)
+        return kind, random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+
+    async def _slot(self) -> None:
+        priority = _priority.get()
+        start = time.perf_counter()
+        await self.concurrency.acquire(PRIORITIES[priority])
+        metrics.LLM_QUEUE_SECONDS.observe(time.perf_counter() - start, priority=priority)
+
+    async def call(self, make: Callable[[], Awaitable[Any]]) -> Any:
+        """``await make()`` inside a concurrency slot, with retries and the circuit breaker."""
+        self.counts["calls"] += 1
+        attempt = 0
+        while True:
+            await take_llm_token()
+            self.breaker.before()
+            await self._slot()
+            outcome = None
+            try:
+                result = await make()
+                outcome = "ok"
+                self.breaker.success()
+                return result
+            except Exception as exc:
+                outcome, delay = self._failed(exc, attempt)
+                if delay is None:
+                    raise
+            finally:
+                if outcome is None:
+                    self.breaker.abandon()
+                self.concurrency.release(outcome)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, make: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Chunks of ``make()``; the slot is held until the stream ends and only a stream that
+        hasn't produced anything yet is retried."""
+        self.counts["calls"] += 1
+        attempt = 0
+        while True:
+            await take_llm_token()
+            self.breaker.before()
+            await self._slot()
+            outcome, started = None, False
+            try:
+                async with aclosing(make()) as chunks:
+                    async for chunk in chunks:
+                        started = True
+                        yield chunk
+                outcome = "ok"
+                self.breaker.success()
+                return
+            except Exception as exc:
+                outcome, delay = self._failed(exc, attempt, retryable=not started)
+                if delay is None:
+                    raise
+            finally:
+                if outcome is None:
+                    self.breaker.abandon()
+                self.concurrency.release(outcome)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def call_sync(self, make: Callable[[], Any]) -> Any:
+        """``make()`` with retries and the circuit breaker, for callers outside the event loop."""
+        self.counts["calls"] += 1
+        attempt = 0
+        while True:
+            self.breaker.before()
+            try:
+                result = make()
+            except Exception as exc:
+                _, delay = self._failed(exc, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.breaker.success()
+                return result
+            attempt += 1
+            time.sleep(delay)
+
+
+_limiter = LLMLimiter()
+
+def configure(initial: int = 8, max_limit: int = 64, batch_share: float = 0.75, retries: int = 3,
+              failure_threshold: int = 5, reset_s: float = 30.0) -> LLMLimiter:
+    """Replace the process-wide limiter (call before serving, e.g. from server settings)."""
+    global _limiter
+    _limiter = LLMLimiter(AdaptiveLimiter(initial=initial, max_limit=max_limit, batch_share=batch_share),
+                          CircuitBreaker(failure_threshold=failure_threshold, reset_s=reset_s), retries=retries)
+    return _limiter
+
+def get_limiter() -> LLMLimiter:
+    return _limiter
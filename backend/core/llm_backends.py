@@ -0,0 +1,296 @@
+# design_agent/llm_backends.py
+from __future__ import annotations
+import asyncio, hashlib, itertools, json, os, threading, time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .limiter import get_limiter
+
+
+# ====== Cassettes ======
+def message_key(role: str, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> str:
+    """Stable hash of what the model was asked: role, message contents/tool calls and bound tool names."""
+    tools = sorted(t.get("function", {}).get("name", "") if isinstance(t, dict) else str(t)
+                   for t in kwargs.get("tools") or ())
+    blob = json.dumps({
+        "role": role,
+        "tools": tools,
+        "messages": [[m.type, m.content, getattr(m, "tool_calls", None) or None,
+                      getattr(m, "tool_call_id", None)] for m in messages],
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded model responses, one append-only JSONL file per role (``design.jsonl``, ...).
+
+    An entry is ``{"key", "content", "tool_calls", "latency_s", "chunks": [[gap_s, text], ...] | null}``.
+    Lookups match on ``key``; a prompt that was never recorded (e.g. a different brief) falls back to
+    the role's entries in rotation, so load tests can replay one recording under any payload.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_key: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._rotation: Dict[str, Iterator[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "fallbacks": 0, "recorded": 0}
+
+    def _path(self, role: str) -> str:
+        return os.path.join(self.directory, f"{role}.jsonl")
+
+    def _load(self, role: str) -> List[Dict[str, Any]]:
+        if role not in self._entries:
+            entries = []
+            if os.path.exists(self._path(role)):
+                with open(self._path(role), "r", encoding="utf-8") as f:
+                    entries = [json.loads(line) for line in f if line.strip()]
+            self._entries[role] = entries
+            self._by_key[role] = {e["key"]: e for e in entries}
+            self._rotation[role] = itertools.cycle(entries) if entries else iter(())
+        return self._entries[role]
+
+    def lookup(self, role: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            if not self._load(role):
+                raise LookupError(f"no recorded '{role}' responses in {self.directory}; "
+                                  f"run once with LLM_BACKEND=record")
+            entry = self._by_key[role].get(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return entry
+            self.stats["fallbacks"] += 1
+            return next(self._rotation[role])
+
+    def append(self, role: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(role), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries.pop(role, None)   # reload on next lookup
+            self.stats["recorded"] += 1
+
+
+def _tool_calls(message: BaseMessage) -> List[Dict[str, Any]]:
+    return [{"name": c["name"], "args": c["args"], "id": c.get("id")} for c in getattr(message, "tool_calls", None) or []]
+
+
+def _entry(key: str, message: BaseMessage, latency_s: float, chunks: Optional[List[Tuple[float, str]]]) -> Dict[str, Any]:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return {"key": key, "content": content, "tool_calls": _tool_calls(message),
+            "latency_s": round(latency_s, 4), "chunks": chunks}
+
+
+# ====== Chat models ======
+class RecordingChatModel(BaseChatModel):
+    """Pass-through to a real chat model that appends every response (and stream timing) to a cassette."""
+
+    inner: Any
+    cassette: Any
+    role: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        self.cassette.append(self.role, _entry(message_key(self.role, messages, kwargs), message,
+                                               time.perf_counter() - start, None))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self.cassette.append(self.role, _entry(message_key(self.role, messages, kwargs), message,
+                                               time.perf_counter() - start, None))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        start = last = time.perf_counter()
+        chunks, merged = [], None
+        for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            now = time.perf_counter()
+            chunks.append((round(now - last, 5), chunk.content if isinstance(chunk.content, str) else ""))
+            last = now
+            merged = chunk if merged is None else merged + chunk
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        if merged is not None:
+            self.cassette.append(self.role, _entry(message_key(self.role, messages, kwargs), merged,
+                                                   time.perf_counter() - start, chunks))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        start = last = time.perf_counter()
+        chunks, merged = [], None
+        async for chunk in self.inner.astream(messages, stop=stop, **kwargs):
+            now = time.perf_counter()
+            chunks.append((round(now - last, 5), chunk.content if isinstance(chunk.content, str) else ""))
+            last = now
+            merged = chunk if merged is None else merged + chunk
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        if merged is not None:
+            self.cassette.append(self.role, _entry(message_key(self.role, messages, kwargs), merged,
+                                                   time.perf_counter() - start, chunks))
+
+
+class LimitedChatModel(BaseChatModel):
+    """Pass-through to a live chat model through the process-wide limiter (limiter.py): adaptive
+    concurrency, priorities, retries honoring Retry-After and the circuit breaker."""
+
+    inner: Any
+    role: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "limited"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = get_limiter().call_sync(lambda: self.inner.invoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = await get_limiter().call(lambda: self.inner.ainvoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in get_limiter().stream(lambda: self.inner.astream(messages, stop=stop, **kwargs)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Deterministic offline stand-in that answers from a cassette, tool calls included.
+
+    Streams the recorded chunks (or ~4-character pieces of a non-streamed recording) with
+    ``token_delay_s`` between them, or with the recorded gaps when ``recorded_timing`` is set;
+    non-streaming calls sleep for the equivalent total.
+    """
+
+    cassette: Any
+    role: str
+    token_delay_s: float = 0.0
+    recorded_timing: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _pieces(self, entry: Dict[str, Any]) -> List[Tuple[float, str]]:
+        chunks = entry.get("chunks")
+        if not chunks:
+            content = entry["content"]
+            chunks = [(0.0, content[i:i + 4]) for i in range(0, len(content), 4)]
+        if self.recorded_timing:
+            return [(gap, text) for gap, text in chunks]
+        return [(self.token_delay_s, text) for _, text in chunks]
+
+    def _total_delay(self, entry: Dict[str, Any]) -> float:
+        if self.recorded_timing:
+            return entry.get("latency_s", 0.0)
+        return sum(gap for gap, _ in self._pieces(entry))
+
+    @staticmethod
+    def _message(entry: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content=entry["content"], tool_calls=[
+            {"name": c["name"], "args": c["args"], "id": c.get("id") or f"call_{i}"}
+            for i, c in enumerate(entry.get("tool_calls") or [])])
+
+    @staticmethod
+    def _tool_chunk(entry: Dict[str, Any]) -> Optional[AIMessageChunk]:
+        calls = entry.get("tool_calls") or []
+        if not calls:
+            return None
+        return AIMessageChunk(content="", tool_call_chunks=[
+            {"name": c["name"], "args": json.dumps(c["args"]), "id": c.get("id") or f"call_{i}", "index": i}
+            for i, c in enumerate(calls)])
+
+    def _lookup(self, messages, kwargs) -> Dict[str, Any]:
+        return self.cassette.lookup(self.role, message_key(self.role, messages, kwargs))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self._lookup(messages, kwargs)
+        time.sleep(self._total_delay(entry))
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self._lookup(messages, kwargs)
+        await asyncio.sleep(self._total_delay(entry))
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        entry = self._lookup(messages, kwargs)
+        due = time.perf_counter()
+        for gap, text in self._pieces(entry):
+            due += gap
+            wait = due - time.perf_counter()
+            if wait > 0.001:
+                time.sleep(wait)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        tool_chunk = self._tool_chunk(entry)
+        if tool_chunk is not None:
+            yield ChatGenerationChunk(message=tool_chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        entry = self._lookup(messages, kwargs)
+        due = time.perf_counter()
+        for gap, text in self._pieces(entry):
+            # Paced against a deadline so sub-millisecond delays hold their average rate
+            due += gap
+            wait = due - time.perf_counter()
+            if wait > 0.001:
+                await asyncio.sleep(wait)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        tool_chunk = self._tool_chunk(entry)
+        if tool_chunk is not None:
+            yield ChatGenerationChunk(message=tool_chunk)
+
+
+# ====== Backend selection ======
+_cassettes: Dict[str, Cassette] = {}
+
+def get_cassette(directory: str) -> Cassette:
+    if directory not in _cassettes:
+        _cassettes[directory] = Cassette(directory)
+    return _cassettes[directory]
+
+def make_chat_model(role: str, model: str, temperature: float, backend: str = "openai",
+                    cassette_dir: str = ".cache/cassettes", token_delay_ms: float = 0.0,
+                    recorded_timing: bool = False, callbacks: Optional[List[Any]] = None,
+                    limited: bool = True) -> BaseChatModel:
+    """The chat model for an agent role: ``openai`` (live), ``record`` (live + cassette) or ``replay``.
+
+    Live models go through the shared LLM limiter unless ``limited`` is off; the limiter then does
+    the retrying, so the client's own retries are disabled.
+    """
+    if backend == "replay":
+        return ReplayChatModel(cassette=get_cassette(cassette_dir), role=role, callbacks=callbacks,
+                               token_delay_s=token_delay_ms / 1000.0, recorded_timing=recorded_timing)
+    from langchain_openai import ChatOpenAI
+    if backend == "record":
+        llm = ChatOpenAI(model=model, temperature=temperature, **({"max_retries": 0} if limited else {}))
+        if limited:
+            llm = LimitedChatModel(inner=llm, role=role)
+        return RecordingChatModel(inner=llm, cassette=get_cassette(cassette_dir), role=role, callbacks=callbacks)
+    if limited:
+        return LimitedChatModel(inner=ChatOpenAI(model=model, temperature=temperature, max_retries=0),
+                                role=role, callbacks=callbacks)
+    return ChatOpenAI(model=model, temperature=temperature, callbacks=callbacks)
+
+def cassette_stats() -> Dict[str, Dict[str, int]]:
+    return {directory: dict(c.stats) for directory, c in _cassettes.items()}
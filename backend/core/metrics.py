@@ -0,0 +1,291 @@
+# design_agent/metrics.py
+from __future__ import annotations
+import asyncio, bisect, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import tracing
+
+# In-process latency/throughput metrics rendered in the Prometheus text format (GET /metrics).
+# Dependency-free so core modules can record without importing FastAPI or a client library;
+# each worker process exposes its own series.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic total per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {_number(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Current value per label set (queue depth, jobs running)."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects (``_bucket``/``_sum``/``_count``)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}   # per-bucket counts (+Inf last), then sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _number(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        out = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.samples())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def render() -> str:
+    return REGISTRY.render()
+
+# ====== Pipeline and LLM metrics ======
+PIPELINE_SECONDS = REGISTRY.register(Histogram(
+    "design_pipeline_seconds", "End-to-end pipeline duration by mode (stream, sync, async) and outcome."))
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "design_phase_seconds", "Duration of one pipeline phase (design_strategist, parsing, palette_validation, "
+                            "agent_ops, ui_engineer, export)."))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "llm_call_seconds", "LLM call duration by agent role."))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from request to first streamed token by agent role."))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "llm_completion_tokens_per_second", "Completion tokens per second of generation by agent role.", RATE_BUCKETS))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Prompt and completion tokens by agent role (estimated at ~4 chars/token when the "
+                        "provider reports no usage)."))
+TOOL_SECONDS = REGISTRY.register(Histogram(
+    "tool_call_seconds", "Tool call duration by tool name, including prefetched tools."))
+PIPELINE_CANCELLED = REGISTRY.register(Counter(
+    "design_pipeline_cancelled_total", "Pipeline runs cancelled before finishing (client disconnected) by mode and "
+                                       "the phase they were in (queued: still waiting for a pipeline slot)."))
+LLM_CONCURRENCY_LIMIT = REGISTRY.register(Gauge(
+    "llm_concurrency_limit", "Current adaptive (AIMD) limit on concurrent upstream LLM calls."))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "llm_in_flight", "Upstream LLM calls holding a concurrency slot."))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "llm_queue_seconds", "Time an LLM call waited for a concurrency slot by priority (interactive, batch)."))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "llm_retries_total", "Retried upstream LLM calls by reason (overload: 429/503, transient: 5xx/connection)."))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "llm_circuit_rejected_total", "LLM calls failed fast because the circuit breaker was open."))
+LLM_BREAKER_OPEN = REGISTRY.register(Gauge(
+    "llm_circuit_open", "1 while the upstream LLM circuit breaker is open."))
+JOBS_QUEUED = REGISTRY.register(Gauge(
+    "design_jobs_queued", "Background jobs waiting for a worker."))
+JOBS_RUNNING = REGISTRY.register(Gauge(
+    "design_jobs_running", "Background jobs being run by a worker."))
+JOB_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "design_job_wait_seconds", "Time a background job spent queued before a worker picked it up."))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "design_jobs_total", "Background jobs finished by status (done, error, cancelled)."))
+
+@contextmanager
+def pipeline_timer(mode: str) -> Iterator[Dict[str, Any]]:
+    """Observe a whole pipeline run; the caller may set ``outcome`` (default "ok") on the yielded dict,
+    and its PhaseClock as ``clock`` so a cancellation is counted under the phase it interrupted."""
+    run: Dict[str, Any] = {"outcome": "ok"}
+    start = time.perf_counter()
+    try:
+        yield run
+    except (GeneratorExit, asyncio.CancelledError):
+        run["outcome"] = "cancelled"
+        clock = run.get("clock")
+        PIPELINE_CANCELLED.inc(mode=mode, phase=clock.where() if clock is not None else "starting")
+        raise
+    except BaseException:
+        run["outcome"] = "error"
+        raise
+    finally:
+        PIPELINE_SECONDS.observe(time.perf_counter() - start, mode=mode, outcome=run["outcome"])
+
+@contextmanager
+def timer(histogram: Histogram, **labels: Any) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+class PhaseClock:
+    """Times consecutive pipeline phases: ``start(name)`` closes the running phase and opens the next.
+
+    Every closed phase is observed in ``design_phase_seconds``; ``timings`` holds the closed
+    phases in milliseconds, for attaching to SSE ``phase`` events. Inside a trace, each phase
+    is also a span under the active one.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._current: Optional[str] = None
+        self._timed = True
+        self._since = time.perf_counter()
+        self._spans = tracing.PhaseSpans()
+
+    def start(self, phase: Optional[str], timed: bool = True) -> Dict[str, float]:
+        """Close the running phase and open ``phase``; ``timed=False`` only names it (its steps are timed on their own)."""
+        now = time.perf_counter()
+        if self._current is not None and self._timed:
+            PHASE_SECONDS.observe(now - self._since, phase=self._current)
+            self.timings[self._current] = round((now - self._since) * 1000, 1)
+        self._current, self._since, self._timed = phase, now, timed
+        self._spans.switch(phase if timed else None)
+        return dict(self.timings)
+
+    def stop(self) -> Dict[str, float]:
+        return self.start(None)
+
+    def where(self) -> str:
+        """The running phase, or "starting"/"finishing" between phases (before the first, after the last)."""
+        if self._current is not None:
+            return self._current
+        return "finishing" if self.timings else "starting"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+# A cancelled stream never reports its end or an error, so its entry would stay in the handler's open
+# runs; more runs than this open at once means the oldest ones were abandoned and are dropped.
+MAX_OPEN_LLM_RUNS = 1024
+
+
+def llm_callback(role: str):
+    """A LangChain callback handler recording call time, TTFT, tokens/s and token counts for ``role``."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        run_inline = True   # cheap bookkeeping; don't hop to an executor per token
+
+        def __init__(self):
+            self._runs: Dict[Any, Dict[str, Any]] = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            prompt = sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content))
+                         for batch in messages for m in batch)
+            self._runs[run_id] = {"start": time.perf_counter(), "first": None, "chunks": 0, "prompt": prompt}
+            while len(self._runs) > MAX_OPEN_LLM_RUNS:
+                self._runs.pop(next(iter(self._runs)), None)   # oldest first: dicts keep insertion order
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            run = self._runs.get(run_id)
+            if run is not None:
+                if run["first"] is None:
+                    run["first"] = time.perf_counter()
+                run["chunks"] += 1
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            end = time.perf_counter()
+            LLM_CALL_SECONDS.observe(end - run["start"], role=role)
+            text, usage = "", None
+            for generations in response.generations:
+                for generation in generations:
+                    text += generation.text or ""
+                    usage = usage or getattr(getattr(generation, "message", None), "usage_metadata", None)
+            prompt = usage["input_tokens"] if usage else run["prompt"]
+            completion = usage["output_tokens"] if usage else estimate_tokens(text)
+            LLM_TOKENS.inc(prompt, role=role, kind="prompt")
+            LLM_TOKENS.inc(completion, role=role, kind="completion")
+            generating_from = run["start"]
+            if run["first"] is not None:
+                LLM_TTFT_SECONDS.observe(run["first"] - run["start"], role=role)
+                generating_from = run["first"]
+            if completion and end > generating_from:
+                LLM_TOKENS_PER_SECOND.observe(completion / (end - generating_from), role=role)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            run = self._runs.pop(run_id, None)
+            if run is not None:
+                LLM_CALL_SECONDS.observe(time.perf_counter() - run["start"], role=role)
+
+    return LLMMetricsHandler()
@@ -0,0 +1,76 @@
+# design_agent/ratelimit.py
+from __future__ import annotations
+import asyncio, contextvars, time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Token-bucket rate limiting of LLM requests. A bucket applies to the LLM calls made inside
+# ``limit_llm_requests(bucket)`` (carried by a contextvar, so it reaches every task the pipeline
+# starts). Every request that goes out takes a token: the shared LLM limiter (limiter.py) waits for
+# one before each attempt, retries included, and the LangChain callback from ``llm_callback()`` does
+# it once per call for models outside the limiter. Outside such a block LLM calls are not rate limited.
+
+class TokenBucket:
+    """``rate`` tokens per second, refilled continuously up to ``burst``; ``acquire`` waits for enough.
+
+    Waiters are served in arrival order, so one large batch can't starve a later caller forever.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst if burst and burst > 0 else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(requests / 60.0, burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens``, waiting for the refill if needed; returns the seconds waited."""
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+        return time.monotonic() - start
+
+
+_llm_bucket: contextvars.ContextVar[Optional[TokenBucket]] = contextvars.ContextVar("llm_bucket", default=None)
+
+@contextmanager
+def limit_llm_requests(bucket: Optional[TokenBucket]) -> Iterator[None]:
+    """Rate-limit the LLM requests made in this block (and the tasks it starts) with ``bucket``."""
+    token = _llm_bucket.set(bucket)
+    try:
+        yield
+    finally:
+        _llm_bucket.reset(token)
+
+
+async def take_llm_token() -> None:
+    """Wait for a token from the bucket active in this context, if any."""
+    bucket = _llm_bucket.get()
+    if bucket is not None:
+        await bucket.acquire()
+
+
+def llm_callback():
+    """A LangChain callback handler that holds each LLM request until the active bucket has a token."""
+    from langchain_core.callbacks import AsyncCallbackHandler
+
+    class RateLimitHandler(AsyncCallbackHandler):
+        async def on_chat_model_start(self, serialized, messages, **kwargs):
+            await take_llm_token()
+
+    return RateLimitHandler()
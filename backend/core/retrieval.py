@@ -0,0 +1,159 @@
+# design_agent/retrieval.py
+from __future__ import annotations
+import heapq, json, os, pickle, re, tempfile
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over (source, snippet) documents, built once and queried many times.
+
+    Term weights don't depend on the query, so postings store final per-document weights in
+    flat CSR arrays (``terms`` maps a term to its slice); a query is a few vectorized adds
+    followed by a heap top-k over the touched documents.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, sources: List[str], snippets: List[str], terms: Dict[str, Tuple[int, int]],
+                 doc_ids: np.ndarray, weights: np.ndarray, k1: float, b: float):
+        self.sources = sources
+        self.snippets = snippets
+        self.terms = terms
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.k1 = k1
+        self.b = b
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        sources, snippets, term_freqs = [], [], []
+        for source, text in docs:
+            sources.append(source)
+            snippets.append(text)
+            term_freqs.append(Counter(tokenize(f"{source} {text}")))
+        n = len(sources)
+        lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float64)
+        avg = lengths.mean() if n else 1.0
+        norm = k1 * (1 - b + b * lengths / (avg or 1.0))
+
+        ids: Dict[str, List[int]] = {}
+        tfs: Dict[str, List[int]] = {}
+        for doc, tf in enumerate(term_freqs):
+            for term, count in tf.items():
+                ids.setdefault(term, []).append(doc)
+                tfs.setdefault(term, []).append(count)
+
+        terms: Dict[str, Tuple[int, int]] = {}
+        offset = 0
+        for term, docs_of_term in ids.items():
+            terms[term] = (offset, offset + len(docs_of_term))
+            offset += len(docs_of_term)
+        doc_ids = np.fromiter((d for term in ids for d in ids[term]), dtype=np.int32, count=offset)
+        tf = np.fromiter((c for term in ids for c in tfs[term]), dtype=np.float64, count=offset)
+        counts = np.array([len(v) for v in ids.values()], dtype=np.int64)
+        df = np.repeat(counts, counts).astype(np.float64)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        weights = (idf * tf * (k1 + 1) / (tf + norm[doc_ids])).astype(np.float32)
+        return cls(sources, snippets, terms, doc_ids, weights, k1, b)
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, object]]:
+        spans = [self.terms[t] for t in set(tokenize(query)) if t in self.terms]
+        if not spans or k <= 0:
+            return []
+        if len(spans) == 1:
+            start, end = spans[0]
+            touched, scores = self.doc_ids[start:end], self.weights[start:end]
+        else:
+            acc = np.zeros(len(self.sources), dtype=np.float32)
+            for start, end in spans:
+                acc[self.doc_ids[start:end]] += self.weights[start:end]
+            touched = np.unique(np.concatenate([self.doc_ids[s:e] for s, e in spans]))
+            scores = acc[touched]
+        top = heapq.nlargest(k, zip(scores.tolist(), touched.tolist()))
+        return [{"source": self.sources[d], "snippet": self.snippets[d], "score": round(s, 4)}
+                for s, d in top]
+
+    # ----- persistence -----
+    def save(self, path: str) -> None:
+        state = {"version": self.FORMAT_VERSION, "k1": self.k1, "b": self.b,
+                 "sources": self.sources, "snippets": self.snippets, "terms": self.terms,
+                 "doc_ids": self.doc_ids, "weights": self.weights}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != cls.FORMAT_VERSION:
+            raise ValueError(f"index format {state.get('version')} != {cls.FORMAT_VERSION}")
+        return cls(state["sources"], state["snippets"], state["terms"], state["doc_ids"],
+                   state["weights"], state["k1"], state["b"])
+
+
+# ====== Corpus loading ======
+def _markdown_snippets(path: str, rel: str) -> Iterable[Tuple[str, str]]:
+    heading = ""
+    para: List[str] = []
+
+    def flush():
+        text = " ".join(para).strip()
+        para.clear()
+        if text:
+            yield (f"{rel}#{heading}" if heading else rel), text
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                yield from flush()
+                heading = stripped.lstrip("#").strip()
+            elif not stripped:
+                yield from flush()
+            else:
+                para.append(stripped)
+    yield from flush()
+
+
+def _jsonl_snippets(path: str, rel: str) -> Iterable[Tuple[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            text = row.get("snippet") or row.get("text") or ""
+            if text:
+                yield row.get("source") or f"{rel}:{n}", text
+
+
+def load_corpus(directory: str) -> List[Tuple[str, str]]:
+    """Collect (source, snippet) pairs from ``*.md`` (one per paragraph) and ``*.jsonl`` files."""
+    docs: List[Tuple[str, str]] = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, directory)
+            if name.endswith(".md"):
+                docs.extend(_markdown_snippets(path, rel))
+            elif name.endswith(".jsonl"):
+                docs.extend(_jsonl_snippets(path, rel))
+    return docs
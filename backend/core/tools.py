@@ -1,8 +1,13 @@
 # design_agent/tools.py
 from __future__ import annotations
-from typing import List, Dict
+import json, os
+from functools import lru_cache, wraps
+from typing import Any, List, Dict, Optional
 from pydantic import BaseModel, Field
-from langchain.tools import tool
+
+from .retrieval import BM25Index, load_corpus
+from .embeddings import DenseIndex
+from . import metrics
 
 # --- Enhanced demo corpus with AI-specific patterns ---
 DOCS = {
@@ -24,19 +29,79 @@ DOCS = {
 class DocsSearchInput(BaseModel):
     query: str = Field(..., description="Short query about Next.js, Tailwind, a11y, GenAI, or agents")
     k: int = Field(3, description="How many snippets to return")
+    mode: str = Field("auto", description="keyword, semantic, hybrid, or auto (hybrid when a semantic index is loaded)")
+
+# Built lazily over DOCS; load_docs_index() swaps in a larger corpus
+_docs_index: Optional[BM25Index] = None
+
+def get_docs_index() -> BM25Index:
+    global _docs_index
+    if _docs_index is None:
+        _docs_index = BM25Index.build(DOCS.items())
+    return _docs_index
+
+def load_docs_index(corpus_dir: Optional[str] = None, index_path: Optional[str] = None) -> BM25Index:
+    """Serve docs_search from DOCS plus a directory of markdown/JSONL guidelines.
+
+    With ``index_path``, a persisted index is loaded instead of rebuilt (and written after a build),
+    so workers don't re-index at startup. Delete the file to pick up corpus changes.
+    """
+    global _docs_index
+    if index_path and os.path.exists(index_path):
+        _docs_index = BM25Index.load(index_path)
+        return _docs_index
+    docs = list(DOCS.items())
+    if corpus_dir:
+        docs.extend(load_corpus(corpus_dir))
+    _docs_index = BM25Index.build(docs)
+    if index_path:
+        _docs_index.save(index_path)
+    return _docs_index
 
-@tool("docs_search", args_schema=DocsSearchInput, return_direct=False)
-def docs_search(query: str, k: int = 3) -> List[Dict[str, str]]:
-    """Search a small built-in corpus for guidance (demo).
-    Replace with your RAG/VectorStore later."""
-    q = query.lower()
-    scored = []
-    for key, text in DOCS.items():
-        score = sum(1 for tok in q.split() if tok in text.lower())
-        if score:
-            scored.append((score, key, text))
-    scored.sort(reverse=True, key=lambda x: x[0])
-    out = [{"source": key, "snippet": text} for _, key, text in scored[:k]]
+_dense_index: Optional[DenseIndex] = None
+
+def load_dense_index(index_dir: str, corpus_dir: Optional[str] = None) -> DenseIndex:
+    """Open (or build from DOCS plus ``corpus_dir``) a memory-mapped semantic index.
+
+    The vectors are mapped read-only, so uvicorn workers opening the same directory share one
+    copy in the page cache. A missing index is built off to the side and renamed into place
+    (DenseIndex.build), so workers starting together never append to the same files. Grow it
+    later with ``python -m backend.core.embeddings``, the single writer.
+    """
+    global _dense_index
+    if DenseIndex.exists(index_dir):
+        _dense_index = DenseIndex.open(index_dir)
+        return _dense_index
+    docs = list(DOCS.items())
+    if corpus_dir:
+        docs.extend(load_corpus(corpus_dir))
+    _dense_index = DenseIndex.build(index_dir, docs)
+    return _dense_index
+
+def _fuse(rankings: List[List[Dict[str, Any]]], k: int, c: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion: scores from BM25 and cosine aren't comparable, ranks are."""
+    scores: Dict[tuple, float] = {}
+    hits: Dict[tuple, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            key = (hit["source"], hit["snippet"])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (c + rank + 1)
+            hits.setdefault(key, hit)
+    return [hits[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+def _docs_search(query: str, k: int = 3, mode: str = "auto") -> List[Dict[str, str]]:
+    """Search the design-guideline corpus: BM25 keywords, local embeddings, or both fused."""
+    if mode == "auto":
+        mode = "hybrid" if _dense_index is not None else "keyword"
+    if mode != "keyword" and _dense_index is None:
+        mode = "keyword"
+    if mode == "keyword":
+        hits = get_docs_index().search(query, k)
+    elif mode == "semantic":
+        hits = _dense_index.search(query, k)
+    else:
+        hits = _fuse([get_docs_index().search(query, 4 * k), _dense_index.search(query, 4 * k)], k)
+    out = [{"source": hit["source"], "snippet": hit["snippet"]} for hit in hits]
     if not out:
         out = [{"source": "generic", "snippet": "No direct hits. Consider broader search or KB indexing."}]
     return out
@@ -46,8 +111,7 @@ class PaletteSuggestInput(BaseModel):
     subject: str = Field(..., description="Domain subject like finance, wellness, developer tools")
     mood: str = Field("calm, trustworthy", description="A few adjectives guiding the palette")
 
-@tool("suggest_palette", args_schema=PaletteSuggestInput, return_direct=False)
-def suggest_palette(subject: str, mood: str = "calm, trustworthy") -> Dict[str, str]:
+def _suggest_palette(subject: str, mood: str = "calm, trustworthy") -> Dict[str, str]:
     """Return a minimal hex palette suggestion based on subject & mood (demo heuristic)."""
     subject = subject.lower()
     if "finance" in subject:
@@ -84,8 +148,7 @@ class AIPatternInput(BaseModel):
     ai_use_cases: str = Field(..., description="AI use cases like chat, RAG, agents")
     latency_budget: int = Field(2000, description="Latency budget in milliseconds")
 
-@tool("ai_patterns", args_schema=AIPatternInput, return_direct=False)
-def ai_patterns(purpose: str, ai_use_cases: str, latency_budget: int = 2000) -> Dict[str, Any]:
+def _ai_patterns(purpose: str, ai_use_cases: str, latency_budget: int = 2000) -> Dict[str, Any]:
     """Determine optimal AI UX pattern based on purpose and constraints."""
     use_cases = ai_use_cases.lower()
     purpose_lower = purpose.lower()
@@ -137,8 +200,7 @@ class SafetyInput(BaseModel):
     safety_level: str = Field("moderate", description="Safety level: strict, moderate, or relaxed")
     telemetry_opt_in: str = Field("off", description="Telemetry opt-in: on or off")
 
-@tool("safety_rules", args_schema=SafetyInput, return_direct=False)
-def safety_rules(safety_level: str = "moderate", telemetry_opt_in: str = "off") -> Dict[str, Any]:
+def _safety_rules(safety_level: str = "moderate", telemetry_opt_in: str = "off") -> Dict[str, Any]:
     """Generate safety and observability rules based on configuration."""
     safety_config = {
         "strict": {
@@ -190,3 +252,63 @@ def safety_rules(safety_level: str = "moderate", telemetry_opt_in: str = "off")
         "safety": safety_config.get(safety_level, safety_config["moderate"]),
         "observability": observability_config.get(telemetry_opt_in, observability_config["off"])
     }
+
+# ----- LangChain tool objects -----
+# Built on first access (module __getattr__): constructing a StructuredTool pulls in LangChain's
+# callback/tracing stack, which importers that only need the plain functions shouldn't pay for.
+TOOLS = {
+    "docs_search": (_docs_search, DocsSearchInput),
+    "suggest_palette": (_suggest_palette, PaletteSuggestInput),
+    "ai_patterns": (_ai_patterns, AIPatternInput),
+    "safety_rules": (_safety_rules, SafetyInput),
+}
+
+def _timed(name: str, func):
+    @wraps(func)
+    def run(*args, **kwargs):
+        with metrics.timer(metrics.TOOL_SECONDS, tool=name):
+            return func(*args, **kwargs)
+    return run
+
+@lru_cache(maxsize=None)
+def get_tool(name: str):
+    from langchain_core.tools import StructuredTool
+    func, args_schema = TOOLS[name]
+    return StructuredTool.from_function(_timed(name, func), name=name, description=func.__doc__,
+                                        args_schema=args_schema, return_direct=False)
+
+def __getattr__(name: str):
+    if name in TOOLS:
+        return get_tool(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ----- Prefetch: tools that are pure functions of the DesignRequest -----
+PREFETCHED_TOOLS = ("suggest_palette", "ai_patterns", "safety_rules")
+
+@lru_cache(maxsize=256)
+def _prefetch(subject: str, tone: str, purpose: str, ai_use_cases: str, latency_budget: int,
+              safety_level: str, telemetry_opt_in: str) -> str:
+    return json.dumps({
+        "suggest_palette": _timed("suggest_palette", _suggest_palette)(subject=subject, mood=tone),
+        "ai_patterns": _timed("ai_patterns", _ai_patterns)(purpose=purpose, ai_use_cases=ai_use_cases,
+                                                           latency_budget=latency_budget),
+        "safety_rules": _timed("safety_rules", _safety_rules)(safety_level=safety_level,
+                                                              telemetry_opt_in=telemetry_opt_in),
+    })
+
+def prefetch_tools(payload: Dict[str, Any]) -> str:
+    """Run the deterministic tools locally for a request and return their results as JSON text.
+
+    The Strategist would otherwise spend a model turn deciding to call each of them; the text is
+    injected into its prompt instead. Memoized on the request fields the tools read.
+    """
+    try:
+        budget = int(payload.get("latency_budget", 2000))
+    except (TypeError, ValueError):
+        budget = 2000
+    return _prefetch(str(payload.get("subject", "")), str(payload.get("tone") or "calm, trustworthy"),
+                     str(payload.get("purpose", "")), str(payload.get("ai_use_cases", "")), budget,
+                     str(payload.get("safety_level") or "moderate"), str(payload.get("telemetry_opt_in") or "off"))
+
+def prefetch_stats() -> Dict[str, Any]:
+    return _prefetch.cache_info()._asdict()
@@ -0,0 +1,343 @@
+# design_agent/tracing.py
+from __future__ import annotations
+import atexit, contextvars, json, os, queue, random, sys, threading, time, uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional
+
+# Nested span tracing per request: pipeline -> phase -> chain/LLM call -> tool call -> file write.
+# A span is only recorded under a sampled root (``trace``); with tracing off or outside a trace,
+# ``span`` costs one contextvar lookup. Finished spans go to a background thread that appends them
+# to ``<dir>/traces-YYYYMMDD.jsonl``, one JSON object per line:
+#   {"trace_id", "span_id", "parent_id", "name", "kind", "start", "duration_ms", "attrs", "error"}
+# Print a trace with: python -m backend.core.tracing TRACE_DIR [TRACE_ID]
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attrs", "start", "_t0", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, attrs: Dict[str, Any]):
+        self.trace_id, self.parent_id, self.name, self.kind, self.attrs = trace_id, parent_id, name, kind, attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: str, **attrs: Any) -> "Span":
+        return Span(self.trace_id, self.span_id, name, kind, attrs)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if error is not None and self.error is None:
+            self.error = f"{type(error).__name__}: {error}"
+        record = {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                  "name": self.name, "kind": self.kind, "start": round(self.start, 6),
+                  "duration_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+                  "attrs": self.attrs, "error": self.error}
+        exporter = _config["exporter"]
+        if exporter is not None:
+            exporter.submit(record)
+
+
+class JSONLExporter:
+    """Appends finished spans to a daily JSONL file from a daemon thread, so request paths never write."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._idle = threading.Event()
+        self._idle.set()
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        self._idle.clear()
+        self._queue.put(record)
+
+    def path_for(self, timestamp: float) -> str:
+        return os.path.join(self.directory, time.strftime("traces-%Y%m%d.jsonl", time.localtime(timestamp)))
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines: Dict[str, List[str]] = {}
+            for record in batch:
+                if record is not None:
+                    lines.setdefault(self.path_for(record["start"]), []).append(json.dumps(record, default=str))
+            for path, chunk in lines.items():
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(chunk) + "\n")
+            if self._queue.empty():
+                self._idle.set()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        self._idle.clear()
+        self._queue.put(None)   # wakes the writer even when nothing is pending
+        self._idle.wait(timeout)
+
+
+_config: Dict[str, Any] = {"exporter": None, "sample_rate": 1.0}
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+def configure(trace_dir: str = "", sample_rate: float = 1.0) -> None:
+    """Turn tracing on (spans exported under ``trace_dir``) or off (empty dir)."""
+    previous = _config["exporter"]
+    if previous is not None:
+        previous.flush()
+    _config["exporter"] = JSONLExporter(trace_dir) if trace_dir else None
+    _config["sample_rate"] = sample_rate
+    if trace_dir and previous is None:
+        atexit.register(flush)
+
+def flush() -> None:
+    exporter = _config["exporter"]
+    if exporter is not None:
+        exporter.flush()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def _activate(span: Optional[Span]):
+    return _current.set(span)
+
+def _restore(token) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        pass   # generator finalized from another context; that context's span was never changed
+
+@contextmanager
+def trace(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Root span of a new trace (subject to sampling); yields None when not traced."""
+    if _config["exporter"] is None or random.random() >= _config["sample_rate"]:
+        yield None
+        return
+    root = Span(uuid.uuid4().hex, None, name, "pipeline", attrs)
+    token = _activate(root)
+    error = None
+    try:
+        yield root
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        _restore(token)
+        root.end(error)
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs: Any) -> Iterator[Optional[Span]]:
+    """Child of the active span; a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, **attrs)
+    token = _activate(child)
+    error = None
+    try:
+        yield child
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        _restore(token)
+        child.end(error)
+
+def traced(name: str, kind: str = "internal"):
+    """Decorator form of ``span`` for functions (e.g. file writers run via asyncio.to_thread)."""
+    def decorate(func):
+        @wraps(func)
+        def run(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return run
+    return decorate
+
+
+class PhaseSpans:
+    """Sequential phase spans under the active span: ``switch(name)`` ends the running phase, starts the next."""
+
+    def __init__(self):
+        self.parent = _current.get()
+        self._span: Optional[Span] = None
+        self._token = None
+
+    def switch(self, phase: Optional[str]) -> None:
+        if self.parent is None:
+            return
+        if self._span is not None:
+            _restore(self._token)
+            self._span.end()
+            self._span = self._token = None
+        if phase is not None:
+            self._span = self.parent.child(phase, "phase")
+            self._token = _activate(self._span)
+
+
+# ====== LangChain callbacks ======
+_handler = None
+
+def langchain_handler():
+    """Shared callback handler that turns chain/LLM/tool runs into child spans of the active span."""
+    global _handler
+    if _handler is None:
+        _handler = _make_handler()
+    return _handler
+
+def langchain_config() -> Optional[Dict[str, Any]]:
+    """``config=`` for a LangChain call so its nested runs (agent turns, tools) join the trace."""
+    if _current.get() is None:
+        return None
+    return {"callbacks": [langchain_handler()]}
+
+def _make_handler():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        run_inline = True
+
+        def __init__(self):
+            self._spans: Dict[Any, Span] = {}
+            self._through: Dict[Any, Span] = {}   # unrecorded inner chains -> the span their children join
+
+        def _parent(self, parent_run_id) -> Optional[Span]:
+            if parent_run_id is not None:
+                found = self._spans.get(parent_run_id) or self._through.get(parent_run_id)
+                if found is not None:
+                    return found
+            return _current.get()
+
+        def _start(self, run_id, parent_run_id, name: str, kind: str, **attrs) -> None:
+            parent = self._parent(parent_run_id)
+            if parent is not None:
+                self._spans[run_id] = parent.child(name, kind, **attrs)
+
+        def _end(self, run_id, error: Optional[BaseException] = None, **attrs) -> None:
+            self._through.pop(run_id, None)
+            span = self._spans.pop(run_id, None)
+            if span is not None:
+                span.attrs.update(attrs)
+                span.end(error)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+            # Only top-level chains (e.g. the AgentExecutor) become spans; the runnables inside an
+            # agent would bury the LLM and tool calls
+            parent = self._parent(parent_run_id)
+            if parent is None:
+                return
+            if parent_run_id is None or parent_run_id not in self._spans and parent_run_id not in self._through:
+                self._spans[run_id] = parent.child(kwargs.get("name") or (serialized or {}).get("name") or "chain",
+                                                   "chain")
+            else:
+                self._through[run_id] = parent
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            metadata = kwargs.get("metadata") or {}
+            self._start(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name") or "chat_model", "llm",
+                        model=metadata.get("ls_model_name"), messages=sum(len(batch) for batch in messages))
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name") or "llm", "llm")
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            usage = None
+            for generations in response.generations:
+                for generation in generations:
+                    usage = usage or getattr(getattr(generation, "message", None), "usage_metadata", None)
+            self._end(run_id, **({"input_tokens": usage["input_tokens"], "output_tokens": usage["output_tokens"]}
+                                 if usage else {}))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name") or "tool", "tool",
+                        input=input_str[:200])
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+    return TracingCallbackHandler()
+
+
+# ====== CLI ======
+def load_spans(trace_dir: str, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    spans = []
+    for name in sorted(os.listdir(trace_dir)):
+        if not (name.startswith("traces-") and name.endswith(".jsonl")):
+            continue
+        with open(os.path.join(trace_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if trace_id is None or record["trace_id"].startswith(trace_id):
+                    spans.append(record)
+    return spans
+
+def print_traces(spans: List[Dict[str, Any]], limit: int = 20) -> None:
+    """Most recent root spans: id, start, duration, name, attributes."""
+    roots = sorted((s for s in spans if s["parent_id"] is None), key=lambda s: s["start"], reverse=True)
+    for root in roots[:limit]:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(root["start"]))
+        attrs = " ".join(f"{k}={v}" for k, v in root["attrs"].items())
+        print(f"{root['trace_id']}  {started}  {root['duration_ms']:>10.1f} ms  {root['name']}  {attrs}"
+              + ("  ERROR" if root["error"] else ""))
+
+def print_flame(spans: List[Dict[str, Any]], width: int = 40) -> None:
+    """Indented span tree with each span's offset/extent drawn as a bar on the root's timeline."""
+    by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        by_parent.setdefault(s["parent_id"], []).append(s)
+    ids = {s["span_id"] for s in spans}
+    roots = [s for s in spans if s["parent_id"] is None or s["parent_id"] not in ids]
+    for root in sorted(roots, key=lambda s: s["start"]):
+        t0, total = root["start"], max(root["duration_ms"], 1e-6)
+
+        def walk(node: Dict[str, Any], depth: int) -> None:
+            offset = int((node["start"] - t0) * 1000 / total * width)
+            length = max(1, round(node["duration_ms"] / total * width))
+            bar = " " * min(offset, width - 1) + "#" * min(length, width - min(offset, width - 1))
+            label = f"{'  ' * depth}{node['name']} [{node['kind']}]"
+            share = node["duration_ms"] / total * 100
+            print(f"{bar:<{width}}  {node['duration_ms']:>10.1f} ms {share:5.1f}%  {label}"
+                  + (f"  ERROR {node['error']}" if node["error"] else ""))
+            for child in sorted(by_parent.get(node["span_id"], []), key=lambda s: s["start"]):
+                walk(child, depth + 1)
+        print(f"trace {root['trace_id']}")
+        walk(root, 0)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Print a trace as a flame-style tree: python -m backend.core.tracing TRACE_DIR [TRACE_ID]
+
+    Without TRACE_ID, lists the most recent traces. TRACE_ID may be a prefix."""
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) not in (1, 2):
+        print(main.__doc__)
+        raise SystemExit(2)
+    spans = load_spans(args[0], args[1] if len(args) == 2 else None)
+    if len(args) == 1:
+        print_traces(spans)
+    elif not spans:
+        print("no spans for trace", args[1])
+        raise SystemExit(1)
+    else:
+        print_flame(spans)
+
+
+if __name__ == "__main__":
+    main()
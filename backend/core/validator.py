@@ -0,0 +1,111 @@
+# design_agent/validator.py
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+
+# A compiled node appends (json_pointer, message) pairs for every violation under ``path``
+Check = Callable[[Any, str, List[Tuple[str, str]]], None]
+
+_PY_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "number": (int, float),       # type() is exact, so bool never passes as a number
+    "integer": (int,),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+_JSON_NAMES = {dict: "object", list: "array", str: "string", int: "integer", float: "number",
+               bool: "boolean", type(None): "null"}
+
+
+def _pointer_segment(key: str) -> str:
+    return "/" + key.replace("~", "~0").replace("/", "~1")
+
+
+def _noop(value: Any, path: str, errors: List[Tuple[str, str]]) -> None:
+    return None
+
+
+def _compile(node: Dict[str, Any]) -> Check:
+    declared = node.get("type")
+    names = declared if isinstance(declared, list) else ([declared] if declared else [])
+    types = frozenset(t for name in names for t in _PY_TYPES[name])
+    type_msg = "expected " + " or ".join(names)
+    enum = node.get("enum")
+    required = tuple((key, _pointer_segment(key)) for key in node.get("required", ()))
+    props = tuple((key, _pointer_segment(key), _compile(sub))
+                  for key, sub in node.get("properties", {}).items())
+    items = _compile(node["items"]) if "items" in node else None
+
+    parts: List[Check] = []
+    if enum is not None:
+        allowed = list(enum)
+        enum_msg = "expected one of " + ", ".join(map(repr, allowed))
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((path, enum_msg))
+        parts.append(check_enum)
+
+    if required or props:
+        def check_object(value, path, errors):
+            if type(value) is not dict:
+                return
+            for key, seg in required:
+                if key not in value:
+                    errors.append((path + seg, "required property missing"))
+            for key, seg, sub in props:
+                if key in value:
+                    sub(value[key], path + seg, errors)
+        parts.append(check_object)
+
+    if items is not None:
+        def check_items(value, path, errors):
+            if type(value) is not list:
+                return
+            for i, item in enumerate(value):
+                items(item, f"{path}/{i}", errors)
+        parts.append(check_items)
+
+    if len(parts) == 0:
+        body = _noop
+    elif len(parts) == 1:
+        body = parts[0]
+    else:
+        def body(value, path, errors):
+            for part in parts:
+                part(value, path, errors)
+
+    if not types:
+        return body
+
+    def check(value, path, errors):
+        if type(value) not in types:
+            errors.append((path, f"{type_msg}, got {_JSON_NAMES.get(type(value), type(value).__name__)}"))
+            return
+        body(value, path, errors)
+    return check
+
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], List[Tuple[str, str]]]:
+    """Compile a JSON-schema subset (type, enum, properties, required, items) into a validator.
+
+    The schema is walked once here; validation runs nested closures with every lookup
+    resolved ahead of time. The validator returns ``(json_pointer, message)`` per violation.
+    """
+    root = _compile(schema)
+
+    def validate(value: Any) -> List[Tuple[str, str]]:
+        errors: List[Tuple[str, str]] = []
+        root(value, "", errors)
+        return errors
+    return validate
+
+
+def failing_sections(errors: List[Tuple[str, str]]) -> List[str]:
+    """Top-level keys touched by a list of violations, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for pointer, _ in errors:
+        top = pointer.split("/")[1] if pointer else ""
+        seen.setdefault(top.replace("~1", "/").replace("~0", "~"), None)
+    return [key for key in seen if key]
@@ -4,14 +4,86 @@ CLI runner for the UI Design Expert Agent.
 Provides a command-line interface for design generation.
 """
 
+import argparse
+import asyncio
 import os
 import json
+import sys
 from dotenv import load_dotenv
-from core.agents import run_pipeline
+from config import settings
+from core.agents import arun_pipeline, configure_llms, run_pipeline
+from core import limiter
+from core.batch import arun_batch
+from core.briefs import DesignRequest
+from core.ratelimit import TokenBucket
+
+def load_briefs(path):
+    """Briefs from a JSON array or a JSONL file (one request object per line), validated and
+    defaulted like API requests. Raises ValueError naming the first bad line or item."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        try:
+            rows = [(f"item {i}", obj) for i, obj in enumerate(json.loads(text))]
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from e
+    else:
+        rows = []
+        for n, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((f"line {n}", json.loads(line)))
+            except ValueError as e:
+                raise ValueError(f"{path} line {n}: {e}") from e
+    payloads = []
+    for where, obj in rows:
+        if not isinstance(obj, dict):
+            raise ValueError(f"{path} {where}: expected a request object, got {type(obj).__name__}")
+        try:
+            payloads.append(DesignRequest(**obj).dict())
+        except ValueError as e:
+            raise ValueError(f"{path} {where}: {e}") from e
+    return payloads
+
+async def run_batch(args, payloads):
+    bucket = TokenBucket.per_minute(args.rpm, args.burst) if args.rpm > 0 else None
+    results = []
+    async for event in arun_batch(payloads, arun_pipeline, args.concurrency, bucket):
+        if event["type"] == "summary":
+            print(f"{event['ok']}/{event['total']} ok, {event['failed']} failed in {event['seconds']:.1f}s")
+            break
+        results.append(event)
+        where = event["out_dir"] if event["status"] == "ok" else event["error"]
+        print(f"[{event['index']}] {event['status']:<5} {event['seconds']:>7.1f}s  {where}", flush=True)
+    if args.results:
+        results.sort(key=lambda e: e["index"])
+        with open(args.results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if any(e["status"] == "error" for e in results) else 0
 
 def main():
     """Main CLI function."""
     load_dotenv()
+    parser = argparse.ArgumentParser(description="UI Design Expert Agent")
+    parser.add_argument("--batch", help="JSON array or JSONL file of design requests to run as a batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="pipelines running at once (batch)")
+    parser.add_argument("--rpm", type=float, default=0, help="LLM requests per minute, 0 = unlimited (batch)")
+    parser.add_argument("--burst", type=float, default=0, help="token bucket size for --rpm (batch)")
+    parser.add_argument("--results", help="write every item's result (spec or error) to this JSON file (batch)")
+    args = parser.parse_args()
+    configure_llms(settings.llm_backend, settings.llm_cassette_dir,
+                   settings.llm_replay_token_delay_ms, settings.llm_replay_recorded_timing,
+                   limited=settings.llm_limiter_enabled)
+    limiter.configure(settings.llm_limit_initial, settings.llm_limit_max, settings.llm_limit_batch_share,
+                      settings.llm_retries, settings.llm_breaker_failures, settings.llm_breaker_reset_s)
+    if args.batch:
+        try:
+            payloads = load_briefs(args.batch)
+        except (OSError, ValueError) as e:
+            sys.exit(f"error: {e}")
+        sys.exit(asyncio.run(run_batch(args, payloads)))
+
     payload = dict(
         purpose="Research copilot for a knowledge base",
         audience="Analysts and PMs",
@@ -0,0 +1,49 @@
+"""Spec cache keys must change whenever something that shapes the generated spec changes."""
+
+from backend.core import cache
+from backend.core.cache import SpecCache, prompt_version, request_key
+from backend.core.core import OPS_PROMPT, ROLE_TEMPERATURES
+
+PAYLOAD = {"product_name": "Acme", "purpose": "triage", "out_dir": "/tmp/a"}
+SPEC = {"ok": True}
+ENTRY = {"spec": SPEC, "events": []}
+
+
+def cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_llm_source", "live")
+    store = SpecCache(cache_dir=str(tmp_path))
+    store.put(request_key(PAYLOAD), SPEC)
+    assert store.get(request_key(PAYLOAD)) == ENTRY
+    return store
+
+
+def test_out_dir_does_not_change_the_key(tmp_path, monkeypatch):
+    store = cached(tmp_path, monkeypatch)
+    assert store.get(request_key(dict(PAYLOAD, out_dir="/tmp/b"))) == ENTRY
+
+
+def test_model_change_misses(tmp_path, monkeypatch):
+    store = cached(tmp_path, monkeypatch)
+    monkeypatch.setattr(cache, "PROMPT_VERSION", prompt_version(model="gpt-4o-mini"))
+    assert store.get(request_key(PAYLOAD)) is None
+
+
+def test_temperature_change_misses(tmp_path, monkeypatch):
+    store = cached(tmp_path, monkeypatch)
+    monkeypatch.setattr(cache, "PROMPT_VERSION", prompt_version(temperatures=dict(ROLE_TEMPERATURES, ops=0.9)))
+    assert store.get(request_key(PAYLOAD)) is None
+
+
+def test_agent_prompt_change_misses(tmp_path, monkeypatch):
+    store = cached(tmp_path, monkeypatch)
+    prompts = tuple(p + " Be terse." if p == OPS_PROMPT[0] else p for p in cache.AGENT_PROMPTS)
+    monkeypatch.setattr(cache, "PROMPT_VERSION", prompt_version(prompts=prompts))
+    assert store.get(request_key(PAYLOAD)) is None
+
+
+def test_replay_backend_misses(tmp_path, monkeypatch):
+    store = cached(tmp_path, monkeypatch)
+    cache.set_llm_source("replay", str(tmp_path / "cassettes"))
+    assert store.get(request_key(PAYLOAD)) is None
+    cache.set_llm_source("record", "")
+    assert store.get(request_key(PAYLOAD)) == ENTRY